@@ -0,0 +1,153 @@
+import os
+import subprocess
+
+# Sizes of the synthetic repositories: commits in the history, tracked files, untracked files,
+# lines of the README and number of `filename` targets
+SIZES = {
+    'small': dict(commits=1_000, files=1_000, untracked=1_000, readme_lines=10_000, targets=10),
+    'medium': dict(commits=10_000, files=10_000, untracked=10_000, readme_lines=100_000, targets=100),
+    'large': dict(commits=100_000, files=100_000, untracked=50_000, readme_lines=500_000, targets=300),
+    'huge': dict(commits=500_000, files=100_000, untracked=100_000, readme_lines=1_000_000, targets=500),
+}
+
+FILES_PER_DIRECTORY = 1_000
+# The commit create_repository ends with, reset_repository brings the repository back to it
+BUILT_REF = 'refs/bench/built'
+PLACEHOLDERS = '<!-- VERSION --> <!-- COMMIT --> <!-- BRANCH --> <!-- COMMIT_COUNT -->'
+
+PYPROJECT = """[tool.poetry]
+name = "bench"
+version = "0.1.0"
+description = "A synthetic package"
+authors = ["Bench <bench@example.com>"]
+packages = [{{ include = "bench" }}]
+
+[tool.versions]
+version = "0.1.0"
+
+[tool.versions.settings]
+commit = true
+commit_on_argument = ["major", "minor", "patch"]
+commit_on_branches = ["main"]
+commit_mode = "{commit_mode}"
+filename = [
+{filename}]
+"""
+
+
+def git(cwd, *args, **kwargs):
+    return subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True, **kwargs).stdout
+
+
+def tracked_path(index):
+    return f'src/d{index // FILES_PER_DIRECTORY:04d}/f{index:07d}.txt'
+
+
+def untracked_path(index):
+    return f'untracked/d{index // FILES_PER_DIRECTORY:04d}/u{index:07d}.txt'
+
+
+def target_path(index):
+    return f'docs/target{index:04d}.md'
+
+
+def fast_import_stream(commits, files, targets, commit_mode='all'):
+    """
+    Generate a `git fast-import` stream: the first commit adds the whole project, every other commit
+    changes a single file, which is the quickest way to build long histories.
+    """
+    blob = b'content\n'
+    yield b'blob\nmark :1\ndata %d\n%s\n' % (len(blob), blob)
+
+    filename = ''.join(f'    "{target_path(index)}",\n' for index in range(targets))
+    project = {
+        'pyproject.toml': PYPROJECT.format(filename=filename + '    "bench/versions.py",\n', commit_mode=commit_mode),
+        'bench/__init__.py': '',
+        'bench/versions.py': '',
+        **{target_path(index): f'# Target {index}\n\n{PLACEHOLDERS}\n' for index in range(targets)},
+    }
+
+    for number in range(1, commits + 1):
+        message = b'commit %d\n' % number
+        parts = [b'commit refs/heads/main\ncommitter Bench <bench@example.com> %d +0000\ndata %d\n%s'
+                 % (1_600_000_000 + number, len(message), message)]
+
+        if number == 1:
+            parts += [b'M 100644 :1 %s\n' % tracked_path(index).encode() for index in range(files)]
+            for path, content in project.items():
+                data = content.encode('utf-8')
+                parts.append(b'M 100644 inline %s\ndata %d\n%s\n' % (path.encode(), len(data), data))
+        else:
+            data = b'%d\n' % number
+            parts.append(b'M 100644 inline history.txt\ndata %d\n%s\n' % (len(data), data))
+
+        yield b''.join(parts) + b'\n'
+
+
+def write_readme(path, lines):
+    """Write a README of `lines` lines, with a line of placeholders every hundred lines."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(lines):
+            f.write(f'{PLACEHOLDERS}\n' if index % 100 == 0 else f'Line {index} of a large README file.\n')
+
+
+def write_untracked(root, count):
+    """Create `count` untracked files, spread over directories like build outputs."""
+    for index in range(count):
+        path = os.path.join(root, untracked_path(index))
+        if index % FILES_PER_DIRECTORY == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('untracked\n')
+
+
+def create_repository(root, commits, files, untracked, readme_lines, targets, commit_mode='all'):
+    """
+    Build a synthetic Poetry project in a fresh git repository at `root`.
+
+    :param root: The directory of the repository, created if needed.
+    :param commits: Number of commits of the main branch.
+    :param files: Number of tracked files, besides the project files.
+    :param untracked: Number of untracked files left in the working tree.
+    :param readme_lines: Number of lines of the committed README.md.
+    :param targets: Number of Markdown `filename` targets with placeholders.
+    :param commit_mode: The `commit_mode` setting of the project.
+    :return: `root`.
+    """
+    os.makedirs(root, exist_ok=True)
+    git(root, 'init', '-q', '-b', 'main')
+    git(root, 'config', 'user.email', 'bench@example.com')
+    git(root, 'config', 'user.name', 'Bench')
+
+    process = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=root, stdin=subprocess.PIPE)
+    for chunk in fast_import_stream(commits, files, targets, commit_mode):
+        process.stdin.write(chunk)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f'git fast-import failed in {root}')
+
+    git(root, 'checkout', '-q', '-f', 'main')
+
+    write_readme(os.path.join(root, 'README.md'), readme_lines)
+    git(root, 'add', 'README.md')
+    git(root, 'commit', '-q', '-m', 'Add README')
+    git(root, 'update-ref', BUILT_REF, 'HEAD')
+
+    write_untracked(root, untracked)
+    return root
+
+
+def reset_repository(root, untracked):
+    """
+    Bring a repository built by create_repository back to its initial state, undoing the commits and the
+    changes of the benchmarks: main on the built commit, a clean index and working tree, and `untracked`
+    untracked files.
+
+    :param root: The directory of the repository.
+    :param untracked: Number of untracked files the repository was built with.
+    """
+    git(root, 'checkout', '-q', '-f', '-B', 'main', BUILT_REF)
+    git(root, 'clean', '-q', '-f', '-d', '-e', 'untracked/')
+    # A commit of the whole working tree made them tracked, resetting to the built commit deleted them
+    if untracked and not os.path.exists(os.path.join(root, untracked_path(untracked - 1))):
+        write_untracked(root, untracked)
@@ -0,0 +1,221 @@
+"""
+Time the plugin services on synthetic repositories and save the results as JSON.
+
+    python -m benchmarks.run --size small medium --repeat 5
+
+Repositories are built under --workdir (a temporary directory by default). Building the large ones takes a
+while, pass a --workdir to keep and reuse them between runs. The benchmarks that commit run on a repository
+reset to the built commit, with its untracked files, so every run measures the same repository. Each run writes
+one JSON file per size into --output, named after the plugin version, so results can be compared between releases.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.repos import BUILT_REF, SIZES, create_repository, git, reset_repository
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+
+
+def quiet(*args, **kwargs):
+    """A write_line that drops every message."""
+
+
+def measure(func, repeat, setup=None):
+    """
+    Call `func` `repeat` times and return its timings in seconds.
+
+    `setup` is called before each call, outside of the timing, and its result is passed to `func`.
+    """
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        # commit_local_changes and update_readme print to stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(argument)
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def benchmarks(root, untracked):
+    """
+    The benchmarks to run against the repository at `root` (the current directory), as (name, func, setup).
+
+    `untracked` is the number of untracked files the repository was built with, see repos.reset_repository.
+    """
+    from poetry.pyproject.toml import PyProjectTOML
+
+    from poetry_versions_plugin import services
+    from poetry_versions_plugin.settings import Settings
+    from poetry_versions_plugin.targets import update_targets
+
+    settings = Settings.from_pyproject(PyProjectTOML(root / 'pyproject.toml'))
+    counter = iter(range(1, sys.maxsize))
+
+    def info():
+        return dict(services.get_git_info(version=f'0.1.{next(counter)}', cache=False))
+
+    def reset_history_checkpoints():
+        shutil.rmtree(root / '.git' / 'poetry-versions', ignore_errors=True)
+
+    def restore_files():
+        git(root, 'checkout', '-q', '--', 'README.md', 'docs')
+        return info()
+
+    def reset():
+        # Undo the previous commit, which grew the history and, in `all` mode, tracked the untracked files
+        reset_repository(root, untracked)
+
+    def change_versions_file():
+        reset()
+        version_info = info()
+        services.update_py_file('bench/versions.py', version_info, quiet)
+        return ['bench/versions.py']
+
+    def application_tester():
+        reset()
+
+        from cleo.testers.application_tester import ApplicationTester
+        from poetry.console.application import Application
+
+        from poetry_versions_plugin.plugin import VersionsApplicationPlugin
+
+        application = Application()
+        application.auto_exits(False)
+        VersionsApplicationPlugin().activate(application)
+        return ApplicationTester(application)
+
+    def bump(tester):
+        if tester.execute('version patch') != 0:
+            raise RuntimeError(tester.io.fetch_error())
+
+    return [
+        ('get_git_info (cold)', lambda _: services.get_git_info(cache=False), reset_history_checkpoints),
+        ('get_git_info (checkpoint)', lambda _: services.get_git_info(cache=False), None),
+        ('get_git_info (cached)', lambda _: services.get_git_info(), None),
+        ('get_dirty_state (untracked)', lambda _: services.get_dirty_state(), None),
+        ('update_readme', lambda version_info: services.update_readme('README.md', version_info), restore_files),
+        ('update_py_file', lambda version_info: services.update_py_file('bench/versions.py', version_info, quiet),
+         info),
+        ('update_pyproject',
+         lambda version_info: services.update_pyproject(version_info, PyProjectTOML(root / 'pyproject.toml'), quiet),
+         info),
+        ('update_targets', lambda version_info: update_targets(settings.filename, version_info, quiet),
+         restore_files),
+        ('commit_local_changes (all)',
+         lambda paths: services.commit_local_changes(root, 'bench: all', paths=paths), change_versions_file),
+        ('commit_local_changes (paths)',
+         lambda paths: services.commit_local_changes(root, 'bench: paths', paths=paths, only_paths=True),
+         change_versions_file),
+        ('version bump', bump, application_tester),
+    ]
+
+
+def run_size(size, workdir, repeat, only=None):
+    """Build (or reuse) the repository of `size` and run the benchmarks in it."""
+    root = Path(workdir, size).resolve()
+    if (root / '.git').exists() and subprocess.run(['git', 'rev-parse', '-q', '--verify', BUILT_REF], cwd=root,
+                                                   capture_output=True).returncode != 0:
+        print(f'{root} was built by an older version, rebuilding...', file=sys.stderr)
+        shutil.rmtree(root)
+    if not (root / '.git').exists():
+        print(f'building {size} repository in {root}...', file=sys.stderr)
+        start = time.perf_counter()
+        create_repository(root, **SIZES[size])
+        print(f'built in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    # A kept repository is benchmarked in the state it was built in
+    reset_repository(root, SIZES[size]['untracked'])
+    results = []
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        for name, func, setup in benchmarks(root, SIZES[size]['untracked']):
+            if only and not any(pattern in name for pattern in only):
+                continue
+
+            timings = measure(func, repeat, setup)
+            results.append({
+                'name': name,
+                'timings': timings,
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.mean(timings),
+            })
+            print(f'{size:>8} {name:<32} min {min(timings):9.4f}s  median {statistics.median(timings):9.4f}s',
+                  file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        reset_repository(root, SIZES[size]['untracked'])
+
+    return results
+
+
+def environment():
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        plugin_version = version('poetry-versions-plugin')
+    except PackageNotFoundError:
+        # Not installed, e.g. run from a checkout
+        from poetry.pyproject.toml import PyProjectTOML
+
+        plugin_version = PyProjectTOML(Path(__file__).parents[1] / 'pyproject.toml').data['tool']['poetry']['version']
+
+    return {
+        'plugin_version': plugin_version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'git': subprocess.check_output(['git', '--version'], text=True).strip(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark poetry-versions-plugin on synthetic repositories.')
+    parser.add_argument('--size', nargs='+', choices=list(SIZES), default=['small'],
+                        help='repository sizes to benchmark (default: small)')
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per benchmark (default: 5)')
+    parser.add_argument('--only', nargs='+', help='only run the benchmarks whose name contains one of these')
+    parser.add_argument('--workdir', help='directory to build the repositories in, kept for later runs')
+    parser.add_argument('--output', default=str(RESULTS_DIR),
+                        help=f'directory of the JSON results (default: {RESULTS_DIR})')
+    args = parser.parse_args(argv)
+
+    meta = environment()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='poetry-versions-bench-')
+    os.makedirs(args.output, exist_ok=True)
+
+    try:
+        for size in args.size:
+            report = {
+                **meta,
+                'size': size,
+                'parameters': SIZES[size],
+                'repeat': args.repeat,
+                'results': run_size(size, workdir, args.repeat, args.only),
+            }
+            path = os.path.join(args.output, f'{meta["plugin_version"]}-{size}.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f'results saved to {path}', file=sys.stderr)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
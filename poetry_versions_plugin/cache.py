@@ -0,0 +1,91 @@
+import json
+import os
+
+from poetry_versions_plugin.commits import CHECKPOINT_DIR, graft_signature
+from poetry_versions_plugin.output import write_if_changed
+from poetry_versions_plugin.refs import read_head
+
+CACHE_FILE = 'git-info.json'
+CACHE_FORMAT = 2
+
+
+def cache_path(repo, path=None):
+    """
+    Return the path of the git information cache.
+
+    By default the cache lives in the git directory of the worktree, since each worktree has its own HEAD.
+
+    :param repo: The git.Repo instance.
+    :param path: A custom path, relative to the repository root.
+    """
+    if path:
+        return os.path.join(repo.working_tree_dir, path)
+
+    return os.path.join(repo.git_dir, CHECKPOINT_DIR, CACHE_FILE)
+
+
+def cache_key(repo):
+    """
+    Return the key identifying the repository state the cached information was computed for.
+
+    The key holds the content of HEAD (the checked out branch, or the commit for a detached HEAD), the SHA it
+    resolves to and the shallow and graft state (see commits.graft_signature), which changes the commit count of
+    a clone deepened or unshallowed without HEAD moving. The refs are read from the files (see refs.read_head),
+    no git process is started. The index is not part of the key: the dirty state depends on the working tree too,
+    so it is never cached.
+
+    :param repo: The git.Repo instance.
+    :return: The key as a dictionary, or None if HEAD cannot be read.
+    """
+    try:
+        with open(os.path.join(repo.git_dir, 'HEAD'), 'r') as f:
+            head = f.read().strip()
+        resolved = read_head(repo.git_dir, repo.common_dir)
+        sha = resolved[1] if resolved is not None else repo.head.commit.hexsha
+    except (OSError, ValueError):
+        return None
+
+    return {'format': CACHE_FORMAT, 'head': head, 'sha': sha, 'grafts': graft_signature(repo)}
+
+
+def load_git_info(path, key):
+    """
+    Load the cached git information if it was computed for `key`.
+
+    Missing, corrupt or stale cache files are ignored.
+
+    :param path: Path to the cache file.
+    :param key: The key returned by cache_key.
+    :return: The cached information dictionary, or None.
+    """
+    if key is None:
+        return None
+
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data['key'] != key:
+            return None
+        return dict(data['info'])
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+
+
+def store_git_info(path, key, info):
+    """
+    Store git information in the cache, ignoring failures (e.g. a read-only git directory).
+
+    The file is replaced atomically, so concurrent readers see either the old or the new entry.
+
+    :param path: Path to the cache file.
+    :param key: The key returned by cache_key.
+    :param info: The information dictionary, JSON serializable.
+    """
+    if key is None:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_if_changed(path, json.dumps({'key': key, 'info': info}))
+    except OSError:
+        pass
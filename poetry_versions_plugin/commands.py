@@ -0,0 +1,113 @@
+from cleo.helpers import argument, option
+from cleo.io.outputs.output import Verbosity
+from poetry.console.commands.command import Command
+
+from poetry_versions_plugin.utils import Logger
+
+
+class WorkspaceCommand(Command):
+    name = 'versions workspace'
+    description = 'Bumps the version of every package of the git repository, with a single git scan and commit.'
+
+    arguments = [
+        argument('version', 'The version number or the rule to update the versions.'),
+    ]
+    options = [
+        option('dry-run', None, 'Do not update any file.'),
+        option('allow-dirty', None, 'Bump even if the repository has uncommitted changes.'),
+        option('no-commit', None, 'Do not commit the changes.'),
+        option('message', 'm', 'The commit message, {versions} is replaced with the bumped versions.', flag=False),
+        option('workers', None, 'The maximum number of packages bumped concurrently.', flag=False),
+    ]
+
+    help = """\
+The <c1>versions workspace</> command bumps every package of the repository whose pyproject.toml has a
+<comment>[tool.versions.settings]</> table, updates their <comment>filename</> targets and commits all
+the changes together. The git information is gathered once for all packages.
+
+The packages are searched among the pyproject.toml files tracked by git, restrict them with the
+<comment>workspace_members</> setting of the root pyproject.toml, e.g. ["packages/*/pyproject.toml"].
+"""
+
+    def handle(self) -> int:
+        from poetry_versions_plugin.workspace import bump_workspace
+
+        write_line = Logger(self.io, 'workspace')
+        workers = self.option('workers')
+
+        try:
+            members = bump_workspace(
+                self.argument('version'), write_line,
+                dry_run=self.option('dry-run'),
+                allow_dirty=self.option('allow-dirty'),
+                commit=not self.option('no-commit'),
+                commit_message=self.option('message'),
+                workers=int(workers) if workers else None,
+            )
+        except ValueError as ex:
+            self.line_error(f'<error>{ex}</>')
+            return 1
+
+        for member in members:
+            if member.error is not None:
+                self.line_error(f'<error>{member.name}: {member.error}</>')
+            else:
+                self.line(f'Bumping <c1>{member.name}</> from <b>{member.current_version}</>'
+                          f' to <fg=green>{member.new_version}</>')
+                write_line('{} updated {}', member.name, ', '.join(member.changed) or 'no files',
+                           verbosity=Verbosity.VERBOSE)
+
+        return 1 if any(member.error is not None for member in members) else 0
+
+
+class WatchCommand(Command):
+    name = 'versions watch'
+    description = 'Keeps the generated version files current as HEAD, the branches and the index change.'
+
+    options = [
+        option('debounce', None, 'Milliseconds without change ending a burst of changes.', flag=False, default='50'),
+        option('poll', None, 'Poll the git directory instead of using inotify.'),
+        option('interval', None, 'Milliseconds between two polls.', flag=False, default='200'),
+    ]
+
+    help = """\
+The <c1>versions watch</> command runs until interrupted and regenerates the Python <comment>filename</> targets
+(and their stubs with <comment>version_structures</>) after a change of HEAD, a branch or the index, e.g. a checkout,
+a commit, a rebase or <c1>git add</>, if the branch, the commit, the commit count, the dirty state or the version in
+pyproject.toml differ from the last update.
+
+Only the git directory is watched: editing pyproject.toml or a tracked file without staging it is picked up
+by the next git change. Changes are read from inotify on Linux, and polled elsewhere or with <comment>--poll</>.
+Text targets are not updated: their placeholders are replaced by <c1>poetry version</>.
+"""
+
+    def handle(self) -> int:
+        from poetry_versions_plugin.settings import Settings
+        from poetry_versions_plugin.watch import watch
+
+        write_line = Logger(self.io, 'watch')
+        pyproject = self.poetry.pyproject
+
+        try:
+            settings = Settings.from_pyproject(pyproject)
+            debounce = int(self.option('debounce')) / 1000
+            interval = int(self.option('interval')) / 1000
+        except ValueError as ex:
+            self.line_error(f'<error>{ex}</>')
+            return 1
+
+        if not any(path.endswith('.py') for path in settings.filename):
+            self.line_error('<error>No Python file listed in filename, nothing to watch for.</>')
+            return 1
+
+        self.line('Watching the repository, press Ctrl+C to stop.')
+        try:
+            watch(pyproject.file.path.parent, settings, write_line, debounce=debounce, polling=self.option('poll'),
+                  interval=interval)
+        except ValueError as ex:
+            self.line_error(f'<error>{ex}</>')
+            return 1
+        except KeyboardInterrupt:
+            pass
+
+        return 0
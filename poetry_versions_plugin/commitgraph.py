@@ -0,0 +1,195 @@
+import mmap
+import os
+import struct
+
+SIGNATURE = b'CGPH'
+HASH_LENGTHS = {1: 20, 2: 32}
+# Parent positions with special meanings
+NO_PARENT = 0x70000000
+EXTRA_EDGES = 0x80000000
+LAST_EDGE = 0x80000000
+
+
+class CommitGraphError(ValueError):
+    """The commit-graph file is not in a supported format."""
+
+
+class CommitGraphFile:
+    """
+    One memory-mapped commit-graph file, see git's Documentation/gitformat-commit-graph.txt.
+
+    Only the chunks needed to walk the history are used: the OID fanout and lookup tables,
+    the commit data (parents and topological levels) and the extra edges of octopus merges.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            signature, version, hash_version, chunk_count = struct.unpack_from('>4sBBB', self.data)
+            chunks = {}
+            for index in range(chunk_count):
+                chunk_id, offset = struct.unpack_from('>4sQ', self.data, 8 + index * 12)
+                chunks[chunk_id] = offset
+        except struct.error:
+            signature = None
+
+        if signature != SIGNATURE or version != 1 or hash_version not in HASH_LENGTHS \
+                or not {b'OIDF', b'OIDL', b'CDAT'} <= chunks.keys():
+            self.close()
+            raise CommitGraphError(f'Unsupported commit-graph file {path}')
+
+        self.hash_length = HASH_LENGTHS[hash_version]
+        self.fanout = chunks[b'OIDF']
+        self.lookup = chunks[b'OIDL']
+        self.commit_data = chunks[b'CDAT']
+        self.extra_edges = chunks.get(b'EDGE')
+        self.count = struct.unpack_from('>I', self.data, self.fanout + 255 * 4)[0]
+
+    def close(self):
+        self.data.close()
+
+    def find(self, binsha):
+        """Return the position of a commit in this file, or None."""
+        first = binsha[0]
+        low = struct.unpack_from('>I', self.data, self.fanout + (first - 1) * 4)[0] if first else 0
+        high = struct.unpack_from('>I', self.data, self.fanout + first * 4)[0]
+        length = self.hash_length
+
+        while low < high:
+            middle = (low + high) // 2
+            offset = self.lookup + middle * length
+            current = self.data[offset:offset + length]
+            if current == binsha:
+                return middle
+            if current < binsha:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def entry(self, position):
+        """Return (parent positions, topological level) of the commit at `position` of this file."""
+        offset = self.commit_data + position * (self.hash_length + 16) + self.hash_length
+        parent1, parent2, level = struct.unpack_from('>III', self.data, offset)
+
+        parents = []
+        if parent1 != NO_PARENT:
+            parents.append(parent1)
+        if parent2 & EXTRA_EDGES and parent2 != NO_PARENT:
+            index = parent2 & ~EXTRA_EDGES
+            while self.extra_edges is not None:
+                edge = struct.unpack_from('>I', self.data, self.extra_edges + index * 4)[0]
+                parents.append(edge & ~LAST_EDGE)
+                if edge & LAST_EDGE:
+                    break
+                index += 1
+        elif parent2 != NO_PARENT:
+            parents.append(parent2)
+
+        # The upper 30 bits hold the topological level, the lower 34 bits the commit date
+        return parents, level >> 2
+
+
+class CommitGraph:
+    """
+    The commit-graph of a repository, a single file or a chain of split files, read without starting git.
+
+    Positions are global: the commits of the base files of a chain come first, as in git.
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.offsets = []
+        total = 0
+        for graph_file in files:
+            self.offsets.append(total)
+            total += graph_file.count
+        self.count = total
+
+    @classmethod
+    def open(cls, objects_dir):
+        """
+        Open the commit-graph of an objects directory.
+
+        :param objects_dir: The `objects` directory of the common git directory.
+        :return: A CommitGraph, or None if the repository has no (supported) commit-graph.
+        """
+        info_dir = os.path.join(objects_dir, 'info')
+        try:
+            with open(os.path.join(info_dir, 'commit-graphs', 'commit-graph-chain'), 'r') as f:
+                paths = [os.path.join(info_dir, 'commit-graphs', f'graph-{line.strip()}.graph')
+                         for line in f if line.strip()]
+        except OSError:
+            paths = [os.path.join(info_dir, 'commit-graph')]
+
+        files = []
+        try:
+            for path in paths:
+                files.append(CommitGraphFile(path))
+        except (OSError, ValueError):
+            for graph_file in files:
+                graph_file.close()
+            return None
+
+        return cls(files)
+
+    def close(self):
+        for graph_file in self.files:
+            graph_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def find(self, hexsha):
+        """Return the global position of a commit, or None if it is not in the graph."""
+        binsha = bytes.fromhex(hexsha)
+        # Recent commits are in the top file of a chain
+        for graph_file, offset in zip(reversed(self.files), reversed(self.offsets)):
+            position = graph_file.find(binsha)
+            if position is not None:
+                return offset + position
+        return None
+
+    def entry(self, position):
+        """Return (parent positions, topological level) of the commit at a global position."""
+        for graph_file, offset in zip(reversed(self.files), reversed(self.offsets)):
+            if position >= offset:
+                return graph_file.entry(position - offset)
+        raise IndexError(position)
+
+    def is_ancestor(self, ancestor, descendant):
+        """
+        Check whether the commit `ancestor` is reachable from `descendant`.
+
+        The walk never visits commits whose topological level is lower than the one of `ancestor`,
+        since an ancestor always has a lower level than its descendants.
+
+        :return: True or False, or None if one of the commits is not in the graph.
+        """
+        target = self.find(ancestor)
+        start = self.find(descendant)
+        if target is None or start is None:
+            return None
+
+        target_level = self.entry(target)[1]
+        seen = {start}
+        stack = [start]
+        while stack:
+            position = stack.pop()
+            if position == target:
+                return True
+            parents, level = self.entry(position)
+            # A level of zero means it was not computed (written by an old git), nothing can be pruned then
+            if level and target_level and level <= target_level:
+                continue
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    stack.append(parent)
+
+        return False
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+
+import git
+
+from poetry_versions_plugin.commitgraph import CommitGraph
+
+CHECKPOINT_DIR = 'poetry-versions'
+CHECKPOINT_FILE = 'commit-count.json'
+
+DEFAULT_COMMIT_COUNTER = 'incremental'
+# Files of the common git directory changing which commits are reachable from a ref, without the ref moving
+GRAFT_FILES = ('shallow', os.path.join('info', 'grafts'))
+
+
+def count_commits_iter(repo, rev):
+    """
+    Count the commits reachable from `rev` by walking the history with GitPython.
+
+    This parses every commit object in Python and is only kept as a reference backend.
+
+    :param repo: The git.Repo instance.
+    :param rev: The revision to count from, e.g. a branch name.
+    :return: The number of commits reachable from `rev`.
+    """
+    return sum(1 for _ in repo.iter_commits(rev))
+
+
+def count_commits_rev_list(repo, rev):
+    """
+    Count the commits reachable from `rev` with native `git rev-list --count`.
+
+    Git uses the commit-graph file automatically when one has been written.
+
+    :param repo: The git.Repo instance.
+    :param rev: The revision to count from, e.g. a branch name.
+    :return: The number of commits reachable from `rev`.
+    """
+    return int(repo.git.rev_list('--count', rev))
+
+
+def checkpoint_path(repo):
+    """
+    Return the path of the commit count checkpoint file of the repository.
+
+    The checkpoint lives in the common git directory, so it is shared between worktrees.
+    """
+    return os.path.join(repo.common_dir, CHECKPOINT_DIR, CHECKPOINT_FILE)
+
+
+def graft_signature(repo):
+    """
+    Return a signature of the shallow and graft state of the repository.
+
+    Deepening or unshallowing a clone (`shallow`) and editing grafts (`info/grafts`) change the number of commits
+    reachable from a commit, so counts computed before are stale even though HEAD did not move.
+
+    :param repo: The git.Repo instance.
+    :return: A hash of these files, or None if the repository has none of them (the usual case).
+    """
+    digest = None
+    for name in GRAFT_FILES:
+        try:
+            with open(os.path.join(repo.common_dir, name), 'rb') as f:
+                content = f.read()
+        except OSError:
+            continue
+        digest = digest or hashlib.sha1()
+        digest.update(f'{name}\0{len(content)}\0'.encode('utf-8'))
+        digest.update(content)
+
+    return digest.hexdigest() if digest is not None else None
+
+
+def load_checkpoint(path, signature=None):
+    """
+    Load a commit count checkpoint.
+
+    :param path: Path to the checkpoint file.
+    :param signature: The current graft_signature, a checkpoint saved with another one is ignored.
+    :return: A tuple (sha, count), or None if the checkpoint is missing, unreadable or stale.
+    """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('grafts') != signature:
+            return None
+        return str(data['sha']), int(data['count'])
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+def save_checkpoint(path, sha, count, signature=None):
+    """
+    Persist a commit count checkpoint, ignoring failures (e.g. a read-only git directory).
+
+    :param path: Path to the checkpoint file.
+    :param sha: The full SHA the count was computed for.
+    :param count: The number of commits reachable from `sha`.
+    :param signature: The graft_signature the count was computed with.
+    """
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'sha': sha, 'count': count, 'grafts': signature}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def is_ancestor(repo, ancestor, descendant):
+    """
+    Check whether `ancestor` is reachable from `descendant`.
+
+    The commit-graph file is walked directly when both commits are in it, otherwise `git merge-base` is run.
+    """
+    graph = CommitGraph.open(os.path.join(repo.common_dir, 'objects'))
+    if graph is not None:
+        with graph:
+            result = graph.is_ancestor(ancestor, descendant)
+        if result is not None:
+            return result
+
+    return repo.is_ancestor(ancestor, descendant)
+
+
+def count_commits_incremental(repo, rev):
+    """
+    Count the commits reachable from `rev`, reusing the persisted checkpoint when possible.
+
+    If the checkpointed commit is an ancestor of `rev`, only the commits added since then are
+    counted, because count(rev) = count(checkpoint) + count(checkpoint..rev) in that case.
+    Otherwise (rewritten history, other branch, missing checkpoint, a clone deepened since) a full native
+    count is done.
+
+    :param repo: The git.Repo instance.
+    :param rev: The revision to count from, e.g. a branch name.
+    :return: The number of commits reachable from `rev`.
+    """
+    sha = repo.commit(rev).hexsha
+    path = checkpoint_path(repo)
+    signature = graft_signature(repo)
+    checkpoint = load_checkpoint(path, signature)
+
+    count = None
+    if checkpoint is not None:
+        checkpoint_sha, checkpoint_count = checkpoint
+        if checkpoint_sha == sha:
+            return checkpoint_count
+
+        try:
+            if is_ancestor(repo, checkpoint_sha, sha):
+                count = checkpoint_count + int(repo.git.rev_list('--count', f'{checkpoint_sha}..{sha}'))
+        except git.GitCommandError:
+            # The checkpointed commit is gone (e.g. garbage collected), count from scratch.
+            count = None
+
+    if count is None:
+        count = count_commits_rev_list(repo, sha)
+
+    save_checkpoint(path, sha, count, signature)
+    return count
+
+
+COMMIT_COUNTERS = {
+    'iter': count_commits_iter,
+    'rev-list': count_commits_rev_list,
+    'incremental': count_commits_incremental,
+}
+
+
+def count_commits(repo, rev, backend=None):
+    """
+    Count the commits reachable from `rev` with the selected backend.
+
+    :param repo: The git.Repo instance.
+    :param rev: The revision to count from, e.g. a branch name.
+    :param backend: One of the COMMIT_COUNTERS names, defaults to 'incremental'.
+    :return: The number of commits reachable from `rev`.
+    :raises: ValueError if the backend is unknown.
+    """
+    backend = backend or DEFAULT_COMMIT_COUNTER
+    try:
+        counter = COMMIT_COUNTERS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown commit counter '{backend}', expected one of: {', '.join(COMMIT_COUNTERS)}")
+
+    return counter(repo, rev)
@@ -0,0 +1,113 @@
+import filecmp
+import os
+import shutil
+import threading
+
+
+def temp_path(path):
+    """
+    Create an empty temporary file next to `path` and return its path.
+
+    The file is created with the default permissions (0666 minus the umask), in the same directory,
+    so that it can atomically replace `path` with os.replace.
+    """
+    path = os.fspath(path)
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666))
+    return tmp_path
+
+
+def discard(tmp_path):
+    """Remove a temporary file created by temp_path, if it still exists."""
+    if tmp_path is not None and os.path.exists(tmp_path):
+        os.unlink(tmp_path)
+
+
+def is_changed(path, data):
+    """
+    Check whether writing `data` would change the file at `path`.
+
+    :param path: Path to the file.
+    :param data: The new content, as bytes.
+    :return: True if the file does not exist or its content differs from `data`.
+    """
+    try:
+        if os.stat(path).st_size != len(data):
+            return True
+        with open(path, 'rb') as f:
+            return f.read() != data
+    except FileNotFoundError:
+        return True
+
+
+def stage_content(path, content, encoding='utf-8'):
+    """
+    Write `content` to a temporary file next to `path`, to be applied later with apply_staged.
+
+    :param path: Path to the file.
+    :param content: The new content, str or bytes.
+    :param encoding: Encoding used if `content` is a str.
+    :return: The path of the temporary file, or None if the file already has this content.
+    """
+    data = content.encode(encoding) if isinstance(content, str) else content
+    if not is_changed(path, data):
+        return None
+
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        discard(tmp_path)
+        raise
+
+    return tmp_path
+
+
+def apply_staged(tmp_path, path):
+    """
+    Atomically replace `path` with the temporary file `tmp_path`, keeping the permissions of `path`.
+    """
+    try:
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        discard(tmp_path)
+
+
+def replace_if_changed(tmp_path, path):
+    """
+    Atomically replace `path` with the temporary file `tmp_path`, unless their contents are identical.
+
+    The temporary file is removed in any case.
+
+    :return: True if `path` was replaced.
+    """
+    if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+        discard(tmp_path)
+        return False
+
+    apply_staged(tmp_path, path)
+    return True
+
+
+def write_if_changed(path, content, encoding='utf-8'):
+    """
+    Write `content` to `path` atomically, skipping the write if the file already has this content.
+
+    Unchanged files keep their mtime, so tools keyed on it do not rebuild, and readers never
+    see a half-written file since the new content is renamed over the old one.
+
+    :param path: Path to the file.
+    :param content: The new content, str or bytes.
+    :param encoding: Encoding used if `content` is a str.
+    :return: True if the file was written.
+    """
+    tmp_path = stage_content(path, content, encoding)
+    if tmp_path is None:
+        return False
+
+    apply_staged(tmp_path, path)
+    return True
@@ -1,20 +1,27 @@
-import re
+# Poetry imports this module for every command, so it only imports what is needed to register the listeners.
+# The version command, GitPython and the services are imported once a version command is handled.
+from __future__ import annotations
+
+import os
+import time
+from typing import TYPE_CHECKING
 
 from cleo.events import console_events
-from cleo.events.console_command_event import ConsoleCommandEvent
-from cleo.events.event_dispatcher import EventDispatcher
-from cleo.io.io import IO
 from cleo.io.outputs.output import Verbosity
-from poetry.console.application import Application
-from poetry.console.commands.version import VersionCommand
 from poetry.plugins.application_plugin import ApplicationPlugin
 from poetry.plugins.plugin import Plugin
-from poetry.poetry import Poetry
 
 from poetry_versions_plugin import PLUGIN_NAME
-from poetry_versions_plugin.services import get_git_info, update_pyproject, update_py_file
-from poetry_versions_plugin.services import update_readme, commit_local_changes
-from poetry_versions_plugin.utils import pyproject_get, wrap_write_line
+from poetry_versions_plugin.settings import Settings
+from poetry_versions_plugin.utils import Logger, with_logger
+
+if TYPE_CHECKING:
+    from cleo.commands.command import Command
+    from cleo.events.console_command_event import ConsoleCommandEvent
+    from cleo.events.event_dispatcher import EventDispatcher
+    from cleo.io.io import IO
+    from poetry.console.application import Application
+    from poetry.poetry import Poetry
 
 
 class VersionsPlugin(Plugin):
@@ -25,13 +32,59 @@ class VersionsPlugin(Plugin):
         io.write_line(f'<b>{PLUGIN_NAME}</b>: activate finished', Verbosity.VERBOSE)
 
 
-def write_line(message: str, verbosity: Verbosity = Verbosity.VERBOSE):
+WORKSPACE_COMMAND = 'versions workspace'
+
+
+def workspace_command_factory() -> Command:
+    from poetry_versions_plugin.commands import WorkspaceCommand
+
+    return WorkspaceCommand()
+
+
+WATCH_COMMAND = 'versions watch'
+
+
+def watch_command_factory() -> Command:
+    from poetry_versions_plugin.commands import WatchCommand
+
+    return WatchCommand()
+
+
+def is_version_command(command: Command) -> bool:
     """
-    This function is a placeholder for @wrap_write_line decorator.
-    It helps for pycharm or pylint to recognize the function.
-    It is replaced by the actual implementation in wrap_write_line.
+    Check whether the command is Poetry's version command.
+
+    The name is compared first, so the version command module is only imported
+    when it is the running command (and thus already loaded by Poetry).
     """
-    print(message, verbosity)
+    if command is None or command.name != 'version':
+        return False
+
+    from poetry.console.commands.version import VersionCommand
+
+    return isinstance(command, VersionCommand)
+
+
+def untracked_files_scan(settings: Settings, version_argument: str, current_version: str, dry_run: bool):
+    """
+    Decide whether the dirty scan of a bump looks for untracked files.
+
+    Only a commit in `all` mode stages them, so they are not scanned when no such commit can happen.
+
+    :return: False, or a callable telling from the current branch name (settings.match_branch).
+    """
+    from poetry_versions_plugin.versioning import next_version
+
+    if not settings.commit or settings.commit_mode != 'all' or dry_run:
+        return False
+    if version_argument not in settings.commit_on_argument:
+        # Otherwise the bump commits only if the argument is the new version, which a bump rule never is
+        try:
+            if next_version(current_version, version_argument) != version_argument:
+                return False
+        except ValueError:
+            pass
+    return settings.match_branch
 
 
 # noinspection PyUnusedLocal
@@ -39,54 +92,131 @@ class VersionsApplicationPlugin(ApplicationPlugin):
     def __init__(self):
         super().__init__()
         self.current_version = None
+        self.settings = None
+        self.tracer = None
+        self.trace_path = None
+        self.git_info_provider = None
         self.git_info = None
         self.new_version = None
 
     def activate(self, application: Application):
+        # The command module is only imported when the command is run
+        application.command_loader.register_factory(WORKSPACE_COMMAND, workspace_command_factory)
+        application.command_loader.register_factory(WATCH_COMMAND, watch_command_factory)
         # noinspection PyTypeChecker
         application.event_dispatcher.add_listener(console_events.COMMAND, self.before_version_command)
         # noinspection PyTypeChecker
         application.event_dispatcher.add_listener(console_events.TERMINATE, self.after_version_command)
 
+    @with_logger
     def before_version_command(
             self,
             event: ConsoleCommandEvent,
-            event_name: str,
-            dispatcher: EventDispatcher  # noqa
+            event_name: str,  # noqa
+            dispatcher: EventDispatcher,  # noqa
+            write_line: Logger
     ) -> None:
-        io = event.io
-        io.write_line(f'<b>{PLUGIN_NAME}</b>: before_version_command {event_name} init', Verbosity.VERBOSE)
+        write_line('init')
+
+        if not is_version_command(event.command):
+            return
+
+        # Set once the git probe succeeded: if this listener raises, cleo still dispatches TERMINATE
+        # without running the command, and the after hook must not update anything then
+        self.settings = None
 
-        if not isinstance(event.command, VersionCommand):
+        # Read-only queries (`poetry version`, `poetry version -s`) never read the settings nor open the repository
+        if not event.io.input.argument("version"):
+            write_line('No version bump specified, skipping.')
             return
 
+        start = time.perf_counter()
+
+        from poetry_versions_plugin.providers import LazyGitInfo
+        from poetry_versions_plugin.tracing import NULL_TRACER, TRACE_ENV, Tracer
+
         # noinspection PyUnresolvedReferences
         self.current_version = event.command.poetry.package.version.text
-        self.git_info = get_git_info(version=self.current_version)
-
-        io.write_line(f'<b>{PLUGIN_NAME}</b>: before_version_command {event_name} finished', Verbosity.VERBOSE)
+        # noinspection PyUnresolvedReferences
+        pyproject = event.command.poetry.pyproject
+        # Invalid settings raise here, aborting the bump before the version command rewrites pyproject.toml
+        settings_start = time.perf_counter()
+        settings = Settings.from_pyproject(pyproject)
+        settings_duration = time.perf_counter() - settings_start
+
+        # Phases are only timed when the trace is exported or the summary is shown (-vvv)
+        trace = os.environ.get(TRACE_ENV) or settings.trace
+        self.trace_path = os.path.join(pyproject.file.path.parent, trace) if trace else None
+        if self.trace_path or write_line.is_enabled(Verbosity.DEBUG):
+            self.tracer = Tracer(origin=start)
+        else:
+            self.tracer = NULL_TRACER
+        self.tracer.record('settings load', settings_start, settings_duration)
+
+        self.git_info_provider = LazyGitInfo(
+            version=self.current_version,
+            commit_counter=settings.commit_counter,
+            dirty_paths=settings.dirty_paths,
+            dirty_ignore=settings.dirty_ignore,
+            base_dir=pyproject.file.path.parent,
+            cache=settings.cache,
+            tracer=self.tracer,
+            provider=settings.git_info_provider,
+            env=settings.git_info_env,
+            file=settings.git_info_file,
+            timeout=settings.probe_timeout,
+            untracked_files=untracked_files_scan(settings, event.io.input.argument("version"),
+                                                 self.current_version, event.io.input.option('dry-run')),
+        )
+
+        # A bump has to inspect the repository before the version command rewrites pyproject.toml
+        with self.tracer.span('git probe'):
+            self.git_info_provider.get()
+        self.settings = settings
+
+        self.tracer.record('before_version_command', start, time.perf_counter() - start)
+        write_line('finished')
 
-    @wrap_write_line
+    @with_logger
     def after_version_command(
             self,
             event: ConsoleCommandEvent,
             event_name: str,  # noqa
-            dispatcher: EventDispatcher  # noqa
+            dispatcher: EventDispatcher,  # noqa
+            write_line: Logger
     ) -> None:
         write_line('init')
 
-        if not isinstance(event.command, VersionCommand):
+        if not is_version_command(event.command):
             write_line('not a version command, skip')
             return
 
         # Check if a version argument is provided
         version_argument = event.io.input.argument("version")
-        if not version_argument:
+        if not version_argument or self.settings is None:
             write_line('No version bump specified, skipping updates.')
             return
 
+        start = time.perf_counter()
+        try:
+            self.update_version(event, version_argument, write_line)
+        finally:
+            self.tracer.record('after_version_command', start, time.perf_counter() - start)
+            self.report_trace(write_line)
+
+        write_line('finished')
+
+    def update_version(self, event: ConsoleCommandEvent, version_argument: str, write_line: Logger) -> None:
+        """Update the configured files with the new version and the git information, and commit them."""
+        from poetry_versions_plugin.services import update_pyproject, commit_local_changes
+        from poetry_versions_plugin.targets import update_targets
+
+        tracer = self.tracer
         # noinspection PyUnresolvedReferences
         pyproject = event.command.poetry.pyproject
+        # The version command writes pyproject.toml from its own document, drop the one cached before
+        with tracer.span('pyproject reload'):
+            pyproject.reload()
         self.new_version = str(pyproject.data["tool"]["poetry"]["version"])
 
         write_line('start processing')
@@ -95,50 +225,58 @@ class VersionsApplicationPlugin(ApplicationPlugin):
         short = event.command.option('short')
 
         # 获取 Git 信息
+        self.git_info = self.git_info_provider.get()
         if not self.git_info:
             write_line('git information get failed')
             return
 
         self.git_info['version'] = self.new_version
 
-        allow_dirty = pyproject_get(pyproject, 'tool.versions.settings.allow_dirty', False)
-        updated = ['pyproject.toml']
-        update_pyproject(self.git_info, pyproject, write_line, dry_run)
-
-        files = pyproject_get(pyproject, 'tool.versions.settings.filename', [])
-        for file in files:
-            if file.endswith('.py'):
-                update_py_file(file, self.git_info, write_line, dry_run)
-                write_line(f'update python file {file}')
-                updated.append(file)
-            elif file == 'README.md':
-                # 更新 README.md 文件
-                update_readme(file, self.git_info, dry_run)
-                updated.append(file)
-
-        commit = pyproject_get(pyproject, 'tool.versions.settings.commit', False)
-        commit_on_argument = pyproject_get(pyproject, 'tool.versions.settings.commit_on_argument', [])
-        commit_on_branches = pyproject_get(pyproject, 'tool.versions.settings.commit_on_branches', [])
+        settings = self.settings
+        # 并发更新 filename 中的文件, 全部成功后才会替换原文件
+        with tracer.span('update targets'):
+            results = update_targets(settings.filename, self.git_info, write_line, dry_run,
+                                     fields=settings.fields, workers=settings.workers, tracer=tracer,
+                                     structures=settings.version_structures)
+        failed = [result for result in results if result.error is not None]
+        for result in failed:
+            write_line('failed to update {}: {}', result.path, result.error, verbosity=Verbosity.NORMAL)
+        if failed:
+            write_line('abort processing, no file listed in filename has been updated', verbosity=Verbosity.NORMAL)
+            return
+
+        updated = [os.path.relpath(pyproject.file.path)]
+        # Files whose content actually changed, unchanged files are not rewritten
+        with tracer.span('update pyproject'):
+            changed = updated[:1] if update_pyproject(self.git_info, pyproject, write_line, dry_run) else []
+
+        for result in results:
+            write_line('update file {}', result.path)
+            updated.append(result.path)
+            if result.changed:
+                changed.append(result.path)
 
         current_branch = self.git_info['branch']
-        branch_match = any(re.match(branch_pattern, current_branch) for branch_pattern in commit_on_branches)
+        branch_match = settings.match_branch(current_branch)
 
-        if commit and (version_argument in commit_on_argument or version_argument == self.new_version) and branch_match:
-            commit_message = pyproject_get(pyproject, 'tool.versions.settings.commit_message',
-                                           "Bump version: {current_version} → {new_version}")
+        if settings.commit and (version_argument in settings.commit_on_argument
+                                or version_argument == self.new_version) and branch_match:
+            commit_message = settings.commit_message
 
             if dry_run:
                 write_line('dry-run mode, skip commit to local git repository')
             else:
 
-                if self.git_info['is_dirty'] and not allow_dirty:
-                    write_line(f'git information {self.git_info}, repo is dirty, abort processing')
+                if self.git_info['is_dirty'] and not settings.allow_dirty:
+                    write_line('git information {}, repo is dirty, abort processing', self.git_info)
                     return
 
-                commit_local_changes(pyproject.file.path.parent, commit_message.format(
-                    current_version=self.current_version,
-                    new_version=self.new_version
-                ))
+                with tracer.span('commit', mode=settings.commit_mode):
+                    commit_local_changes(pyproject.file.path.parent, commit_message.format(
+                        current_version=self.current_version,
+                        new_version=self.new_version
+                    ), dirty_state=self.git_info_provider.dirty_state, paths=changed,
+                        only_paths=settings.commit_mode == 'paths')
 
             write_line('commit to local git repository: ' + commit_message.format(
                 current_version=self.current_version,
@@ -150,8 +288,20 @@ class VersionsApplicationPlugin(ApplicationPlugin):
                     f'Current branch {current_branch} does not match commit_on_branches patterns, skipping commit.'
                 )
 
-        write_line(f'the new version has been updated: {self.git_info}')
+        write_line('the new version has been updated: {}', self.git_info)
 
-        write_line(f"versions updated of {', '.join(updated)}", Verbosity.VERBOSE if short else Verbosity.NORMAL)
+        write_line('versions updated of {}', ', '.join(changed) or 'no files',
+                   verbosity=Verbosity.VERBOSE if short else Verbosity.NORMAL)
+        unchanged = [file for file in updated if file not in changed]
+        if unchanged:
+            write_line('unchanged files {}', ', '.join(unchanged))
 
-        write_line('finished')
+    def report_trace(self, write_line: Logger) -> None:
+        """Show the time spent in each phase at -vvv and export the spans if a trace file is configured."""
+        for name, total, count in self.tracer.summary():
+            write_line('{:<24} {:>9.1f} ms{}', name, total * 1000, f' ({count} spans)' if count > 1 else '',
+                       verbosity=Verbosity.DEBUG)
+
+        if self.trace_path:
+            self.tracer.export(self.trace_path)
+            write_line('trace written to {}', self.trace_path)
@@ -0,0 +1,116 @@
+import os
+import stat
+from io import BytesIO
+from subprocess import PIPE
+
+from git.exc import GitCommandError
+from git.objects import Commit, Tree
+from git.objects.fun import tree_entries_from_data, tree_to_stream
+from gitdb.base import IStream
+from gitdb.db import LooseObjectDB
+from gitdb.util import hex_to_bin
+
+TREE_MODE = 0o040000
+FILE_MODE = 0o100644
+EXECUTABLE_MODE = 0o100755
+
+
+def store_object(repo, type_name, data):
+    """
+    Write an object into the object database and return its binary SHA.
+
+    The object is written as a loose object in-process: the odb of GitPython starts a `git hash-object` per object.
+    """
+    return LooseObjectDB(repo.odb.root_path()).store(IStream(type_name, len(data), BytesIO(data))).binsha
+
+
+def hash_paths(repo, paths):
+    """
+    Write the blobs of working tree files with a single `git hash-object --stdin-paths`.
+
+    Git applies the `.gitattributes` filters (end of lines, ident, clean filters such as LFS) like `git add` does,
+    so the blobs are the ones the index gets for these paths.
+
+    :param repo: The git.Repo instance.
+    :param paths: Paths relative to the repository root, using forward slashes.
+    :return: The binary SHAs, in the order of `paths`.
+    :raises: git.GitCommandError if git fails to hash a path.
+    """
+    proc = repo.git.hash_object('-w', '--stdin-paths', as_process=True, istream=PIPE)
+    stdout, stderr = proc.communicate(''.join(f'{path}\n' for path in paths).encode('utf-8'))
+    if proc.returncode:
+        raise GitCommandError(['git', 'hash-object', '-w', '--stdin-paths'], proc.returncode, stderr)
+
+    return [hex_to_bin(sha) for sha in stdout.decode('ascii').split()]
+
+
+def read_tree(repo, binsha):
+    """Return the entries (binsha, mode, name) of a tree, or no entries for a missing tree."""
+    if binsha is None:
+        return []
+
+    return tree_entries_from_data(repo.odb.stream(binsha).read())
+
+
+def tree_sort_key(entry):
+    """Git sorts tree entries by name, directories as if their name ended with a slash."""
+    name = entry[2]
+    return name + '/' if entry[1] == TREE_MODE else name
+
+
+def write_tree(repo, binsha, changes):
+    """
+    Write a copy of the tree `binsha` with `changes` applied, rewriting only the affected subtrees.
+
+    :param repo: The git.Repo instance.
+    :param binsha: The binary SHA of the tree to update, None for a new directory.
+    :param changes: A dictionary mapping entry names to a (mode, binsha) blob, or to a nested changes dictionary.
+    :return: The binary SHA of the new tree.
+    """
+    entries = {entry[2]: entry for entry in read_tree(repo, binsha)}
+
+    for name, change in changes.items():
+        if isinstance(change, dict):
+            current = entries.get(name)
+            subtree = current[0] if current is not None and current[1] == TREE_MODE else None
+            entries[name] = (write_tree(repo, subtree, change), TREE_MODE, name)
+        else:
+            mode, blob_binsha = change
+            entries[name] = (blob_binsha, mode, name)
+
+    stream = BytesIO()
+    tree_to_stream(sorted(entries.values(), key=tree_sort_key), stream.write)
+    return store_object(repo, Tree.type, stream.getvalue())
+
+
+def commit_paths(repo, paths, message):
+    """
+    Commit the working tree content of `paths` on top of HEAD, without staging the whole tree.
+
+    The blobs of all paths are written by a single git process, through the `.gitattributes` filters, and only
+    the trees along these paths are rewritten, starting from the HEAD tree, so the cost scales with the number
+    of files, not with the repository size. Other changes of the working tree or the index are left as they are.
+    The index entries of the committed paths are refreshed afterwards, so they do not show up as changed.
+
+    :param repo: The git.Repo instance.
+    :param paths: Paths relative to the repository root, using forward slashes.
+    :param message: Commit message to use.
+    :return: The new Commit.
+    """
+    changes = {}
+    for path, blob_binsha in zip(paths, hash_paths(repo, paths)):
+        full_path = os.path.join(repo.working_tree_dir, path)
+        mode = EXECUTABLE_MODE if os.stat(full_path).st_mode & stat.S_IXUSR else FILE_MODE
+
+        *directories, name = path.split('/')
+        node = changes
+        for directory in directories:
+            node = node.setdefault(directory, {})
+        node[name] = (mode, blob_binsha)
+
+    parent = repo.head.commit
+    tree = write_tree(repo, parent.tree.binsha, changes)
+    commit = Commit.create_from_tree(repo, Tree(repo, tree), message, parent_commits=[parent], head=True)
+
+    repo.git.update_index('--add', '--', *paths)
+    return commit
@@ -0,0 +1,148 @@
+import json
+import os
+from datetime import datetime
+
+from poetry_versions_plugin.tracing import NULL_TRACER
+
+# Environment variables read by the `env` provider, unless `git_info_env` maps a field to another variable
+DEFAULT_ENV = {
+    'branch': 'POETRY_VERSIONS_BRANCH',
+    'commit': 'POETRY_VERSIONS_COMMIT',
+    'commit_count': 'POETRY_VERSIONS_COMMIT_COUNT',
+    'is_dirty': 'POETRY_VERSIONS_IS_DIRTY',
+}
+REQUIRED_FIELDS = ('branch', 'commit', 'commit_count')
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def make_git_info(branch, commit, commit_count, is_dirty=False, version=None):
+    """
+    Build the git information dictionary from externally provided values, in the shape of services.get_git_info.
+
+    :raises: ValueError if the commit count is not an integer.
+    """
+    try:
+        commit_count = int(commit_count)
+    except (TypeError, ValueError):
+        raise ValueError(f'commit_count must be an integer, got {commit_count!r}')
+
+    if isinstance(is_dirty, str):
+        is_dirty = is_dirty.strip().lower() in TRUE_VALUES
+
+    return {
+        "branch": str(branch),
+        # Same length as the SHA recorded by the gitpython provider
+        "commit": str(commit)[:7],
+        "commit_count": commit_count,
+        "is_dirty": bool(is_dirty),
+        "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "version": version,
+    }
+
+
+def env_git_info(mapping=None, version=None, environ=None):
+    """
+    Read the git information from environment variables, e.g. the ones set by a CI runner.
+
+    :param mapping: Maps the fields (branch, commit, commit_count, is_dirty) to the names of the variables,
+        fields not listed use DEFAULT_ENV.
+    :param version: The version to record in the returned information.
+    :param environ: The environment, defaults to os.environ.
+    :return: The git information dictionary.
+    :raises: ValueError if a variable of a required field is not set.
+    """
+    environ = os.environ if environ is None else environ
+    names = dict(DEFAULT_ENV, **(mapping or {}))
+
+    missing = [names[field] for field in REQUIRED_FIELDS if not environ.get(names[field])]
+    if missing:
+        raise ValueError(f'Environment variables not set for the git information: {", ".join(missing)}')
+
+    return make_git_info(*(environ[names[field]] for field in REQUIRED_FIELDS),
+                         is_dirty=environ.get(names['is_dirty'], False), version=version)
+
+
+def file_git_info(path, version=None):
+    """
+    Read the git information from a JSON file holding the branch, commit, commit_count and is_dirty keys.
+
+    :param path: Path to the JSON file.
+    :param version: The version to record in the returned information.
+    :return: The git information dictionary.
+    :raises: ValueError if the file is not a JSON object with the required keys, OSError if it cannot be read.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    missing = [field for field in REQUIRED_FIELDS if not isinstance(data, dict) or data.get(field) is None]
+    if missing:
+        raise ValueError(f'{path} does not hold the git information: missing {", ".join(missing)}')
+
+    return make_git_info(*(data[field] for field in REQUIRED_FIELDS), is_dirty=data.get('is_dirty', False),
+                         version=version)
+
+
+class LazyGitInfo:
+    """
+    Git information that is only computed on first access.
+
+    Creating the provider is free, the information is gathered when `get()` or `dirty_state`
+    is first accessed, and the result is reused afterwards.
+
+    The `gitpython` provider inspects the repository. The `env` and `file` providers read the information
+    from environment variables (see env_git_info) or from a JSON file (see file_git_info): they never open the
+    repository, which also makes them correct on shallow clones, and take constant time.
+    """
+
+    def __init__(self, version=None, commit_counter=None, dirty_paths=None, dirty_ignore=None, base_dir=None,
+                 cache=True, tracer=None, provider='gitpython', env=None, file=None, timeout=None,
+                 untracked_files=True):
+        self.version = version
+        self.provider = provider
+        self.env = env
+        self.file = file
+        self.timeout = timeout
+        self.untracked_files = untracked_files
+        self.commit_counter = commit_counter
+        self.cache = cache
+        self.dirty_paths = dirty_paths
+        self.dirty_ignore = dirty_ignore
+        self.base_dir = base_dir
+        self.tracer = tracer or NULL_TRACER
+        self._dirty_state = None
+        self._info = None
+
+    @property
+    def loaded(self):
+        """Whether the repository has been inspected already."""
+        return self._info is not None
+
+    @property
+    def dirty_state(self):
+        """The DirtyState snapshot taken together with the git information, None unless inspecting the repository."""
+        self.get()
+        return self._dirty_state
+
+    def get(self):
+        """
+        Return the git information, inspecting the repository on first access.
+
+        :return: The dictionary returned by services.get_git_info.
+        :raises: ValueError if the `env` or `file` provider cannot read the information,
+            TimeoutError if a probe of the `gitpython` provider takes longer than `timeout`.
+        """
+        if self._info is None and self.provider == 'env':
+            self._info = env_git_info(self.env, self.version)
+        elif self._info is None and self.provider == 'file':
+            self._info = file_git_info(os.path.join(self.base_dir or '.', self.file), self.version)
+        elif self._info is None:
+            # Imported here, so creating a provider does not load GitPython
+            with self.tracer.span('import services'):
+                from poetry_versions_plugin.services import collect_git_info
+
+            self._info, self._dirty_state = collect_git_info(
+                version=self.version, commit_counter=self.commit_counter, paths=self.dirty_paths,
+                ignore=self.dirty_ignore, base_dir=self.base_dir, cache=self.cache, timeout=self.timeout,
+                tracer=self.tracer, untracked_files=self.untracked_files)
+
+        return self._info
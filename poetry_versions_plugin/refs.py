@@ -0,0 +1,201 @@
+import mmap
+import os
+import re
+
+SHA_PATTERN = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+# Refs stored in the git directory of each worktree, all others live in the common directory
+PER_WORKTREE_PREFIXES = ('refs/bisect/', 'refs/worktree/', 'refs/rewritten/')
+MAX_SYMREF_DEPTH = 5
+
+
+def find_git_dirs(path='.'):
+    """
+    Locate the git directory of the repository containing `path`, reading files only.
+
+    A `.git` file (worktrees, submodules) points to the actual git directory with a `gitdir:` line,
+    and the git directory of a linked worktree points to the shared one in its `commondir` file.
+
+    :param path: A directory inside the working tree.
+    :return: A tuple (git_dir, common_dir), or None if no repository is found.
+    """
+    directory = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(directory, '.git')
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            try:
+                with open(dot_git, 'r') as f:
+                    content = f.read().strip()
+            except OSError:
+                return None
+            if not content.startswith('gitdir:'):
+                return None
+            git_dir = os.path.normpath(os.path.join(directory, content[len('gitdir:'):].strip()))
+            break
+
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+    return git_dir, common_dir(git_dir)
+
+
+def common_dir(git_dir):
+    """Return the common git directory of `git_dir`, which differs for linked worktrees."""
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+
+class PackedRefs:
+    """
+    Look up refs in a `packed-refs` file without reading it all.
+
+    The file is memory-mapped. When git marks it as sorted (the `sorted` trait of its header, always
+    written by git since 2.13) a ref is found by bisecting the lines, so a lookup costs O(log n) reads
+    on repositories with hundreds of thousands of refs. Unsorted files are scanned line by line.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def lookup(self, name):
+        """
+        Return the SHA of the ref `name`, or None if it is not packed.
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return None
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self._lookup(data, name.encode('utf-8'))
+        except OSError:
+            return None
+
+    def _lookup(self, data, name):
+        start = 0
+        if data[:1] == b'#':
+            header_end = data.find(b'\n')
+            header = data[:header_end if header_end >= 0 else len(data)]
+            start = header_end + 1 if header_end >= 0 else len(data)
+            if b' sorted' in header:
+                return self._bisect(data, name, start)
+
+        return self._scan(data, name, start)
+
+    @staticmethod
+    def _parse(line):
+        """Return (name, sha) of a ref line, None for peeled (`^`) and comment lines."""
+        if not line or line[:1] in (b'^', b'#'):
+            return None
+        sha, _, ref = line.partition(b' ')
+        return ref.rstrip(b'\r'), sha.decode('ascii')
+
+    def _scan(self, data, name, start, end=None):
+        for line in data[start:end].split(b'\n'):
+            entry = self._parse(line)
+            if entry is not None and entry[0] == name:
+                return entry[1]
+        return None
+
+    def _bisect(self, data, name, start):
+        # `low` and `high` are always at the start of a line
+        low, high = start, len(data)
+        while low < high:
+            newline = data.rfind(b'\n', low, (low + high) // 2)
+            line_start = newline + 1 if newline >= 0 else low
+
+            # A peeled line (`^sha`) belongs to the ref above it, compare with the next ref instead
+            while data[line_start:line_start + 1] == b'^':
+                newline = data.find(b'\n', line_start, high)
+                if newline < 0:
+                    return self._scan(data, name, low, high)
+                line_start = newline + 1
+            if line_start >= high:
+                return self._scan(data, name, low, high)
+
+            line_end = data.find(b'\n', line_start, high)
+            if line_end < 0:
+                line_end = high
+
+            entry = self._parse(data[line_start:line_end])
+            if entry is None:
+                return self._scan(data, name, low, high)
+
+            ref, sha = entry
+            if ref == name:
+                return sha
+            if ref < name:
+                low = line_end + 1
+            else:
+                high = line_start
+        return None
+
+
+def ref_dir(git_dir, common, name):
+    """Return the directory holding the loose ref `name`."""
+    if '/' not in name or name.startswith(PER_WORKTREE_PREFIXES):
+        return git_dir
+    return common
+
+
+def resolve_ref(git_dir, common, name, packed_refs=None):
+    """
+    Resolve a ref to a SHA, following symbolic refs, from the loose ref files and `packed-refs`.
+
+    :param git_dir: The git directory of the worktree.
+    :param common: The common git directory.
+    :param name: The full ref name, e.g. `refs/heads/main` or `HEAD`.
+    :param packed_refs: A PackedRefs instance to reuse, defaults to the one of `common`.
+    :return: The SHA, or None if the ref does not exist or cannot be resolved with files only.
+    """
+    packed_refs = packed_refs or PackedRefs(os.path.join(common, 'packed-refs'))
+
+    for _ in range(MAX_SYMREF_DEPTH):
+        try:
+            with open(os.path.join(ref_dir(git_dir, common, name), name), 'r') as f:
+                content = f.read().strip()
+        except (OSError, ValueError):
+            content = None
+
+        if content is None:
+            return packed_refs.lookup(name)
+        if content.startswith('ref:'):
+            name = content[len('ref:'):].strip()
+            continue
+        return content if SHA_PATTERN.match(content) else None
+
+    return None
+
+
+def read_head(git_dir, common=None):
+    """
+    Read HEAD and the SHA it points to, without starting git or creating GitPython objects.
+
+    :param git_dir: The git directory of the worktree.
+    :param common: The common git directory, read from `git_dir` if omitted.
+    :return: A tuple (branch name or None for a detached HEAD, full SHA), or None if HEAD cannot be resolved
+        from the files (e.g. a branch without commits, or a repository using the reftable format).
+    """
+    common = common or common_dir(git_dir)
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r') as f:
+            head = f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+    if not head.startswith('ref:'):
+        return (None, head) if SHA_PATTERN.match(head) else None
+
+    ref = head[len('ref:'):].strip()
+    sha = resolve_ref(git_dir, common, ref)
+    if sha is None:
+        return None
+
+    branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    return branch, sha
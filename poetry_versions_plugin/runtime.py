@@ -0,0 +1,57 @@
+"""
+Look up the version of an installed package at runtime.
+
+Applications can call `get_version('my-package')` at startup instead of `importlib.metadata.version`.
+The module generated by the plugin (a `filename` entry such as `my_package/versions.py`) is imported
+first, it is a plain Python module so this costs a single import. The distribution metadata, which
+requires scanning `sys.path`, is only read for packages without a generated module.
+
+This module only imports the standard library: it never loads GitPython or Poetry.
+"""
+import importlib
+from functools import lru_cache
+from types import MappingProxyType
+
+DEFAULT_MODULE = 'versions'
+
+
+def import_name(package):
+    """Return the import name of a distribution name, e.g. `my-package` becomes `my_package`."""
+    return package.replace('-', '_').replace('.', '_').lower()
+
+
+@lru_cache(maxsize=None)
+def version_info(package, module=DEFAULT_MODULE):
+    """
+    Return the version information of a package, memoized.
+
+    :param package: The distribution or import name of the package, e.g. `my-package`.
+    :param module: The name of the generated module inside the package.
+    :return: A read-only mapping. From the generated module, it holds all its fields (`version`, `branch`,
+        `commit`, `commit_count`, `is_dirty`, `datetime`, `full_version`, ...); from the distribution
+        metadata, only `version`.
+    :raises: importlib.metadata.PackageNotFoundError if the package has neither.
+    """
+    try:
+        generated = importlib.import_module(f'{import_name(package)}.{module}')
+    except ImportError:
+        generated = None
+
+    if generated is not None and isinstance(getattr(generated, 'version', None), str):
+        return MappingProxyType({key: value for key, value in vars(generated).items() if not key.startswith('_')})
+
+    # Imported here, the metadata machinery is only needed for packages without a generated module
+    from importlib.metadata import version
+
+    return MappingProxyType({'version': version(package)})
+
+
+def get_version(package, module=DEFAULT_MODULE):
+    """
+    Return the version of a package, from its generated module or its distribution metadata.
+
+    :param package: The distribution or import name of the package, e.g. `my-package`.
+    :param module: The name of the generated module inside the package.
+    :raises: importlib.metadata.PackageNotFoundError if the package has neither.
+    """
+    return version_info(package, module)['version']
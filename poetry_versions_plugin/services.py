@@ -1,82 +1,283 @@
+import functools
 import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime
 
 import git
 from cleo.io.outputs.output import Verbosity
 
+from poetry_versions_plugin import versioning
+from poetry_versions_plugin.cache import cache_key, cache_path, load_git_info, store_git_info
+from poetry_versions_plugin.commits import count_commits
+from poetry_versions_plugin.output import is_changed, write_if_changed
+from poetry_versions_plugin.plumbing import commit_paths
+from poetry_versions_plugin.refs import read_head
+from poetry_versions_plugin.status import build_pathspecs, scan_dirty_state
+from poetry_versions_plugin.template import render, render_file, template_context
+from poetry_versions_plugin.tomlpatch import patch_table
+from poetry_versions_plugin.tracing import NULL_TRACER
 
-def get_git_info(version=None):
+
+def get_dirty_state(untracked_files=True, paths=None, ignore=None, base_dir=None, repo=None, optional_locks=True):
+    """
+    Take a snapshot of the uncommitted changes of the current Git repository.
+
+    The snapshot can be shared between get_git_info and commit_local_changes,
+    so the working tree is scanned only once per version bump.
+
+    :param untracked_files: Whether to scan for untracked files.
+    :param paths: Paths (relative to base_dir) to limit the scan to, the whole repository if empty.
+    :param ignore: Glob patterns (relative to base_dir) to exclude from the scan.
+    :param base_dir: Directory the paths and globs are relative to, defaults to the repository root.
+    :param repo: The git.Repo instance to scan, the repository of the working directory if None.
+    :param optional_locks: See status.status_command.
+    :return: A DirtyState instance.
+    """
+    repo = repo or git.Repo(search_parent_directories=True)
+    pathspecs = build_pathspecs(repo, paths, ignore, base_dir)
+    return scan_dirty_state(repo, untracked_files, pathspecs, optional_locks)
+
+
+def get_history_info(repo, commit_counter=None, cache=True):
+    """
+    Retrieve the branch name, short SHA of the latest commit and total number of commits.
+
+    These only depend on HEAD and the ref it points to, so they are cached on disk (see cache.py)
+    and a run on an unchanged checkout does not count the commits again.
+
+    :param repo: The git.Repo instance.
+    :param commit_counter: Name of the commit counting backend, see commits.COMMIT_COUNTERS.
+    :param cache: False to disable the cache, or a custom cache path relative to the repository root.
+    :return: A dictionary with the branch (`HEAD` for a detached HEAD), commit and commit_count keys.
+    """
+    path = key = None
+    if cache:
+        path = cache_path(repo, None if cache is True else cache)
+        key = cache_key(repo)
+        info = load_git_info(path, key)
+        if info is not None:
+            return info
+
+    # HEAD and the refs are read from the files, GitPython is only used for layouts the reader does not handle
+    head = read_head(repo.git_dir, repo.common_dir)
+    if head is not None:
+        branch, sha = head
+    elif repo.head.is_detached:
+        branch, sha = None, repo.head.commit.hexsha
+    else:
+        branch, sha = repo.active_branch.name, repo.head.commit.hexsha
+
+    info = {
+        # A detached HEAD (e.g. a tag or a commit checked out in CI) has no active branch
+        "branch": branch or 'HEAD',
+        "commit": sha[:7],
+        "commit_count": count_commits(repo, sha, commit_counter),
+    }
+
+    if cache:
+        store_git_info(path, key, info)
+
+    return info
+
+
+def current_branch(repo):
+    """The name of the current branch of `repo`, `HEAD` for a detached HEAD."""
+    head = read_head(repo.git_dir, repo.common_dir)
+    if head is not None:
+        return head[0] or 'HEAD'
+    return 'HEAD' if repo.head.is_detached else repo.active_branch.name
+
+
+def get_git_info(version=None, commit_counter=None, dirty_state=None, cache=True):
     """
     Retrieve information about the current Git repository, including branch name,
     short SHA of the latest commit, total number of commits, whether there are uncommitted changes,
     and the current date and time.
+
+    :param version: The version to record in the returned information.
+    :param commit_counter: Name of the commit counting backend, see commits.COMMIT_COUNTERS.
+    :param dirty_state: A DirtyState snapshot to reuse instead of scanning the working tree.
+    :param cache: False to disable the git information cache, or a custom cache path, see get_history_info.
     """
     repo = git.Repo(search_parent_directories=True)
-    branch = repo.active_branch.name
-    commit = repo.head.commit.hexsha[:7]
-    commit_count = sum(1 for _ in repo.iter_commits(branch))
-    is_dirty = repo.is_dirty()
-    current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    history = get_history_info(repo, commit_counter, cache)
+    if dirty_state is None:
+        dirty_state = scan_dirty_state(repo, untracked_files=False)
+
+    return git_info_from(history, dirty_state, version)
+
 
+def git_info_from(history, dirty_state, version=None):
+    """Combine the history information and a DirtyState into the dictionary returned by get_git_info."""
     return {
-        "branch": branch,
-        "commit": commit,
-        "commit_count": commit_count,
-        "is_dirty": is_dirty,
-        "datetime": current_datetime,
+        "branch": history["branch"],
+        "commit": history["commit"],
+        "commit_count": history["commit_count"],
+        "is_dirty": dirty_state.is_dirty,
+        "datetime": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "version": version
     }
 
 
+class DeadlineGit(git.Git):
+    """
+    A git command wrapper killing the commands still running at `deadline` (a time.monotonic() value).
+
+    The persistent `cat-file` processes are not bounded by GitPython, they are stopped by closing the repository.
+    No command is started once the deadline has passed, not even a persistent one.
+    """
+
+    def __init__(self, working_dir=None, deadline=None):
+        super().__init__(working_dir)
+        self.deadline = deadline
+
+    def execute(self, command, **kwargs):
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'git command started after the deadline: {command}')
+            if not kwargs.get('as_process') and kwargs.get('kill_after_timeout') is None:
+                kwargs['kill_after_timeout'] = remaining
+        return super().execute(command, **kwargs)
+
+
+class DeadlineRepo(git.Repo):
+    """A git.Repo running its git commands with a DeadlineGit."""
+
+    def __init__(self, *args, deadline=None, **kwargs):
+        # Repo.__init__ creates the command wrapper shared with the object database
+        self.GitCommandWrapperType = functools.partial(DeadlineGit, deadline=deadline)
+        super().__init__(*args, **kwargs)
+
+
+def wait_probe(name, future, deadline):
+    """
+    Wait for the result of a probe started by collect_git_info.
+
+    :raises: TimeoutError if the probe is not done at `deadline` (a time.monotonic() value, None to wait forever).
+    """
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        raise TimeoutError(f'The git {name} did not finish in time')
+
+
+def collect_git_info(version=None, commit_counter=None, paths=None, ignore=None, base_dir=None, cache=True,
+                     timeout=None, tracer=None, untracked_files=True):
+    """
+    Gather the history information and the dirty state concurrently.
+
+    Counting the commits walks the history and the dirty scan walks the working tree: they do not depend on each
+    other, so they run in two threads (both mostly wait on git processes) and the latency is the one of the
+    slowest probe instead of their sum.
+
+    :param version: The version to record in the returned information.
+    :param commit_counter: Name of the commit counting backend, see commits.COMMIT_COUNTERS.
+    :param paths: Paths to limit the dirty scan to, see get_dirty_state.
+    :param ignore: Glob patterns excluded from the dirty scan, see get_dirty_state.
+    :param base_dir: Directory the paths and globs are relative to, see get_dirty_state.
+    :param cache: False to disable the git information cache, or a custom cache path, see get_history_info.
+    :param timeout: Seconds each probe may take, counted from their common start, None to wait forever.
+    :param tracer: A tracing.Tracer timing each probe.
+    :param untracked_files: Whether the dirty scan looks for untracked files, or a callable deciding it from the
+        current branch name (see current_branch), which the dirty probe reads from the files on its own.
+    :return: A tuple (the dictionary returned by get_git_info, the DirtyState).
+    :raises: TimeoutError if a probe takes longer than `timeout`. Its git processes are killed at the deadline,
+        and the call returns once the probes have stopped.
+    """
+    tracer = tracer or NULL_TRACER
+    deadline = None if timeout is None else time.monotonic() + timeout
+    repos = []
+
+    def open_repo():
+        if deadline is None:
+            return git.Repo(search_parent_directories=True)
+        repo = DeadlineRepo(search_parent_directories=True, deadline=deadline)
+        repos.append(repo)
+        return repo
+
+    def history_probe():
+        with tracer.span('git history'):
+            return get_history_info(open_repo(), commit_counter, cache)
+
+    def dirty_probe():
+        with tracer.span('dirty scan'):
+            repo = open_repo()
+            untracked = untracked_files(current_branch(repo)) if callable(untracked_files) else untracked_files
+            # A killed `git status` must not leave the index locked
+            return get_dirty_state(untracked, paths=paths, ignore=ignore, base_dir=base_dir, repo=repo,
+                                   optional_locks=deadline is None)
+
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='git-probe')
+    try:
+        history = executor.submit(history_probe)
+        dirty = executor.submit(dirty_probe)
+        dirty_state = wait_probe('dirty scan', dirty, deadline)
+        info = git_info_from(wait_probe('history walk', history, deadline), dirty_state, version)
+    except TimeoutError:
+        # The other git commands are killed by DeadlineGit, stop the persistent cat-file processes as well
+        for repo in repos:
+            repo.close()
+        raise
+    finally:
+        executor.shutdown()
+
+    return info, dirty_state
+
+
 def update_readme(readme_path, info, dry_run=False):
     """
     Update placeholders in the README.md file with Git information.
 
     :param readme_path: Path to the README.md file
     :param info: Dictionary containing Git information
-    :param dry_run: If True, print what would be changed instead of modifying the file
+    :param dry_run: If True, print the rendered file instead of modifying it
     """
-    # Open the README file and read its content
-    with open(readme_path, 'r') as f:
-        content = f.read()
-
-    # Replace placeholders with actual info
-    new_content = content.replace("<!-- BRANCH -->", info['branch'])
-    new_content = new_content.replace("<!-- COMMIT -->", info['commit'])
-    new_content = new_content.replace("<!-- COMMIT_COUNT -->", str(info['commit_count']))
-    new_content = new_content.replace("<!-- IS_DIRTY -->", str(info['is_dirty']))
-    new_content = new_content.replace("<!-- DATETIME -->", info['datetime'])
-
+    context = template_context(info)
     if dry_run:
-        # If dry_run is True, print what would be changed
+        with open(readme_path, 'r') as f:
+            new_content, _ = render(f.read(), context)
         print(f"Would update {readme_path} with the following changes:")
         print(new_content)
     else:
-        # If not a dry run, write changes to the file
-        with open(readme_path, 'w') as f:
-            f.write(new_content)
+        render_file(readme_path, context)
 
 
-def update_py_file(py_path, info, write_line, dry_run=False):
+def update_text_file(path, info, write_line, dry_run=False, fields=None):
     """
-    Create or update a Python file with Git information.
+    Replace `<!-- NAME -->` placeholders in a text file with Git information.
 
-    :param py_path: Path to the Python file
+    Every key of `info` (and of `fields`) is available as an upper case placeholder,
+    e.g. `<!-- VERSION -->` or `<!-- COMMIT_COUNT -->`. The file is rendered in a single pass, line by line.
+
+    :param path: Path to the text file
     :param info: Dictionary containing Git information
-    :param write_line: Function to write a line to the console
-    :param dry_run: If True, print what would be done instead of making changes
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+    :param dry_run: If True, only report how many placeholders would be replaced
+    :param fields: Optional user-defined fields, see template.template_context
+    :return: True if the file changed (or would change, in dry-run mode)
     """
-    # Get the directory path
-    dir_path = os.path.dirname(py_path)
+    replaced = render_file(path, template_context(info, fields), dry_run)
+
+    if dry_run:
+        write_line("Would replace {} placeholders in {}", replaced, path)
+
+    return replaced > 0
 
-    # Check if the directory exists, create it if not
-    if not os.path.exists(dir_path):
-        if dry_run:
-            write_line(f"Would create directory: {dir_path}")
-        else:
-            os.makedirs(dir_path, exist_ok=True)
 
-    # Prepare the content to write
+def py_file_content(info, structures=False):
+    """
+    Generate the content of a Python file holding the Git information.
+
+    :param info: Dictionary containing Git information
+    :param structures: If True, also generate `version_info`, `sort_key` and a `build_info` record
+        (see record_content), computed from the version now so that consumers never parse it.
+    :return: The Python source code
+    """
     content = "# THIS FILE IS GENERATED DURING PROJECT BUILD\n"
     content += "# See poetry poetry-versions-plugin for details\n\n"
 
@@ -89,52 +290,208 @@ def update_py_file(py_path, info, write_line, dry_run=False):
 
     content += "\n"
     content += "full_version = f'{version}.{branch}+{commit_count}.{commit}'\n"
+    if structures:
+        content += record_content(info)
     content += "# END OF GENERATED CODE\n"
 
+    return content
+
+
+def record_content(info):
+    """
+    Generate the precomputed version structures of a Python file, see py_file_content.
+
+    `version_info` is a (major, minor, patch, pre, local) tuple, `sort_key` a tuple of plain values ordering
+    versions like PEP 440, and `build_info` an immutable record of all fields, ordered by `sort_key`.
+    """
+    fields = [*info, 'full_version', 'version_info', 'sort_key']
+
+    content = "\n"
+    content += "# Precomputed from the version, no parsing needed at runtime\n"
+    content += f"version_info = {versioning.version_info(info['version'])!r}\n"
+    content += f"sort_key = {versioning.sort_key(info['version'])!r}\n"
+    content += f"""
+
+def _sort_key(other):
+    # The records generated for other packages are instances of other classes, they are ordered by sort_key too
+    return getattr(other, 'sort_key', None)
+
+
+class BuildInfo:
+    \"\"\"Immutable record of the build information, ordered by version.\"\"\"
+
+    __slots__ = {tuple(fields)!r}
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{{type(self).__name__}} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{{type(self).__name__}} is immutable')
+
+    def __eq__(self, other):
+        key = _sort_key(other)
+        return NotImplemented if key is None else self.sort_key == key
+
+    def __lt__(self, other):
+        key = _sort_key(other)
+        return NotImplemented if key is None else self.sort_key < key
+
+    def __le__(self, other):
+        key = _sort_key(other)
+        return NotImplemented if key is None else self.sort_key <= key
+
+    def __gt__(self, other):
+        key = _sort_key(other)
+        return NotImplemented if key is None else self.sort_key > key
+
+    def __ge__(self, other):
+        key = _sort_key(other)
+        return NotImplemented if key is None else self.sort_key >= key
+
+    def __hash__(self):
+        return hash(self.sort_key)
+
+    def __repr__(self):
+        return f'BuildInfo(version={{self.version!r}}, commit={{self.commit!r}})'
+
+
+build_info = BuildInfo({', '.join(f'{name}={name}' for name in fields)})
+"""
+    return content
+
+
+def pyi_file_content(info):
+    """
+    Generate the type stub of a Python file generated with the precomputed version structures.
+
+    :param info: Dictionary containing Git information
+    :return: The stub source code
+    """
+    types = {name: type(value).__name__ if isinstance(value, (str, int, float, bool)) else 'object'
+             for name, value in info.items()}
+    types.update({
+        'full_version': 'str',
+        'version_info': 'Tuple[int, int, int, Optional[str], Optional[str]]',
+        'sort_key': 'Tuple[Any, ...]',
+    })
+    declarations = ''.join(f"{name}: {type_name}\n" for name, type_name in types.items())
+    attributes = ''.join(f"    {name}: {type_name}\n" for name, type_name in types.items())
+
+    content = "# THIS FILE IS GENERATED DURING PROJECT BUILD\n"
+    content += "# See poetry poetry-versions-plugin for details\n\n"
+    content += "from typing import Any, Optional, Tuple\n\n"
+    content += declarations
+    content += "\n\nclass BuildInfo:\n"
+    content += attributes
+    content += "\n    def __init__(self, **fields: Any) -> None: ...\n"
+    for method in ('lt', 'le', 'gt', 'ge'):
+        content += f"    def __{method}__(self, other: BuildInfo) -> bool: ...\n"
+    content += "    def __hash__(self) -> int: ...\n"
+    content += "\n\nbuild_info: BuildInfo\n"
+
+    return content
+
+
+def update_py_file(py_path, info, write_line, dry_run=False):
+    """
+    Create or update a Python file with Git information.
+
+    :param py_path: Path to the Python file
+    :param info: Dictionary containing Git information
+    :param write_line: Function to write a line to the console, called with the message and a `verbosity` keyword
+        argument, such as utils.Logger or cleo's `IO.write_line`. The verbosity used to be passed positionally.
+    :param dry_run: If True, print what would be done instead of making changes
+    :return: True if the file changed (or would change, in dry-run mode)
+    """
+    # Get the directory path
+    dir_path = os.path.dirname(py_path)
+
+    # Check if the directory exists, create it if not
+    if dir_path and not os.path.exists(dir_path):
+        if dry_run:
+            write_line(f"Would create directory: {dir_path}")
+        else:
+            os.makedirs(dir_path, exist_ok=True)
+
+    content = py_file_content(info)
+
     if dry_run:
-        write_line(f"Would write to file: {py_path}", Verbosity.VERBOSE)
-        write_line(f"File content would be:\n\n{content}", Verbosity.VERBOSE)
-    else:
-        with open(py_path, 'w') as f:
-            f.write(content)
+        write_line(f"Would write to file: {py_path}", verbosity=Verbosity.VERBOSE)
+        write_line(f"File content would be:\n\n{content}", verbosity=Verbosity.VERBOSE)
+        return is_changed(py_path, content.encode('utf-8'))
+
+    return write_if_changed(py_path, content)
 
 
-def update_pyproject(info, pyproject, write_line, dry_run=False):
+def update_pyproject(info, pyproject, write_line, dry_run=False, surgical=True):
     """
     Update the pyproject.toml file with Git information and version number.
 
+    By default only the lines of the `[tool.versions]` table are rewritten, the rest of the file is kept
+    byte for byte without serializing the whole TOML document again. The whole document is saved instead
+    if the table cannot be located unambiguously (e.g. on the first bump, when it does not exist yet).
+
     :param info: Dictionary containing Git information
     :param pyproject: The poetry pyproject command object
-    :param write_line: Function to write a line to the console
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
     :param dry_run: If True, skip the actual file write
-    :return: None
+    :param surgical: If False, always save the whole document (e.g. when other tables were changed in memory)
+    :return: True if the file changed (or would change, in dry-run mode)
     """
+    path = pyproject.file.path
+
+    content = None
+    if surgical:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            content = patch_table(f.read(), 'tool.versions', info)
+        if content is None:
+            write_line('[tool.versions] table not found unambiguously, saving the whole pyproject.toml')
+        else:
+            # The document cached in memory is outdated, it is read again on next access
+            pyproject.reload()
 
-    # Update pyproject.toml
-    try:
-        if 'versions' not in pyproject.data['tool']:
-            pyproject.data['tool']['versions'] = {}
+    if content is None:
+        # Update pyproject.toml
+        try:
+            if 'versions' not in pyproject.data['tool']:
+                pyproject.data['tool']['versions'] = {}
 
-        versions = pyproject.data['tool']['versions']
+            versions = pyproject.data['tool']['versions']
 
-        # Loop through the info dictionary and update each field
-        for key, value in info.items():
-            versions[key] = value
-    except KeyError as ex:
-        write_line(f'Error parsing pyproject: {ex}')
-        return
+            # Loop through the info dictionary and update each field
+            for key, value in info.items():
+                versions[key] = value
+        except KeyError as ex:
+            write_line(f'Error parsing pyproject: {ex}')
+            return False
+
+        # Save the updates, keeping the line endings of the file like pyproject.save() does
+        content = pyproject.data.as_string()
+        if '\r\n' in content:
+            content = re.sub(r'(?<!\r)\n', '\r\n', content)
+
+    if dry_run:
+        return is_changed(path, content.encode('utf-8'))
 
-    # Save the updates
-    if not dry_run:
-        pyproject.save()
+    return write_if_changed(path, content)
 
 
-def commit_local_changes(repo_path, commit_message):
+def commit_local_changes(repo_path, commit_message, dirty_state=None, paths=None, only_paths=False):
     """
     Commit local changes in the specified Git repository.
 
     :param repo_path: Path to the local Git repository.
     :param commit_message: Commit message to use.
+    :param dirty_state: A DirtyState snapshot taken earlier in the same run. When given, the working tree
+        is not scanned again: the caller has written files since the snapshot, so there are changes to commit.
+        If the snapshot was limited to pathspecs, only these and `paths` are staged.
+    :param paths: The files written by the caller, always staged when the snapshot is limited to pathspecs.
+    :param only_paths: If True, commit exactly `paths` on top of HEAD with plumbing.commit_paths,
+        without staging or scanning the rest of the working tree.
     :raises: ValueError if there are no changes to commit.
     """
 
@@ -144,16 +501,33 @@ def commit_local_changes(repo_path, commit_message):
 
     # Initialize the repository
     repo = git.Repo(repo_path)
+    written = [os.path.relpath(os.path.abspath(path), repo.working_tree_dir).replace(os.sep, '/')
+               for path in paths or []]
+
+    if only_paths:
+        if not written:
+            raise ValueError("No changes to commit.")
+
+        try:
+            commit_paths(repo, written, commit_message)
+            print(f"Changes committed with message: '{commit_message}'")
+        except Exception as e:
+            print(f"Failed to commit changes: {e}")
+            raise
+        return
 
     # Check for uncommitted changes
-    if not repo.is_dirty(untracked_files=True):
+    if dirty_state is None and not scan_dirty_state(repo, untracked_files=True).has_changes:
         raise ValueError("No changes to commit.")
 
-    # Stage all changes
-    repo.git.add(update=True)
-
-    # Include new untracked files
-    repo.git.add(A=True)
+    # Stage all changes, including new untracked files
+    if dirty_state is not None and dirty_state.pathspecs:
+        repo.git.add('-A', '--', *dirty_state.pathspecs)
+        # Staged on their own: the exclusions of `dirty_ignore` would also apply to them in the same call
+        if written:
+            repo.git.add('-A', '--', *written)
+    else:
+        repo.git.add(A=True)
 
     # Commit the changes
     try:
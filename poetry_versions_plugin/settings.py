@@ -0,0 +1,177 @@
+import re
+import string
+
+DEFAULT_COMMIT_MESSAGE = 'Bump version: {current_version} → {new_version}'
+COMMIT_MODES = ('all', 'paths')
+# Names of commits.COMMIT_COUNTERS, listed here so that reading the settings does not import GitPython
+COMMIT_COUNTERS = ('iter', 'rev-list', 'incremental')
+GIT_INFO_PROVIDERS = ('gitpython', 'env', 'file')
+# Keys of the git information (services.get_git_info), the only names the `fields` format strings can use
+GIT_INFO_KEYS = ('branch', 'commit', 'commit_count', 'is_dirty', 'datetime', 'version')
+COMMIT_MESSAGE_KEYS = ('current_version', 'new_version')
+
+
+def _is_str_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _is_str_table(value):
+    return isinstance(value, dict) and all(isinstance(item, str) for item in value.values())
+
+
+def check_format_keys(template, keys):
+    """
+    Check that a `str.format` template only refers to the given keyword arguments.
+
+    :param template: The format string, e.g. `"{version}+{commit}"`.
+    :param keys: The names that will be passed to `str.format`.
+    :return: A description of the first problem found, None if the template can be formatted.
+    """
+    try:
+        parsed = list(string.Formatter().parse(template))
+    except ValueError as ex:
+        return f'is not a valid format string: {ex}'
+
+    for _, field, spec, _ in parsed:
+        if field is None:
+            continue
+        name = re.match(r'[^.\[]*', field).group()
+        if name not in keys:
+            return f'has an unknown placeholder {{{field}}}, expected one of {", ".join(keys)}'
+        # The format spec can hold nested placeholders, e.g. `{commit_count:>{width}}`
+        problem = check_format_keys(spec, keys) if spec else None
+        if problem:
+            return problem
+
+    return None
+
+
+def compile_branch_patterns(patterns):
+    """
+    Compile the `commit_on_branches` patterns into a single `match` callable.
+
+    The patterns are combined into one alternation so a branch is matched with a single regex call. Patterns
+    that cannot be combined are matched one after the other instead: those with groups, since combining them
+    would renumber the groups (a backreference such as `\\1` would refer to the group of another pattern),
+    and those the combined expression fails to compile with.
+
+    :param patterns: The regular expressions, matched at the start of the branch name like re.match.
+    :return: A callable returning a truthy value if the branch matches any pattern, None if there is no pattern.
+    :raises: re.error if a pattern is invalid.
+    """
+    if not patterns:
+        return None
+
+    compiled = [re.compile(pattern) for pattern in patterns]
+
+    def match_any(branch):
+        return any(pattern.match(branch) for pattern in compiled)
+
+    if any(pattern.groups for pattern in compiled):
+        return match_any
+    try:
+        return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)).match
+    except re.error:
+        # e.g. a global flag such as `(?i)` that is not at the start of the combined expression
+        return match_any
+
+
+class Settings:
+    """
+    The `[tool.versions.settings]` table, parsed and validated once.
+
+    Every setting is a plain attribute holding its default when it is not configured, so reading a setting
+    is a single attribute lookup. Instances are not modified after parsing and can be shared, e.g. by a
+    long-running process handling several version bumps of the same project.
+    """
+
+    __slots__ = (
+        'allow_dirty', 'commit', 'commit_on_argument', 'commit_on_branches', 'commit_message', 'commit_mode',
+        'commit_counter', 'filename', 'fields', 'workers', 'cache', 'dirty_paths', 'dirty_ignore',
+        'workspace_members', 'trace', 'git_info_provider', 'git_info_env', 'git_info_file', 'probe_timeout',
+        'version_structures', 'configured', '_branch_matcher',
+    )
+
+    def __init__(self, table=None, source='pyproject.toml'):
+        """
+        :param table: The content of the `[tool.versions.settings]` table, None if it is missing.
+        :param source: Where the table comes from, used in error messages.
+        :raises: ValueError listing every invalid setting.
+        """
+        self.configured = table is not None
+        table = dict(table.unwrap() if hasattr(table, 'unwrap') else table or {})
+        errors = []
+
+        def get(key, default, valid, expected):
+            value = table.get(key, default)
+            if value is not default and not valid(value):
+                errors.append(f'{key} must be {expected}, got {value!r}')
+                return default
+            return value
+
+        self.allow_dirty = get('allow_dirty', False, lambda value: isinstance(value, bool), 'a boolean')
+        self.commit = get('commit', False, lambda value: isinstance(value, bool), 'a boolean')
+        self.commit_on_argument = get('commit_on_argument', [], _is_str_list, 'a list of strings')
+        self.commit_on_branches = get('commit_on_branches', [], _is_str_list, 'a list of regular expressions')
+        self.commit_message = get('commit_message', DEFAULT_COMMIT_MESSAGE, lambda value: isinstance(value, str),
+                                  'a string')
+        self.commit_mode = get('commit_mode', 'all', lambda value: value in COMMIT_MODES,
+                               f'one of {", ".join(COMMIT_MODES)}')
+        self.commit_counter = get('commit_counter', None, lambda value: value in COMMIT_COUNTERS,
+                                  f'one of {", ".join(COMMIT_COUNTERS)}')
+        self.filename = get('filename', [], _is_str_list, 'a list of paths')
+        self.fields = get('fields', {}, _is_str_table, 'a table of format strings')
+        self.workers = get('workers', None,
+                           lambda value: isinstance(value, int) and not isinstance(value, bool) and value > 0,
+                           'a positive integer')
+        self.cache = get('cache', True, lambda value: isinstance(value, (bool, str)), 'a boolean or a path')
+        self.dirty_paths = get('dirty_paths', [], _is_str_list, 'a list of paths')
+        self.dirty_ignore = get('dirty_ignore', [], _is_str_list, 'a list of glob patterns')
+        self.workspace_members = get('workspace_members', None, _is_str_list, 'a list of glob patterns')
+        self.trace = get('trace', None, lambda value: isinstance(value, str) and value, 'a path')
+        self.git_info_provider = get('git_info_provider', 'gitpython', lambda value: value in GIT_INFO_PROVIDERS,
+                                     f'one of {", ".join(GIT_INFO_PROVIDERS)}')
+        self.git_info_env = get('git_info_env', {}, _is_str_table, 'a table of environment variable names')
+        self.git_info_file = get('git_info_file', None, lambda value: isinstance(value, str) and value, 'a path')
+        self.probe_timeout = get('probe_timeout', None,
+                                 lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+                                 and value > 0, 'a positive number of seconds')
+        self.version_structures = get('version_structures', False, lambda value: isinstance(value, bool),
+                                      'a boolean')
+        # Unknown placeholders would only fail once the version command has rewritten pyproject.toml
+        for key, value in self.fields.items():
+            problem = check_format_keys(value, GIT_INFO_KEYS)
+            if problem:
+                errors.append(f'fields.{key} {problem}')
+        problem = check_format_keys(self.commit_message, COMMIT_MESSAGE_KEYS)
+        if problem:
+            errors.append(f'commit_message {problem}')
+        if self.git_info_provider == 'file' and self.git_info_file is None:
+            errors.append('git_info_file must be set when git_info_provider is file')
+
+        self._branch_matcher = None
+        try:
+            self._branch_matcher = compile_branch_patterns(self.commit_on_branches)
+        except re.error as ex:
+            errors.append(f'commit_on_branches has an invalid regular expression {ex.pattern!r}: {ex}')
+
+        if errors:
+            raise ValueError(f'Invalid [tool.versions.settings] in {source}: {"; ".join(errors)}')
+
+    @classmethod
+    def from_pyproject(cls, pyproject):
+        """Parse the settings of a poetry PyProjectTOML."""
+        try:
+            table = pyproject.data['tool']['versions']['settings']
+        except (KeyError, TypeError):
+            table = None
+
+        return cls(table, str(pyproject.file.path))
+
+    def match_branch(self, branch):
+        """Whether `branch` matches one of the `commit_on_branches` patterns (never, if there is none)."""
+        return self._branch_matcher is not None and branch is not None and bool(self._branch_matcher(branch))
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__ if not name.startswith('_'))
+        return f'Settings({values})'
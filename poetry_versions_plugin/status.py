@@ -0,0 +1,129 @@
+import os
+
+
+class DirtyState:
+    """
+    Snapshot of the working tree state, taken with a single `git status` call.
+
+    `modified` holds the paths with staged or unstaged changes to tracked files,
+    `untracked` the untracked paths (empty if untracked files were not scanned),
+    and `pathspecs` the pathspecs the scan was limited to (empty for the whole repository).
+    """
+
+    def __init__(self, modified=None, untracked=None, untracked_scanned=False, pathspecs=None):
+        self.modified = modified or []
+        self.untracked = untracked or []
+        self.untracked_scanned = untracked_scanned
+        self.pathspecs = pathspecs or []
+
+    @property
+    def is_dirty(self):
+        """Same meaning as `git.Repo.is_dirty()`: tracked files differ from the index or HEAD."""
+        return bool(self.modified)
+
+    @property
+    def has_changes(self):
+        """Same meaning as `git.Repo.is_dirty(untracked_files=True)`."""
+        return bool(self.modified or self.untracked)
+
+    def __repr__(self):
+        return f'DirtyState(modified={self.modified!r}, untracked={self.untracked!r})'
+
+
+def build_pathspecs(repo, paths=None, ignore=None, base_dir=None):
+    """
+    Build the git pathspecs limiting the dirty check to `paths` and excluding the `ignore` globs.
+
+    Paths and globs are relative to `base_dir` (usually the directory of pyproject.toml) and are
+    rewritten relative to the repository root, where git commands run. Globs use git's `glob`
+    pathspec magic, so `*` does not cross directories while `**` does.
+
+    :param repo: The git.Repo instance.
+    :param paths: Paths to limit the check to, the whole repository if empty.
+    :param ignore: Glob patterns to exclude from the check.
+    :param base_dir: Directory the paths are relative to, defaults to the repository root.
+    :return: A list of pathspecs, empty if the whole repository should be checked.
+    """
+    prefix = ''
+    if base_dir is not None:
+        prefix = os.path.relpath(os.path.abspath(base_dir), repo.working_tree_dir)
+        prefix = '' if prefix == os.curdir else prefix.replace(os.sep, '/') + '/'
+
+    pathspecs = [prefix + path for path in paths or []]
+    pathspecs += [f':(exclude,glob){prefix}{pattern}' for pattern in ignore or []]
+    if pathspecs and not paths and prefix:
+        # Exclusions alone apply to the whole repository, restrict them to base_dir
+        pathspecs.insert(0, prefix)
+
+    return pathspecs
+
+
+def status_command(repo, untracked_files=True, pathspecs=None, optional_locks=True):
+    """
+    Build the `git status` command used for dirty detection.
+
+    `git status` refreshes the index stat cache and writes it back, so unchanged files are not
+    re-hashed on the next run. The untracked cache is enabled unless the repository configures
+    `core.untrackedCache` itself, and a configured `core.fsmonitor` is used by git as is.
+
+    :param repo: The git.Repo instance.
+    :param untracked_files: Whether to scan for untracked files.
+    :param pathspecs: Pathspecs limiting the scan, see build_pathspecs.
+    :param optional_locks: False to keep git from writing the refreshed index back, for background processes
+        watching the index (see watch.py), which would otherwise be notified of their own scans.
+    :return: The command as a list of arguments.
+    """
+    command = ['git'] if optional_locks else ['git', '--no-optional-locks']
+
+    with repo.config_reader() as config:
+        if not config.has_option('core', 'untrackedCache'):
+            command += ['-c', 'core.untrackedCache=true']
+
+    command += ['status', '--porcelain', '-z', '--untracked-files=' + ('normal' if untracked_files else 'no')]
+    if pathspecs:
+        command += ['--', *pathspecs]
+    return command
+
+
+def parse_status(output, untracked_scanned=True, pathspecs=None):
+    """
+    Parse the output of `git status --porcelain -z`.
+
+    :param output: The raw command output.
+    :param untracked_scanned: Whether untracked files were part of the scan.
+    :param pathspecs: The pathspecs the scan was limited to.
+    :return: A DirtyState instance.
+    """
+    modified = []
+    untracked = []
+
+    entries = iter(output.split('\0'))
+    for entry in entries:
+        if not entry:
+            continue
+
+        code, path = entry[:2], entry[3:]
+        if code == '??':
+            untracked.append(path)
+            continue
+
+        modified.append(path)
+        if 'R' in code or 'C' in code:
+            # Renames and copies are followed by the original path
+            next(entries, None)
+
+    return DirtyState(modified, untracked, untracked_scanned, pathspecs)
+
+
+def scan_dirty_state(repo, untracked_files=True, pathspecs=None, optional_locks=True):
+    """
+    Detect uncommitted changes in the repository with a single `git status` call.
+
+    :param repo: The git.Repo instance.
+    :param untracked_files: Whether to scan for untracked files.
+    :param pathspecs: Pathspecs limiting the scan, see build_pathspecs. Git only stats these subtrees.
+    :param optional_locks: See status_command.
+    :return: A DirtyState instance.
+    """
+    output = repo.git.execute(status_command(repo, untracked_files, pathspecs, optional_locks))
+    return parse_status(output, untracked_files, pathspecs)
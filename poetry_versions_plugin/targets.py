@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from poetry_versions_plugin.output import apply_staged, discard, is_changed, stage_content
+from poetry_versions_plugin.services import py_file_content, pyi_file_content
+from poetry_versions_plugin.template import count_placeholders, stage_render, template_context
+from poetry_versions_plugin.tracing import NULL_TRACER
+
+
+class TargetResult:
+    """
+    Outcome of updating one `filename` target.
+
+    `changed` tells whether the content changed (or would change, in dry-run mode),
+    `error` holds the exception raised while updating the target, if any.
+    """
+
+    def __init__(self, path, changed=False, error=None, tmp_path=None):
+        self.path = path
+        self.changed = changed
+        self.error = error
+        self.tmp_path = tmp_path
+
+    def __repr__(self):
+        return f'TargetResult(path={self.path!r}, changed={self.changed!r}, error={self.error!r})'
+
+
+def default_workers(count):
+    """Default number of worker threads for `count` targets, like ThreadPoolExecutor's own default."""
+    return max(1, min(count, 32, (os.cpu_count() or 1) + 4))
+
+
+def stage_target(path, info, context, write_line, dry_run=False, structures=False):
+    """
+    Prepare the new content of a target without touching it.
+
+    Python files (`.py`) are generated with services.py_file_content, their stubs (`.pyi`) with
+    services.pyi_file_content, other files have their placeholders rendered. In dry-run mode nothing is written at all.
+
+    :return: A TargetResult, whose `tmp_path` holds the staged content if the target changes.
+    """
+    try:
+        if path.endswith(('.py', '.pyi')):
+            content = pyi_file_content(info) if path.endswith('.pyi') else py_file_content(info, structures)
+            if dry_run:
+                write_line("Would write to file: {}", path)
+                return TargetResult(path, is_changed(path, content.encode('utf-8')))
+
+            dir_path = os.path.dirname(path)
+            if dir_path:
+                os.makedirs(dir_path, exist_ok=True)
+            tmp_path = stage_content(path, content)
+        else:
+            if dry_run:
+                replaced = count_placeholders(path, context)
+                write_line("Would replace {} placeholders in {}", replaced, path)
+                return TargetResult(path, replaced > 0)
+
+            tmp_path = stage_render(path, context)[0]
+    except Exception as ex:
+        return TargetResult(path, error=ex)
+
+    return TargetResult(path, tmp_path is not None, tmp_path=tmp_path)
+
+
+def apply_target(result):
+    """Move the staged content of a target into place."""
+    try:
+        if result.tmp_path is not None:
+            apply_staged(result.tmp_path, result.path)
+    except Exception as ex:
+        result.error = ex
+    finally:
+        result.tmp_path = None
+
+    return result
+
+
+def with_stubs(files):
+    """Add the companion stub (`.pyi`) of each Python file target, right after it."""
+    return [companion for path in files for companion in ((path, path + 'i') if path.endswith('.py') else (path,))]
+
+
+def update_targets(files, info, write_line, dry_run=False, fields=None, workers=None, tracer=None,
+                   structures=False):
+    """
+    Update the `filename` targets concurrently, all or nothing.
+
+    The new content of every target is first staged into a temporary file next to it, using a bounded
+    thread pool. Only if all targets were staged successfully are the temporary files renamed into place,
+    otherwise they are discarded and no target is modified. A failure while renaming (the only step left
+    after staging) is reported on the target that failed.
+
+    :param files: The target paths, in configuration order.
+    :param info: Dictionary containing Git information
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+    :param dry_run: If True, only report which targets would change
+    :param fields: Optional user-defined fields, see template.template_context
+    :param workers: Maximum number of worker threads, defaults to default_workers(len(files))
+    :param tracer: A tracing.Tracer timing the staging and the renaming of each target
+    :param structures: If True, generate the precomputed version structures in the Python files,
+        and their `.pyi` stubs next to them
+    :return: A list of TargetResult, in the order of `files`.
+    """
+    if structures:
+        files = with_stubs(files)
+    if not files:
+        return []
+
+    context = template_context(info, fields)
+    workers = workers or default_workers(len(files))
+    tracer = tracer or NULL_TRACER
+
+    def stage(path):
+        with tracer.span('stage file', path=path):
+            return stage_target(path, info, context, write_line, dry_run, structures)
+
+    def apply(result):
+        with tracer.span('apply file', path=result.path):
+            return apply_target(result)
+
+    executor = None
+    run = map
+    if workers > 1 and len(files) > 1:
+        executor = ThreadPoolExecutor(max_workers=min(workers, len(files)))
+        # map keeps the order of `files`, whatever order the targets complete in
+        run = executor.map
+
+    try:
+        results = list(run(stage, files))
+
+        if dry_run or any(result.error for result in results):
+            for result in results:
+                discard(result.tmp_path)
+                result.tmp_path = None
+            return results
+
+        return list(run(apply, results))
+    finally:
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,112 @@
+import re
+
+from poetry_versions_plugin.output import discard, replace_if_changed, temp_path
+
+# <!-- NAME --> markers, NAME being an upper case key of the template context
+PLACEHOLDER_PATTERN = re.compile(r'<!--\s*([A-Z][A-Z0-9_]*)\s*-->')
+
+
+def template_context(info, fields=None):
+    """
+    Build the values available to placeholders from the git information.
+
+    :param info: Dictionary containing Git information, its keys are available as upper case placeholders.
+    :param fields: Optional user-defined fields (`tool.versions.settings.fields`). Their values are
+        `str.format` templates over the git information, e.g. `"{version}+{commit}"`.
+    :return: A dictionary mapping placeholder names to their replacement text.
+    """
+    context = {key.upper(): str(value) for key, value in info.items()}
+    for key, value in (fields or {}).items():
+        context[key.upper()] = str(value).format(**info)
+
+    return context
+
+
+def render(text, context):
+    """
+    Replace all known placeholders of `text` in a single pass.
+
+    Unknown placeholders are left untouched.
+
+    :param text: The text to render.
+    :param context: The values returned by template_context.
+    :return: A tuple (rendered text, number of placeholders replaced).
+    """
+    replaced = 0
+
+    def replace(match):
+        nonlocal replaced
+        value = context.get(match.group(1))
+        if value is None:
+            return match.group(0)
+
+        replaced += 1
+        return value
+
+    return PLACEHOLDER_PATTERN.sub(replace, text), replaced
+
+
+def stage_render(path, context):
+    """
+    Render the placeholders of a text file into a temporary file, streaming it line by line.
+
+    At most one line is held in memory. Apply the result with output.replace_if_changed.
+
+    :param path: Path to the file.
+    :param context: The values returned by template_context.
+    :return: A tuple (temporary file path or None if no known placeholder was found, number of placeholders replaced).
+    """
+    replaced = 0
+
+    # newline='' keeps the original line endings
+    with open(path, 'r', newline='') as src:
+        tmp_path = temp_path(path)
+        try:
+            with open(tmp_path, 'w', newline='') as dst:
+                for line in src:
+                    line, count = render(line, context)
+                    replaced += count
+                    dst.write(line)
+        except BaseException:
+            discard(tmp_path)
+            raise
+
+    if not replaced:
+        discard(tmp_path)
+        return None, 0
+
+    return tmp_path, replaced
+
+
+def count_placeholders(path, context):
+    """
+    Count the placeholders of a text file that would be replaced, without writing anything.
+
+    :param path: Path to the file.
+    :param context: The values returned by template_context.
+    :return: The number of placeholders that would be replaced.
+    """
+    with open(path, 'r', newline='') as src:
+        return sum(render(line, context)[1] for line in src)
+
+
+def render_file(path, context, dry_run=False):
+    """
+    Render the placeholders of a text file, streaming it line by line.
+
+    The rendered lines go to a temporary file next to `path`, which atomically replaces it once
+    the whole file has been rendered. The file is left untouched if it contains no known placeholder.
+
+    :param path: Path to the file.
+    :param context: The values returned by template_context.
+    :param dry_run: If True, only count the placeholders that would be replaced.
+    :return: The number of placeholders replaced.
+    """
+    if dry_run:
+        return count_placeholders(path, context)
+
+    tmp_path, replaced = stage_render(path, context)
+    if tmp_path is not None:
+        replace_if_changed(tmp_path, path)
+
+    return replaced
@@ -0,0 +1,137 @@
+import re
+
+import tomlkit
+
+# [table] and [[array.of.tables]] headers, with an optional trailing comment
+HEADER_PATTERN = re.compile(r'^\s*(\[\[?)\s*([^\[\]#]+?)\s*\]\]?\s*(#.*)?$')
+MULTILINE_STRING_PATTERN = re.compile(r'"""|\'\'\'')
+
+
+def table_name(header):
+    """Normalize a table header name, e.g. `tool . versions` becomes `tool.versions`."""
+    return re.sub(r'\s*\.\s*', '.', header)
+
+
+def string_lines(lines):
+    """
+    Find the lines of a TOML document starting inside a multi-line string.
+
+    :param lines: The lines of the document, with their line endings.
+    :return: The set of their indexes.
+    """
+    inside = set()
+    delimiter = None
+
+    for index, line in enumerate(lines):
+        if delimiter is not None:
+            inside.add(index)
+
+        for token in MULTILINE_STRING_PATTERN.findall(line):
+            if delimiter is None:
+                delimiter = token
+            elif token == delimiter:
+                delimiter = None
+
+    return inside
+
+
+def split_tables(lines, inside=None):
+    """
+    Find the table headers of a TOML document.
+
+    Lines inside multi-line strings are skipped, so their content is never taken for a header.
+
+    :param lines: The lines of the document, with their line endings.
+    :param inside: The result of string_lines, computed if omitted.
+    :return: A list of (line index, table name, is array of tables).
+    """
+    inside = string_lines(lines) if inside is None else inside
+    headers = []
+
+    for index, line in enumerate(lines):
+        if index not in inside:
+            match = HEADER_PATTERN.match(line)
+            if match:
+                headers.append((index, table_name(match.group(2)), match.group(1) == '[['))
+
+    return headers
+
+
+def key_pattern(key):
+    return re.compile(rf'^(\s*)(?:{re.escape(key)}|"{re.escape(key)}"|\'{re.escape(key)}\')\s*=\s*(.*?)(\r?\n)?$')
+
+
+def patch_table(text, table, values):
+    """
+    Set keys of a TOML table by rewriting only the lines of that table, leaving the rest of the text untouched.
+
+    Existing keys are rewritten in place (dropping any trailing comment), missing keys are appended after the
+    last key of the table. Values must be scalars (str, int, float, bool).
+
+    :param text: The TOML document.
+    :param table: The dotted name of the table, e.g. 'tool.versions'.
+    :param values: A dictionary of the keys to set.
+    :return: The patched document, or None if the table cannot be located unambiguously: it is missing,
+        defined more than once, (partly) defined with dotted keys or an inline table elsewhere, or a key to set
+        is defined more than once or holds a multi-line or complex value.
+    """
+    lines = text.splitlines(keepends=True)
+    # Keys are never looked for inside multi-line strings, whose content could look like one
+    inside = string_lines(lines)
+    headers = split_tables(lines, inside)
+
+    matches = [i for i, (_, name, is_array) in enumerate(headers) if name == table and not is_array]
+    if len(matches) != 1:
+        return None
+
+    header_index = matches[0]
+    start = headers[header_index][0] + 1
+    end = headers[header_index + 1][0] if header_index + 1 < len(headers) else len(lines)
+
+    # The table could also be defined through dotted keys or an inline table in a parent table,
+    # e.g. `versions.branch = ...` in [tool] or `tool.versions = {...}` before the first header
+    segments = [('', 0, headers[0][0] if headers else len(lines))]
+    segments += [
+        (name, index + 1, headers[i + 1][0] if i + 1 < len(headers) else len(lines))
+        for i, (index, name, _) in enumerate(headers) if i != header_index
+    ]
+    for owner, first, last in segments:
+        if owner and not table.startswith(f'{owner}.'):
+            continue
+        key = table[len(owner) + 1:] if owner else table
+        pattern = re.compile(rf'^\s*["\']?{re.escape(key)}["\']?\s*[.=]')
+        if any(pattern.match(lines[index]) for index in range(first, last) if index not in inside):
+            return None
+
+    eol = '\r\n' if lines[start - 1].endswith('\r\n') else '\n'
+    if not lines[start - 1].endswith('\n'):
+        lines[start - 1] += eol
+    region = lines[start:end]
+    missing = []
+
+    for key, value in values.items():
+        rendered = tomlkit.item(value).as_string()
+        pattern = key_pattern(key)
+        found = [i for i, line in enumerate(region) if start + i not in inside and pattern.match(line)]
+        if len(found) > 1:
+            return None
+
+        if not found:
+            missing.append(f'{key} = {rendered}{eol}')
+            continue
+
+        match = pattern.match(region[found[0]])
+        if match.group(2)[:1] in ('[', '{') or match.group(2).startswith(('"""', "'''")):
+            return None
+        region[found[0]] = f'{match.group(1)}{key} = {rendered}{match.group(3) or ""}'
+
+    if missing:
+        # Insert after the last non blank line of the table, keeping the blank lines before the next table
+        insert_at = len(region)
+        while insert_at > 0 and not region[insert_at - 1].strip():
+            insert_at -= 1
+        if insert_at and not region[insert_at - 1].endswith('\n'):
+            region[insert_at - 1] += eol
+        region[insert_at:insert_at] = missing
+
+    return ''.join(lines[:start] + region + lines[end:])
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Path of a Chrome trace file to write the spans of a version bump to, overrides the `trace` setting
+TRACE_ENV = 'POETRY_VERSIONS_TRACE'
+
+_NULL_SPAN = nullcontext()
+
+
+class Span:
+    """A timed phase: `start` and `duration` are in seconds, `start` relative to the tracer creation."""
+
+    __slots__ = ('name', 'start', 'duration', 'thread', 'args')
+
+    def __init__(self, name, start, duration, thread, args):
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.args = args
+
+    def __repr__(self):
+        return f'Span(name={self.name!r}, duration={self.duration!r})'
+
+
+class Tracer:
+    """
+    Record how long each phase of a version bump takes.
+
+    A disabled tracer records nothing: `span` returns a shared no-op context manager,
+    so instrumented code costs a method call per phase. Spans may be recorded from several threads.
+    """
+
+    def __init__(self, enabled=True, origin=None):
+        """
+        :param enabled: If False, nothing is recorded.
+        :param origin: The time.perf_counter() value spans are relative to, defaults to now.
+        """
+        self.enabled = enabled
+        self.origin = time.perf_counter() if origin is None else origin
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """
+        Time the `with` block as a span named `name`, `args` are attached to the span (e.g. the file path).
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, **args)
+
+    def record(self, name, start, duration, **args):
+        """Add a span measured by the caller, `start` being a time.perf_counter() value."""
+        if not self.enabled:
+            return
+
+        span = Span(name, start - self.origin, duration, threading.get_ident(), args)
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """
+        Total time and count of the spans, per name, in the order the names were first recorded.
+
+        :return: A list of (name, total seconds, count).
+        """
+        totals = {}
+        for span in sorted(self.spans, key=lambda span: span.start):
+            total, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (total + span.duration, count + 1)
+
+        return [(name, total, count) for name, (total, count) in totals.items()]
+
+    def chrome_trace(self):
+        """The spans in the Chrome trace event format, as loaded by chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        threads = {}
+        events = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': round(span.start * 1e6, 3),
+                'dur': round(span.duration * 1e6, 3),
+                'pid': pid,
+                # Small thread numbers, in order of appearance, read better than thread identifiers
+                'tid': threads.setdefault(span.thread, len(threads) + 1),
+                'args': {key: str(value) for key, value in span.args.items()},
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path):
+        """Write the spans to `path` as a Chrome trace JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, indent=1)
+
+
+NULL_TRACER = Tracer(enabled=False)
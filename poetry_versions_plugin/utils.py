@@ -1,5 +1,5 @@
-import inspect
 import re
+import threading
 from functools import wraps
 
 from cleo.io.outputs.output import Verbosity
@@ -36,34 +36,52 @@ def pyproject_get(pyproject, path, default=None):
         return default
 
 
-def wrap_write_line(func):
+class Logger:
+    """
+    Write plugin messages to a cleo IO, attributed to a fixed caller name.
+
+    Messages filtered out by the IO verbosity are dropped before they are formatted:
+    pass the values as extra arguments, e.g. `write_line('updated {}', info)`, and the
+    message is only built with `str.format` when it is actually written.
+    Loggers hold no global state, so listeners can run concurrently.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, io, caller='', event_name=''):
+        self.io = io
+        # Prefixes are computed once, instead of inspecting the stack for every message
+        self.prefix = f'<b>{PLUGIN_NAME}</b>: '
+        self.verbose_prefix = ' '.join(part for part in (self.prefix + caller, event_name) if part) + ' '
+
+    def is_enabled(self, verbosity: Verbosity = Verbosity.VERBOSE):
+        """Whether a message of the given verbosity would be written."""
+        return verbosity.value <= self.io.output.verbosity.value
+
+    def __call__(self, message, *args, verbosity: Verbosity = Verbosity.VERBOSE):
+        if not self.is_enabled(verbosity):
+            return
+
+        if args:
+            message = message.format(*args)
+
+        prefix = self.verbose_prefix if verbosity == Verbosity.VERBOSE else self.prefix
+        with self._lock:
+            self.io.write_line(prefix + message, verbosity)
+
+    write_line = __call__
+
+
+def with_logger(func):
+    """
+    Pass a Logger bound to the event and the listener name to an event listener.
+
+    The decorated listener receives the logger as an extra `write_line` argument.
+    """
+    caller = func.__name__
+
     @wraps(func)
     def wrapper(self, event, event_name, dispatcher):
-        # Define a helper function to simplify the write_line operation
-        def write_line(message, verbosity: Verbosity = Verbosity.VERBOSE):
-            io = event.io
-
-            if verbosity == Verbosity.VERBOSE:
-                # Dynamically get the caller function's name
-                caller_function_name = inspect.stack()[1].function
-                full_message = f'<b>{PLUGIN_NAME}</b>: {caller_function_name} {event_name} {message}'
-                io.write_line(full_message, verbosity)
-            else:
-                full_message = f'<b>{PLUGIN_NAME}</b>: {message}'
-                io.write_line(full_message, verbosity)
-
-        # Inject the simplified write_line into the function's local scope
-        func_globals = func.__globals__
-        original_write_line = func_globals.get('write_line')
-        func_globals['write_line'] = write_line
-
-        try:
-            return func(self, event, event_name, dispatcher)
-        finally:
-            # Restore the original write_line function, if any
-            if original_write_line is not None:
-                func_globals['write_line'] = original_write_line
-            else:
-                del func_globals['write_line']
+        return func(self, event, event_name, dispatcher, Logger(event.io, caller, event_name))
 
     return wrapper
@@ -0,0 +1,130 @@
+from pathlib import Path
+
+from poetry.core.constraints.version import Version
+
+from poetry_versions_plugin.utils import pyproject_get
+
+# Rank of the pre-release phases in the sort key, a release without pre-release sorts after all of them
+PRE_RANKS = {'a': 1, 'b': 2, 'rc': 3}
+FINAL_RANK = 4
+# A development release without pre-release sorts before the pre-releases of the same version
+DEV_RANK = 0
+# The bump rules of `poetry version`, any other rule is an explicit version number
+BUMP_RULES = ('major', 'minor', 'patch', 'premajor', 'preminor', 'prepatch', 'prerelease')
+
+
+def version_info(text):
+    """
+    Split a PEP 440 version into a (major, minor, patch, pre, local) tuple.
+
+    :param text: The version, e.g. `1.2.0rc1+ubuntu.1`.
+    :return: A tuple like `(1, 2, 0, 'rc1', 'ubuntu.1')`, `pre` and `local` being None when absent.
+    :raises: ValueError if the version is not PEP 440 compliant.
+    """
+    version = Version.parse(text)
+    return (
+        version.major,
+        version.minor or 0,
+        version.patch or 0,
+        version.pre.to_string() if version.pre else None,
+        '.'.join(version.local) if version.local else None,
+    )
+
+
+def sort_key(text):
+    """
+    Build a key ordering versions like PEP 440, made of plain tuples, ints and strings only.
+
+    The key can be written as a literal into the generated module, so consumers compare versions
+    without parsing them: `sort_key('1.0rc1') < sort_key('1.0') < sort_key('1.0.post1')`.
+
+    :param text: The version.
+    :return: A tuple (epoch, release, pre, post, dev, local).
+    :raises: ValueError if the version is not PEP 440 compliant.
+    """
+    version = Version.parse(text)
+
+    release = list(version.parts)
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+
+    if version.pre:
+        pre = (PRE_RANKS.get(version.pre.phase, DEV_RANK), version.pre.number)
+    elif version.dev and not version.post:
+        pre = (DEV_RANK, 0)
+    else:
+        pre = (FINAL_RANK, 0)
+
+    post = version.post.number if version.post else -1
+    # A development release sorts before the release it leads to
+    dev = (0, version.dev.number) if version.dev else (1, 0)
+    # Numeric local segments sort after alphanumeric ones, and numerically
+    local = tuple((1, int(part), '') if part.isdigit() else (0, 0, part.lower()) for part in version.local or ())
+
+    return version.epoch, tuple(release), pre, post, dev, local
+
+
+def next_version(version, rule, next_phase=False):
+    """
+    Compute the version `poetry version <rule>` would set, without starting Poetry.
+
+    The rules are the ones of Poetry's version command: `major`, `minor` and `patch` bump a release segment,
+    `premajor`, `preminor` and `prepatch` also start its first pre-release, `prerelease` bumps the pre-release
+    (or starts one for the next patch of a stable version). Any other rule is taken as the new version.
+
+    :param version: The current version, e.g. `1.2.3`.
+    :param rule: A bump rule or a version number.
+    :param next_phase: With `prerelease`, move to the next phase (e.g. `1.0a2` becomes `1.0b0`), like `--next-phase`.
+    :return: The new version text, e.g. `1.3.0` for `1.2.3` and `minor`.
+    :raises: ValueError if the current version, or the version given as rule, is not PEP 440 compliant.
+    """
+    try:
+        parsed = Version.parse(version)
+    except ValueError:
+        raise ValueError(f"The project's version {version!r} doesn't seem to follow semver") from None
+
+    if rule in ('major', 'premajor'):
+        new = parsed.next_major()
+    elif rule in ('minor', 'preminor'):
+        new = parsed.next_minor()
+    elif rule in ('patch', 'prepatch'):
+        new = parsed.next_patch()
+    elif rule == 'prerelease':
+        if parsed.pre is not None:
+            pre = parsed.pre.next_phase() if next_phase else parsed.pre.next()
+            return Version(parsed.epoch, parsed.release, pre).text
+        # Poetry fails on a development release without pre-release, it leads to the first pre-release instead
+        if parsed.is_unstable():
+            return Version(parsed.epoch, parsed.release).first_prerelease().text
+        new = parsed.next_patch().first_prerelease()
+    else:
+        return Version.parse(rule).text
+
+    if rule.startswith('pre') and rule != 'prerelease':
+        new = new.first_prerelease()
+    return new.text
+
+
+def project_version(pyproject):
+    """Return the version declared in a poetry PyProjectTOML, from `[project]` or `[tool.poetry]`."""
+    return pyproject_get(pyproject, 'project.version') or pyproject_get(pyproject, 'tool.poetry.version')
+
+
+def next_project_version(rule, path='pyproject.toml', next_phase=False):
+    """
+    Compute the next version of a project in-process, like `poetry version <rule> --dry-run`.
+
+    :param rule: A bump rule (see BUMP_RULES) or a version number.
+    :param path: The pyproject.toml of the project.
+    :param next_phase: See next_version.
+    :return: A tuple (current version, next version).
+    :raises: ValueError if the project has no version or a version is not PEP 440 compliant.
+    """
+    # Imported here, computing a version from a string does not need Poetry itself
+    from poetry.pyproject.toml import PyProjectTOML
+
+    current = project_version(PyProjectTOML(Path(path)))
+    if not current:
+        raise ValueError(f'No version declared in {path}')
+
+    return current, next_version(current, rule, next_phase)
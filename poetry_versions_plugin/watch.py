@@ -0,0 +1,370 @@
+"""
+Keep the generated version files current while HEAD moves.
+
+A watcher reports which parts of the git directory changed: `refs` (HEAD, packed-refs or a branch) or `index`.
+On Linux the changes are read from inotify (through ctypes, without any dependency), elsewhere the files are
+polled. Bursts of changes, e.g. the dozens of writes of a rebase, are debounced into a single update.
+
+The updater keeps the repository handle, the history information and the dirty state between updates, and only
+recomputes what a change can affect: the history when the refs moved, the dirty state on any change. The Python
+`filename` targets are regenerated only when the branch, commit, commit count, dirty flag or version changed.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+import git
+from cleo.io.outputs.output import Verbosity
+from poetry.pyproject.toml import PyProjectTOML
+
+from poetry_versions_plugin.refs import find_git_dirs
+from poetry_versions_plugin.services import get_history_info, git_info_from
+from poetry_versions_plugin.status import build_pathspecs, scan_dirty_state
+from poetry_versions_plugin.targets import update_targets, with_stubs
+from poetry_versions_plugin.versioning import project_version
+
+DEFAULT_DEBOUNCE = 0.05
+DEFAULT_POLL_INTERVAL = 0.2
+ALL_CHANGES = frozenset(('refs', 'index'))
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class PollingWatcher:
+    """
+    Detect changes of the git directory by comparing the stat of HEAD, the index, packed-refs and the branches.
+    """
+
+    def __init__(self, git_dir, common, interval=DEFAULT_POLL_INTERVAL):
+        self.git_dir = git_dir
+        self.common = common
+        self.interval = interval
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        """Return a dict mapping each change kind to the stat of its files."""
+        refs = {path: _stat_key(path) for path in (os.path.join(self.git_dir, 'HEAD'),
+                                                   os.path.join(self.common, 'packed-refs'))}
+        for directory, _, names in os.walk(os.path.join(self.common, 'refs', 'heads')):
+            for name in names:
+                if not name.endswith('.lock'):
+                    path = os.path.join(directory, name)
+                    refs[path] = _stat_key(path)
+
+        return {'refs': refs, 'index': _stat_key(os.path.join(self.git_dir, 'index'))}
+
+    def read(self, timeout=None):
+        """
+        Wait for changes.
+
+        :param timeout: Seconds to wait, None to wait until something changes.
+        :return: The set of changed kinds, empty if nothing changed before `timeout`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self.take_snapshot()
+            changes = {kind for kind, value in snapshot.items() if value != self.snapshot[kind]}
+            self.snapshot = snapshot
+            if changes:
+                return changes
+
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return set()
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class InotifyWatcher:
+    """
+    Receive the changes of the git directory from inotify, Linux only.
+
+    The git directory, the common directory and every directory below `refs/heads` are watched, since git
+    updates HEAD, the index and the refs by renaming a lock file over them.
+    """
+
+    def __init__(self, git_dir, common, libc):
+        self.git_dir = git_dir
+        self.common = common
+        self.heads = os.path.join(common, 'refs', 'heads')
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+
+        self.directories = {}
+        try:
+            for directory in {git_dir, common}:
+                self.add_watch(directory)
+            self.add_tree(self.heads)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, directory):
+        descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self.directories[descriptor] = directory
+
+    def add_tree(self, directory):
+        """Watch `directory` and its subdirectories, e.g. `refs/heads/feature/`."""
+        for path, _, _ in os.walk(directory):
+            self.add_watch(path)
+
+    def classify(self, descriptor, mask, name):
+        """Return the change kind of an event, or None if it is irrelevant."""
+        directory = self.directories.get(descriptor)
+        if directory is None or name.endswith('.lock'):
+            return None
+        if directory == self.git_dir and name == 'index':
+            return 'index'
+        if (directory == self.git_dir and name == 'HEAD') or (directory == self.common and name == 'packed-refs'):
+            return 'refs'
+        if directory == self.heads or directory.startswith(self.heads + os.sep):
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                try:
+                    self.add_tree(os.path.join(directory, name))
+                except OSError:
+                    pass
+            return 'refs'
+        return None
+
+    def read(self, timeout=None):
+        """
+        Wait for changes.
+
+        :param timeout: Seconds to wait, None to wait until something changes.
+        :return: The set of changed kinds, empty if nothing changed before `timeout`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changes = set()
+        while not changes:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not select.select([self.fd], [], [], remaining)[0]:
+                return changes
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    changes |= ALL_CHANGES
+                    continue
+                kind = self.classify(descriptor, mask, name)
+                if kind is not None:
+                    changes.add(kind)
+
+        return changes
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_libc():
+    """Return the C library if it provides inotify, None otherwise."""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def open_watcher(git_dir, common, polling=False, interval=DEFAULT_POLL_INTERVAL):
+    """
+    Open an InotifyWatcher, or a PollingWatcher if inotify is not available or `polling` is True.
+
+    :param git_dir: The git directory of the worktree.
+    :param common: The common git directory.
+    :param polling: Always poll, e.g. on network file systems where inotify does not report remote changes.
+    :param interval: Seconds between two polls.
+    """
+    libc = None if polling else load_libc()
+    if libc is not None:
+        try:
+            return InotifyWatcher(git_dir, common, libc)
+        except OSError:
+            # e.g. the inotify watch limit is reached
+            pass
+    return PollingWatcher(git_dir, common, interval)
+
+
+def wait_for_changes(watcher, debounce=DEFAULT_DEBOUNCE, timeout=None):
+    """
+    Wait for a change, then until no other change happened for `debounce` seconds.
+
+    :param watcher: An InotifyWatcher or PollingWatcher.
+    :param debounce: Seconds without change ending a burst.
+    :param timeout: Seconds to wait for the first change, None to wait forever.
+    :return: The set of changed kinds, empty if nothing changed before `timeout`.
+    """
+    changes = watcher.read(timeout)
+    while changes:
+        more = watcher.read(debounce)
+        if not more:
+            break
+        changes |= more
+    return changes
+
+
+class VersionFilesUpdater:
+    """
+    Regenerate the Python `filename` targets of a project from the current git information.
+
+    Text targets are left out: their placeholders are replaced by a version bump, not on every checkout.
+    """
+
+    def __init__(self, root, settings, write_line):
+        """
+        :param root: The project directory, holding pyproject.toml.
+        :param settings: The settings.Settings of the project.
+        :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+        """
+        self.root = root
+        self.settings = settings
+        self.write_line = write_line
+        self.repo = git.Repo(root, search_parent_directories=True)
+        self.files = [os.path.join(root, path) for path in settings.filename if path.endswith('.py')]
+        # The targets written by the updater itself must not make the next scan find the tree dirty
+        own = [os.path.relpath(os.path.abspath(path), self.repo.working_tree_dir).replace(os.sep, '/')
+               for path in with_stubs(self.files)]
+        self.pathspecs = build_pathspecs(self.repo, settings.dirty_paths, settings.dirty_ignore, root)
+        self.pathspecs += [f':(exclude,literal){path}' for path in own]
+        self.pyproject_path = os.path.join(root, 'pyproject.toml')
+        self.history = None
+        self.dirty_state = None
+        self.key = None
+        self._version = None
+        self._version_stat = None
+
+    @property
+    def version(self):
+        """The version of pyproject.toml, parsed again only when the file changed."""
+        stat = _stat_key(self.pyproject_path)
+        if stat != self._version_stat:
+            self._version = project_version(PyProjectTOML(Path(self.pyproject_path)))
+            self._version_stat = stat
+        return self._version
+
+    def update(self, changes=ALL_CHANGES):
+        """
+        Update the targets after `changes`.
+
+        :param changes: The changed kinds reported by a watcher.
+        :return: The list of targets.TargetResult, empty if the git information did not change.
+        """
+        if self.history is None or 'refs' in changes:
+            self.history = get_history_info(self.repo, self.settings.commit_counter, self.settings.cache)
+        # Moving HEAD without touching the index (`git reset --soft`) changes the dirty state too
+        self.dirty_state = scan_dirty_state(self.repo, untracked_files=False, pathspecs=self.pathspecs,
+                                            optional_locks=False)
+
+        version = self.version
+        key = (self.history['branch'], self.history['commit'], self.history['commit_count'],
+               self.dirty_state.is_dirty, version)
+        if key == self.key:
+            return []
+
+        info = git_info_from(self.history, self.dirty_state, version)
+        results = update_targets(self.files, info, self.write_line, fields=self.settings.fields,
+                                 workers=self.settings.workers, structures=self.settings.version_structures)
+        if all(result.error is None for result in results):
+            self.key = key
+        return results
+
+
+def watch(root, settings, write_line, debounce=DEFAULT_DEBOUNCE, polling=False, interval=DEFAULT_POLL_INTERVAL,
+          stop=None, on_update=None):
+    """
+    Update the Python `filename` targets of a project whenever HEAD, a branch or the index changes.
+
+    :param root: The project directory, holding pyproject.toml.
+    :param settings: The settings.Settings of the project.
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+    :param debounce: Seconds without change ending a burst of changes.
+    :param polling: Poll the git directory instead of using inotify.
+    :param interval: Seconds between two polls.
+    :param stop: A threading.Event ending the loop, the loop runs until interrupted if omitted.
+    :param on_update: Called with the list of targets.TargetResult after each update.
+    :raises: ValueError if `root` is not in a git repository.
+    """
+    dirs = find_git_dirs(root)
+    if dirs is None:
+        raise ValueError(f'{root} is not in a git repository')
+
+    updater = VersionFilesUpdater(root, settings, write_line)
+    with open_watcher(*dirs, polling=polling, interval=interval) as watcher:
+        changes = ALL_CHANGES
+        while stop is None or not stop.is_set():
+            if changes:
+                start = time.perf_counter()
+                try:
+                    results = updater.update(changes)
+                except Exception as ex:
+                    write_line('update failed: {}', ex, verbosity=Verbosity.NORMAL)
+                else:
+                    changed = [result.path for result in results if result.changed]
+                    for result in results:
+                        if result.error is not None:
+                            write_line('failed to update {}: {}', result.path, result.error,
+                                       verbosity=Verbosity.NORMAL)
+                    write_line('{} updated in {:.1f} ms', ', '.join(changed) or 'no file',
+                               (time.perf_counter() - start) * 1000,
+                               verbosity=Verbosity.NORMAL if changed else Verbosity.VERBOSE)
+                    if on_update is not None:
+                        on_update(results)
+            # A bounded wait, so that `stop` is checked regularly
+            changes = wait_for_changes(watcher, debounce, timeout=None if stop is None else interval)
@@ -0,0 +1,183 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import git
+from poetry.pyproject.toml import PyProjectTOML
+
+from poetry_versions_plugin.providers import LazyGitInfo
+from poetry_versions_plugin.services import commit_local_changes, update_pyproject
+from poetry_versions_plugin.settings import Settings
+from poetry_versions_plugin.targets import default_workers, update_targets
+from poetry_versions_plugin.utils import pyproject_get
+from poetry_versions_plugin.versioning import next_version, project_version
+
+DEFAULT_MEMBERS = ['**/pyproject.toml']
+
+
+class WorkspaceMember:
+    """
+    A package of the workspace, i.e. a pyproject.toml with a `[tool.versions.settings]` table and a version.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.directory = os.path.dirname(self.path)
+        self.pyproject = PyProjectTOML(Path(self.path))
+        self._settings = None
+        self.current_version = None
+        self.new_version = None
+        self.changed = []
+        self.error = None
+
+    @property
+    def name(self):
+        return (pyproject_get(self.pyproject, 'project.name')
+                or pyproject_get(self.pyproject, 'tool.poetry.name')
+                or os.path.basename(self.directory))
+
+    @property
+    def version(self):
+        """The version declared in pyproject.toml, from `[project]` or `[tool.poetry]`."""
+        return project_version(self.pyproject)
+
+    @property
+    def settings(self):
+        """The parsed `[tool.versions.settings]` table, see settings.Settings."""
+        if self._settings is None:
+            self._settings = Settings.from_pyproject(self.pyproject)
+        return self._settings
+
+    def __repr__(self):
+        return f'WorkspaceMember(path={self.path!r})'
+
+
+def discover_members(root, patterns=None):
+    """
+    Find the workspace members below `root`.
+
+    Candidates are the pyproject.toml files tracked by git matching the glob `patterns` (relative to `root`),
+    so ignored directories like virtual environments are never walked.
+
+    :param root: The workspace root directory.
+    :param patterns: Git glob pathspecs of the pyproject.toml files, defaults to every tracked pyproject.toml.
+    :return: A list of WorkspaceMember, sorted by path.
+    """
+    repo = git.Repo(root, search_parent_directories=True)
+    pathspecs = [f':(glob){pattern}' for pattern in patterns or DEFAULT_MEMBERS]
+
+    # With -C, ls-files matches the pathspecs and prints the paths relative to `root`
+    output = repo.git.execute(['git', '-C', os.path.abspath(root), 'ls-files', '-z', '--', *pathspecs])
+
+    members = []
+    for path in sorted(filter(None, output.split('\0'))):
+        if os.path.basename(path) != 'pyproject.toml':
+            continue
+
+        member = WorkspaceMember(os.path.join(root, path))
+        if pyproject_get(member.pyproject, 'tool.versions.settings') is not None and member.version:
+            members.append(member)
+
+    return members
+
+
+def set_version(pyproject, version):
+    """Write the version into `[project]` and/or `[tool.poetry]`, where the version command would."""
+    for path in ('project', 'tool.poetry'):
+        table = pyproject_get(pyproject, path)
+        if table is not None and 'version' in table:
+            table['version'] = version
+
+
+def bump_member(member, rule, info, write_line, dry_run=False):
+    """
+    Bump the version of a workspace member and update its pyproject.toml and `filename` targets.
+
+    The targets are updated all or nothing, pyproject.toml is only written if they all succeeded.
+    Errors are recorded on the member instead of being raised.
+
+    :param member: The WorkspaceMember.
+    :param rule: The version number or the bump rule (`major`, `minor`, `patch`, ...).
+    :param info: Dictionary containing the Git information shared by all members.
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+    :param dry_run: If True, only report what would change
+    :return: The member.
+    """
+    try:
+        member.current_version = member.version
+        member.new_version = next_version(member.current_version, rule)
+        member_info = dict(info, version=member.new_version)
+
+        files = [os.path.join(member.directory, file) for file in member.settings.filename]
+        results = update_targets(files, member_info, write_line, dry_run, fields=member.settings.fields, workers=1,
+                                 structures=member.settings.version_structures)
+        failed = [result for result in results if result.error is not None]
+        if failed:
+            raise failed[0].error
+
+        set_version(member.pyproject, member.new_version)
+        # The version was set in the document, so it has to be saved as a whole
+        if update_pyproject(member_info, member.pyproject, write_line, dry_run, surgical=False):
+            member.changed.append(member.path)
+        member.changed += [result.path for result in results if result.changed]
+    except Exception as ex:
+        member.error = ex
+
+    return member
+
+
+def bump_workspace(rule, write_line, root='.', dry_run=False, allow_dirty=False, commit=True,
+                   commit_message=None, workers=None):
+    """
+    Bump every member of the workspace in one process, gathering the Git information once.
+
+    The members are bumped in parallel (each member only writes its own files), and the changes of
+    all members are committed together. The workspace settings are read from the `[tool.versions.settings]`
+    table of `root`/pyproject.toml, if any: `workspace_members` (glob patterns of the member pyproject.toml
+    files), `commit_counter`, `dirty_paths`, `dirty_ignore`, `cache`, `commit_mode`
+    and the `git_info_*` provider settings.
+
+    :param rule: The version number or the bump rule (`major`, `minor`, `patch`, ...).
+    :param write_line: utils.Logger (or a compatible callable) to write a line to the console
+    :param root: The workspace root directory.
+    :param dry_run: If True, only report what would change
+    :param allow_dirty: If True, bump even if the repository has uncommitted changes
+    :param commit: If True, commit the changes of all members in one commit
+    :param commit_message: Commit message, `{versions}` is replaced with the list of bumped versions
+    :param workers: Maximum number of members bumped concurrently
+    :return: The list of WorkspaceMember.
+    :raises: ValueError if the repository is dirty and `allow_dirty` is False, or if the root settings are invalid.
+    """
+    settings = Settings.from_pyproject(PyProjectTOML(Path(root, 'pyproject.toml')))
+    members = discover_members(root, settings.workspace_members)
+    if not members:
+        write_line('no workspace member found')
+        return members
+
+    provider = LazyGitInfo(commit_counter=settings.commit_counter, dirty_paths=settings.dirty_paths,
+                           dirty_ignore=settings.dirty_ignore, base_dir=root, cache=settings.cache,
+                           provider=settings.git_info_provider, env=settings.git_info_env, file=settings.git_info_file,
+                           timeout=settings.probe_timeout,
+                           # Untracked files are only staged by a commit in `all` mode
+                           untracked_files=commit and not dry_run and settings.commit_mode == 'all')
+    info = provider.get()
+    dirty_state = provider.dirty_state
+    if info['is_dirty'] and not allow_dirty:
+        modified = f': {", ".join(dirty_state.modified)}' if dirty_state is not None else ''
+        raise ValueError(f'The repository has uncommitted changes{modified}')
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers(len(members))) as executor:
+        list(executor.map(lambda member: bump_member(member, rule, info, write_line, dry_run), members))
+
+    failed = [member for member in members if member.error is not None]
+    changed = [path for member in members for path in member.changed]
+    if dry_run or failed or not commit or not changed:
+        return members
+
+    versions = ', '.join(f'{member.name} {member.current_version} → {member.new_version}' for member in members)
+    commit_local_changes(git.Repo(root, search_parent_directories=True).working_tree_dir,
+                         (commit_message or 'Bump versions: {versions}').format(versions=versions),
+                         dirty_state=dirty_state, paths=changed,
+                         only_paths=settings.commit_mode == 'paths')
+
+    return members
@@ -1,5 +1,19 @@
+import hashlib
+import json
+import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import git
+
+from poetry_versions_plugin import refs
+from poetry_versions_plugin.commits import CHECKPOINT_DIR, is_ancestor
+from poetry_versions_plugin.versioning import next_project_version
+
+DEVELOP_BRANCH = 'develop'
+DIST_DIR = 'dist'
+RELEASE_STATE_FILE = 'release-state.json'
 
 
 def run_command(command, user_input=None, env=None):
@@ -46,21 +60,49 @@ def highlight_text(text):
     return f"\033[1m{text}\033[0m"
 
 
-def check_develop_branch():
-    """Check if the current branch is 'develop'."""
-    current_commit = run_command("git rev-parse HEAD")
-    branches = run_command(f"git branch --contains {current_commit}")
+def open_repository(path='.'):
+    """Open the repository containing `path`, the handle is shared by all the release steps."""
+    return git.Repo(path, search_parent_directories=True)
+
 
-    if "develop" not in branches:
-        print("Error: Current commit is not on the develop branch. Exiting.")
+def check_develop_branch(repo, branch=DEVELOP_BRANCH):
+    """
+    Check if the current commit is on the develop branch, i.e. it is an ancestor of (or is) its tip.
+
+    Only `branch` is queried, unlike `git branch --contains` which tests the commit against every branch.
+    """
+    head = refs.read_head(repo.git_dir, repo.common_dir)
+    current_commit = head[1] if head else repo.head.commit.hexsha
+
+    develop_commit = refs.resolve_ref(repo.git_dir, repo.common_dir, f'refs/heads/{branch}')
+    if develop_commit is None:
+        try:
+            develop_commit = repo.commit(branch).hexsha
+        except (git.BadName, ValueError):
+            print(f"Error: The {branch} branch does not exist. Exiting.")
+            sys.exit(1)
+
+    if not is_ancestor(repo, current_commit, develop_commit):
+        print(f"Error: Current commit is not on the {branch} branch. Exiting.")
         sys.exit(1)
 
-    print("On the develop branch.")
+    print(f"On the {branch} branch.")
 
 
-def check_uncommitted_changes():
-    """Check for uncommitted changes in the repository."""
-    status = run_command("git status --porcelain")
+def get_uncommitted_changes(repo):
+    """Return the uncommitted changes of the repository in the `git status --porcelain` format."""
+    return repo.git.status('--porcelain')
+
+
+def check_uncommitted_changes(repo, status=None):
+    """
+    Check for uncommitted changes in the repository, offering to commit them.
+
+    :param repo: The repository.
+    :param status: The changes returned by get_uncommitted_changes, queried if omitted.
+    """
+    if status is None:
+        status = get_uncommitted_changes(repo)
     if not status:
         print("No uncommitted changes found.")
         return
@@ -73,11 +115,11 @@ def check_uncommitted_changes():
         sys.exit(1)
 
     message = input("Enter commit message: ")
-    run_command("git add .")
-    run_command(f'git commit -m "{message}"')
+    repo.git.add('.')
+    repo.git.commit('-m', message)
 
     # Retrieve and display commit details
-    commit_details = run_command("git show --stat HEAD")
+    commit_details = repo.git.show('--stat', 'HEAD')
     print("\nCommit details:")
     print(commit_details)
 
@@ -91,36 +133,221 @@ def check_uncommitted_changes():
 
 
 def get_next_version(version_type):
-    """Get the next version number based on the specified version type."""
-    # Execute the command and capture the output
-    output = run_command(f"poetry version {version_type} --dry-run")
+    """Get the next version number based on the specified version type, computed in-process."""
+    current_version, next_version = next_project_version(version_type)
+
+    print(f"Next version: {next_version} (current: {current_version})")
+    return next_version
 
-    # Split the output into lines
-    lines = output.splitlines()
 
-    # Assume the first line contains the version bump information
-    first_line = lines[0]
+def git_flow_release_start(version):
+    """Start a git flow release branch."""
+    run_command(f"git flow release start {version}")
 
-    # Split the first line by spaces and get the last element which is the new version
-    next_version = first_line.split()[-1]
 
-    print(f"Next version: {next_version}")
-    return next_version
+def bump_version(version):
+    """
+    Set the version on the release branch.
 
+    The computed version is set rather than the bump rule, so running the step again after a failure does not bump
+    the version twice.
+    """
+    run_command(f"poetry version {version}")
 
-def git_flow_release(version, version_type):
-    """Perform a release using git flow."""
-    run_command(f"git flow release start {version}")
-    # run_command(f"poetry version {version_type} --dry-run")
-    run_command(f"poetry version {version_type}")
+
+def git_flow_release_finish(version):
+    """Finish the git flow release, merging it into master and develop."""
     run_command(f'git flow release finish {version} -m "publish v{version}"')
 
 
-def publish_package():
-    """Switch to the "master" branch and publish the package."""
+def hash_file(path):
+    """Return the SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_artifacts(version, dist_dir=DIST_DIR):
+    """Return the names of the wheels and sdists of `version` in `dist_dir`."""
+    try:
+        names = os.listdir(dist_dir)
+    except OSError:
+        return []
+    return sorted(name for name in names
+                  if (name.endswith('.whl') and f'-{version}-' in name) or name.endswith(f'-{version}.tar.gz'))
+
+
+def artifacts_match(artifacts, dist_dir=DIST_DIR):
+    """Check that the recorded artifacts (a dict of file name to SHA-256) are all still in `dist_dir`, unchanged."""
+    if not artifacts:
+        return False
+    try:
+        return all(hash_file(os.path.join(dist_dir, name)) == digest for name, digest in artifacts.items())
+    except OSError:
+        return False
+
+
+def build_package(version, dist_dir=DIST_DIR):
+    """
+    Switch to the "master" branch and build the package.
+
+    :return: The built artifacts, a dict of file name to SHA-256.
+    """
     run_command("git checkout master")
-    # run_command("poetry publish --build --dry-run")
-    run_command("poetry publish --build")
+    run_command("poetry build")
+
+    artifacts = {name: hash_file(os.path.join(dist_dir, name)) for name in find_artifacts(version, dist_dir)}
+    if not artifacts:
+        print(f"Error: No artifact of version {version} was built in {dist_dir}. Exiting.")
+        sys.exit(1)
+    return artifacts
+
+
+def publish_package():
+    """Publish the built package."""
+    # run_command("poetry publish --dry-run")
+    run_command("poetry publish")
+
+
+def preflight(repo, version_type):
+    """
+    Run the independent release checks concurrently: the develop branch check, the uncommitted changes
+    query and the next version computation. None of them modifies the repository.
+
+    :param repo: The repository.
+    :param version_type: The version bump, e.g. `minor`.
+    :return: A tuple (uncommitted changes as returned by get_uncommitted_changes, next version).
+    :raises: SystemExit if the current commit is not on the develop branch.
+    """
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix='preflight') as executor:
+        develop = executor.submit(check_develop_branch, repo)
+        status = executor.submit(get_uncommitted_changes, repo)
+        next_version = executor.submit(get_next_version, version_type)
+
+        develop.result()
+        return status.result(), next_version.result()
+
+
+class ReleaseState:
+    """
+    The progress of a release, saved after every completed step so that a failed release can be resumed.
+
+    It records the completed steps and their outputs (the new version, the hashes of the built artifacts).
+    The file lives in the common git directory, next to the other files of the plugin, and is removed once
+    the release is published.
+    """
+
+    def __init__(self, path, version_type, completed=None, outputs=None):
+        self.path = path
+        self.version_type = version_type
+        self.completed = list(completed or [])
+        self.outputs = dict(outputs or {})
+
+    @classmethod
+    def load(cls, path, version_type):
+        """
+        Load the state of an unfinished release, or start a new one.
+
+        :param path: Path to the state file.
+        :param version_type: The version bump of the release.
+        :return: A ReleaseState.
+        :raises: ValueError if the unfinished release was started with another version bump.
+        """
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            state = cls(path, str(data['version_type']), data['completed'], data['outputs'])
+        except (OSError, ValueError, TypeError, KeyError):
+            return cls(path, version_type)
+
+        if state.version_type != version_type:
+            raise ValueError(f"An unfinished {state.version_type} release of version "
+                             f"{state.outputs.get('version')} was found in {path}")
+        return state
+
+    def is_done(self, step):
+        return step in self.completed
+
+    def complete(self, step, outputs=None):
+        """Record a completed step and its outputs, and save the state."""
+        self.completed.append(step)
+        self.outputs.update(outputs or {})
+        self.save()
+
+    def reset(self, step):
+        """Mark `step` and the steps completed after it as not done, and save the state."""
+        if step in self.completed:
+            del self.completed[self.completed.index(step):]
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version_type': self.version_type, 'completed': self.completed, 'outputs': self.outputs},
+                      f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def state_path(repo):
+    """Return the path of the release state file of the repository."""
+    return os.path.join(repo.common_dir, CHECKPOINT_DIR, RELEASE_STATE_FILE)
+
+
+def release_pipeline(repo, version_type):
+    """
+    Return the release steps as (name, description, action) tuples.
+
+    Descriptions are formatted with the outputs of the previous steps. Actions take these outputs and return
+    a dict of new outputs (or None), which is saved with the step.
+    """
+    # The uncommitted changes found by the preflight are only valid during this run
+    pending = {}
+
+    def run_preflight(outputs):
+        pending['status'], version = preflight(repo, version_type)
+        return {'version': version}
+
+    def commit_changes(outputs):
+        check_uncommitted_changes(repo, pending.pop('status', None))
+
+    return [
+        ('preflight', "Checking the develop branch, uncommitted changes and the next {version_type} version...",
+         run_preflight),
+        ('commit changes', "Checking for uncommitted changes...", commit_changes),
+        ('release start', "Starting the git flow release process for version {version}...",
+         lambda outputs: git_flow_release_start(outputs['version'])),
+        ('bump version', "Setting the version {version}...", lambda outputs: bump_version(outputs['version'])),
+        ('release finish', "Finishing the git flow release of version {version}...",
+         lambda outputs: git_flow_release_finish(outputs['version'])),
+        ('build', "Building the package...",
+         lambda outputs: {'artifacts': build_package(outputs['version'])}),
+        ('publish', "Publishing the package...", lambda outputs: publish_package()),
+    ]
+
+
+def run_pipeline(state, pipeline, step):
+    """
+    Run the steps of a pipeline that are not done yet, saving the state after each one.
+
+    :param state: The ReleaseState.
+    :param pipeline: The (name, description, action) steps, see release_pipeline.
+    :param step: The step counter, see steps.
+    """
+    for name, description, action in pipeline:
+        print(highlight_text(f"{step()} {description.format(version_type=state.version_type, **state.outputs)}"))
+        if state.is_done(name):
+            print("Already done, skipping.")
+            continue
+        state.complete(name, action(state.outputs))
 
 
 def steps(total_steps):
@@ -143,30 +370,40 @@ def steps(total_steps):
 
 def main():
     """Main function to execute the release process."""
-    if len(sys.argv) > 2:
-        print("Usage: python scripts/release.py [major|minor|patch]")
+    args = sys.argv[1:]
+    restart = '--restart' in args
+    args = [arg for arg in args if arg != '--restart']
+    if len(args) > 1:
+        print("Usage: python scripts/release.py [major|minor|patch] [--restart]")
         sys.exit(1)
 
-    step = steps(6)
-
-    print(highlight_text(f"{step()} Starting the release process..."))
-    version_type = sys.argv[1] if len(sys.argv) == 2 else 'minor'
+    version_type = args[0] if args else 'minor'
+    repo = open_repository()
+    path = state_path(repo)
+    if restart:
+        ReleaseState(path, version_type).clear()
 
-    print(highlight_text(f"{step()} Checking if you are on the develop branch..."))
-    check_develop_branch()
+    try:
+        state = ReleaseState.load(path, version_type)
+    except ValueError as ex:
+        print(f"Error: {ex}. Run the same release again to resume it, or pass --restart to start over.")
+        sys.exit(1)
 
-    print(highlight_text(f"{step()} Checking for uncommitted changes..."))
-    check_uncommitted_changes()
+    # Built artifacts are reused only if they were not modified or removed since
+    if state.is_done('build') and not artifacts_match(state.outputs.get('artifacts')):
+        print("The built artifacts changed since the last run, they will be rebuilt.")
+        state.reset('build')
 
-    # Get the next version number
-    print(highlight_text(f"{step()} Getting the next version number for {version_type}..."))
-    new_version = get_next_version(version_type)
+    pipeline = release_pipeline(repo, version_type)
+    step = steps(len(pipeline) + 1)
 
-    print(highlight_text(f"{step()} Starting the git flow release process for version {new_version}..."))
-    git_flow_release(new_version, version_type)
+    if state.completed:
+        print(highlight_text(f"{step()} Resuming the release process after: {', '.join(state.completed)}..."))
+    else:
+        print(highlight_text(f"{step()} Starting the release process..."))
 
-    print(highlight_text(f"{step()} Publishing the package..."))
-    publish_package()
+    run_pipeline(state, pipeline, step)
+    state.clear()
 
     print(highlight_text(f"\n{step()} 🎉🎉🎉 Release successful! The new version has been published "
                          "and uploaded to the repository! 🎉🎉🎉"))
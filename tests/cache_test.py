@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+import git
+import pytest
+
+from poetry_versions_plugin.cache import cache_key, cache_path
+from poetry_versions_plugin.services import get_history_info
+from tests.conftest import run_git
+
+
+@pytest.fixture
+def repo(git_repo):
+    """Create a small local repository with a few commits on the main branch."""
+    for i in range(3):
+        run_git(git_repo, "commit", "-q", "--allow-empty", "-m", f"commit {i}")
+    return git.Repo(git_repo)
+
+
+def test_history_info_cache_hit(repo):
+    """An unchanged checkout is served from the cache without counting commits."""
+    info = get_history_info(repo)
+    assert info == {"branch": "main", "commit": repo.head.commit.hexsha[:7], "commit_count": 3}
+
+    with patch('poetry_versions_plugin.services.count_commits') as count_commits:
+        assert get_history_info(repo) == info
+
+    count_commits.assert_not_called()
+
+
+def test_history_info_cache_invalidation(repo):
+    """New commits and branch switches invalidate the cached entry."""
+    get_history_info(repo)
+
+    run_git(repo.working_dir, "commit", "-q", "--allow-empty", "-m", "new commit")
+    assert get_history_info(repo)["commit_count"] == 4
+
+    run_git(repo.working_dir, "checkout", "-q", "-b", "feature", "HEAD~2")
+    info = get_history_info(repo)
+    assert info["branch"] == "feature"
+    assert info["commit_count"] == 2
+
+
+def test_history_info_corrupt_cache(repo):
+    get_history_info(repo)
+    with open(cache_path(repo), 'w') as f:
+        f.write('{"key": ')
+
+    assert get_history_info(repo)["commit_count"] == 3
+    assert cache_key(repo) is not None
+
+
+def test_history_info_custom_cache_path_and_disabled(repo, tmp_path):
+    get_history_info(repo, cache='.cache/git-info.json')
+    assert (tmp_path / '.cache' / 'git-info.json').exists()
+
+    with patch('poetry_versions_plugin.services.store_git_info') as store_git_info:
+        get_history_info(repo, cache=False)
+
+    store_git_info.assert_not_called()
+
+
+def test_history_info_cache_unshallow(repo, tmp_path_factory):
+    """The cached count of a shallow clone is not reused once the clone is unshallowed."""
+    clone = tmp_path_factory.mktemp("clone")
+    run_git(clone, "clone", "-q", "--depth", "1", f"file://{repo.working_dir}", ".")
+    clone = git.Repo(clone)
+    assert get_history_info(clone)["commit_count"] == 1
+
+    run_git(clone.working_dir, "fetch", "-q", "--unshallow")
+
+    assert get_history_info(clone)["commit_count"] == 3
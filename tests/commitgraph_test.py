@@ -0,0 +1,59 @@
+import itertools
+import subprocess
+
+import pytest
+
+from poetry_versions_plugin.commitgraph import CommitGraph
+from tests.conftest import run_git
+
+
+@pytest.fixture
+def repo(git_repo):
+    """A history with branches, a merge and an octopus merge."""
+    run_git(git_repo, "commit", "-q", "--allow-empty", "-m", "root")
+    for branch in ("a", "b", "c"):
+        run_git(git_repo, "checkout", "-q", "-b", branch, "main")
+        for i in range(3):
+            run_git(git_repo, "commit", "-q", "--allow-empty", "-m", f"{branch} {i}")
+    run_git(git_repo, "checkout", "-q", "main")
+    run_git(git_repo, "merge", "-q", "--no-ff", "-m", "merge a", "a")
+    run_git(git_repo, "merge", "-q", "--no-ff", "-m", "octopus", "b", "c")
+    return git_repo
+
+
+def commits(repo):
+    return run_git(repo, "rev-list", "--all").split()
+
+
+def test_is_ancestor_matches_git(repo):
+    run_git(repo, "commit-graph", "write", "--reachable")
+
+    with CommitGraph.open(str(repo / ".git" / "objects")) as graph:
+        assert graph.count == len(commits(repo))
+        for ancestor, descendant in itertools.product(commits(repo), repeat=2):
+            expected = subprocess.run(["git", "merge-base", "--is-ancestor", ancestor, descendant],
+                                      cwd=repo).returncode == 0
+            assert graph.is_ancestor(ancestor, descendant) == expected
+
+
+def test_split_commit_graph_chain(repo):
+    run_git(repo, "commit-graph", "write", "--reachable", "--split")
+    run_git(repo, "commit", "-q", "--allow-empty", "-m", "after")
+    run_git(repo, "commit-graph", "write", "--reachable", "--split=no-merge")
+    assert (repo / ".git" / "objects" / "info" / "commit-graphs" / "commit-graph-chain").exists()
+
+    root = run_git(repo, "rev-list", "--max-parents=0", "HEAD")
+    with CommitGraph.open(str(repo / ".git" / "objects")) as graph:
+        assert len(graph.files) == 2
+        assert graph.is_ancestor(root, run_git(repo, "rev-parse", "HEAD"))
+        assert not graph.is_ancestor(run_git(repo, "rev-parse", "HEAD"), root)
+
+
+def test_commits_missing_from_the_graph(repo):
+    assert CommitGraph.open(str(repo / ".git" / "objects")) is None
+
+    run_git(repo, "commit-graph", "write", "--reachable")
+    run_git(repo, "commit", "-q", "--allow-empty", "-m", "not in the graph")
+
+    with CommitGraph.open(str(repo / ".git" / "objects")) as graph:
+        assert graph.is_ancestor(run_git(repo, "rev-parse", "HEAD~1"), run_git(repo, "rev-parse", "HEAD")) is None
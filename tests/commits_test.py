@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+import git
+import pytest
+
+from poetry_versions_plugin.commits import count_commits, checkpoint_path, load_checkpoint
+from tests.conftest import run_git
+
+
+@pytest.fixture
+def repo(git_repo):
+    """Create a small local repository with a few commits on the main branch."""
+    for i in range(5):
+        run_git(git_repo, "commit", "-q", "--allow-empty", "-m", f"commit {i}")
+    return git.Repo(git_repo)
+
+
+@pytest.mark.parametrize("backend", ["iter", "rev-list", "incremental"])
+def test_count_commits_backends(repo, backend):
+    """All backends return the same count as the GitPython history walk."""
+    assert count_commits(repo, "main", backend) == 5
+
+
+def test_count_commits_incremental_checkpoint(repo):
+    """The incremental backend persists a checkpoint and counts only new commits afterwards."""
+    assert count_commits(repo, "main") == 5
+    assert load_checkpoint(checkpoint_path(repo)) == (repo.head.commit.hexsha, 5)
+
+    run_git(repo.working_dir, "commit", "-q", "--allow-empty", "-m", "new commit")
+
+    assert count_commits(repo, "main") == 6
+    assert load_checkpoint(checkpoint_path(repo)) == (repo.head.commit.hexsha, 6)
+
+
+def test_count_commits_incremental_rewritten_history(repo):
+    """A checkpoint that is not an ancestor of the revision falls back to a full count."""
+    assert count_commits(repo, "main") == 5
+
+    run_git(repo.working_dir, "reset", "-q", "--hard", "HEAD~2")
+    run_git(repo.working_dir, "commit", "-q", "--allow-empty", "-m", "rewritten")
+
+    assert count_commits(repo, "main") == 4
+
+
+def test_count_commits_incremental_corrupt_checkpoint(repo):
+    """A corrupt checkpoint file is ignored and replaced."""
+    path = checkpoint_path(repo)
+    count_commits(repo, "main")
+    with open(path, 'w') as f:
+        f.write("not json")
+
+    assert count_commits(repo, "main") == 5
+
+
+def test_count_commits_unknown_backend(repo):
+    with pytest.raises(ValueError):
+        count_commits(repo, "main", "unknown")
+
+
+def test_count_commits_incremental_uses_the_commit_graph(repo):
+    """The checkpoint ancestry is checked in the commit-graph file, without running git merge-base."""
+    assert count_commits(repo, "main") == 5
+    run_git(repo.working_dir, "commit", "-q", "--allow-empty", "-m", "new commit")
+    run_git(repo.working_dir, "commit-graph", "write", "--reachable")
+
+    with patch.object(git.Repo, "is_ancestor") as is_ancestor:
+        assert count_commits(repo, "main") == 6
+
+    is_ancestor.assert_not_called()
+
+
+@pytest.fixture
+def shallow_clone(repo, tmp_path_factory):
+    """A clone of the last 3 of 10 commits of `repo`."""
+    for i in range(5):
+        run_git(repo.working_dir, "commit", "-q", "--allow-empty", "-m", f"more {i}")
+    path = tmp_path_factory.mktemp("clone")
+    run_git(path, "clone", "-q", "--depth", "3", f"file://{repo.working_dir}", ".")
+    return git.Repo(path)
+
+
+def test_count_commits_incremental_unshallow(shallow_clone):
+    """The checkpoint of a shallow clone is not reused once the clone is unshallowed."""
+    assert count_commits(shallow_clone, "HEAD") == 3
+
+    run_git(shallow_clone.working_dir, "fetch", "-q", "--unshallow")
+
+    assert count_commits(shallow_clone, "HEAD") == count_commits(shallow_clone, "HEAD", "iter") == 10
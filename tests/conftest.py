@@ -0,0 +1,28 @@
+import subprocess
+
+import pytest
+
+
+def run_git(cwd, *args):
+    """Run a git command in `cwd` and return its output, stripped."""
+    return subprocess.check_output(["git", *args], cwd=cwd).strip().decode('utf-8')
+
+
+def init_repo(path, branch="main"):
+    """Initialize a repository at `path` with a committer identity and return `path`."""
+    run_git(path, "init", "-q", "-b", branch)
+    run_git(path, "config", "user.email", "test@example.com")
+    run_git(path, "config", "user.name", "test")
+    return path
+
+
+def commit_all(path, message="initial"):
+    """Stage every file of the working tree at `path` and commit them."""
+    run_git(path, "add", "-A")
+    run_git(path, "commit", "-q", "-m", message)
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """An empty repository on the main branch, in tmp_path."""
+    return init_repo(tmp_path)
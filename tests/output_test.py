@@ -0,0 +1,46 @@
+import os
+import stat
+
+from poetry_versions_plugin.output import replace_if_changed, temp_path, write_if_changed
+
+
+def test_write_if_changed_skips_identical_content(tmp_path):
+    path = tmp_path / "versions.py"
+
+    assert write_if_changed(path, "version = '1.0.0'\n")
+    os.utime(path, (0, 0))
+
+    assert not write_if_changed(path, "version = '1.0.0'\n")
+    assert os.stat(path).st_mtime == 0
+
+    assert write_if_changed(path, "version = '1.0.1'\n")
+    assert path.read_text() == "version = '1.0.1'\n"
+    assert os.listdir(tmp_path) == ["versions.py"]
+
+
+def test_write_if_changed_keeps_permissions(tmp_path):
+    path = tmp_path / "run.sh"
+    path.write_text("echo 1\n")
+    path.chmod(0o755)
+
+    assert write_if_changed(path, "echo 2\n")
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o755
+
+
+def test_replace_if_changed(tmp_path):
+    path = tmp_path / "README.md"
+    path.write_text("same\n")
+
+    tmp = temp_path(path)
+    with open(tmp, "w") as f:
+        f.write("same\n")
+    assert not replace_if_changed(tmp, path)
+
+    tmp = temp_path(path)
+    with open(tmp, "w") as f:
+        f.write("different\n")
+    assert replace_if_changed(tmp, path)
+
+    assert path.read_text() == "different\n"
+    assert os.listdir(tmp_path) == ["README.md"]
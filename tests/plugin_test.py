@@ -0,0 +1,170 @@
+import json
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+from cleo.testers.application_tester import ApplicationTester
+from poetry.console.application import Application
+
+from poetry_versions_plugin import status
+from poetry_versions_plugin.plugin import VersionsApplicationPlugin
+from tests.conftest import commit_all, run_git
+
+PYPROJECT = """[tool.poetry]
+name = "demo"
+version = "0.1.0"
+description = "A test package"
+authors = ["Author <author@example.com>"]
+packages = [{ include = "demo" }]
+
+[tool.versions.settings]
+commit = true
+commit_on_argument = ["major", "minor", "patch"]
+commit_on_branches = ["main"]
+filename = ["demo/versions.py"]
+"""
+
+
+@pytest.fixture
+def project(git_repo, monkeypatch):
+    """Create a committed Poetry project in a fresh git repository and chdir into it."""
+    (git_repo / "pyproject.toml").write_text(PYPROJECT)
+    (git_repo / "demo").mkdir()
+    (git_repo / "demo" / "__init__.py").write_text("")
+    commit_all(git_repo)
+    monkeypatch.chdir(git_repo)
+    return git_repo
+
+
+@pytest.fixture
+def tester():
+    """An application tester running Poetry with the plugin activated."""
+    application = Application()
+    application.auto_exits(False)
+    VersionsApplicationPlugin().activate(application)
+    return ApplicationTester(application)
+
+
+def test_version_query_does_not_open_repository(project, tester):
+    """Read-only version queries never inspect the git repository."""
+    with patch('poetry_versions_plugin.services.collect_git_info') as collect_git_info:
+        assert tester.execute("version") == 0
+        assert tester.execute("version -s") == 0
+
+    collect_git_info.assert_not_called()
+
+
+def test_version_bump(project, tester):
+    """A bump updates the configured files and commits them."""
+    assert tester.execute("version patch") == 0
+
+    pyproject = (project / "pyproject.toml").read_text()
+    assert 'version = "0.1.1"' in pyproject
+    assert "[tool.versions]" in pyproject
+    assert "version = '0.1.1'" in (project / "demo" / "versions.py").read_text()
+    assert run_git(project, "log", "-1", "--format=%s") == "Bump version: 0.1.0 → 0.1.1"
+    assert run_git(project, "status", "--porcelain") == ""
+
+
+def test_version_bump_with_env_provider(project, tester, monkeypatch):
+    """With the env provider, a bump without commit takes the git information from the environment only."""
+    (project / "pyproject.toml").write_text(
+        PYPROJECT.replace("commit = true", 'commit = false\ngit_info_provider = "env"'))
+    monkeypatch.setenv("POETRY_VERSIONS_BRANCH", "ci")
+    monkeypatch.setenv("POETRY_VERSIONS_COMMIT", "0123456789")
+    monkeypatch.setenv("POETRY_VERSIONS_COMMIT_COUNT", "1234")
+
+    with patch('poetry_versions_plugin.services.collect_git_info') as collect_git_info:
+        assert tester.execute("version patch") == 0
+
+    collect_git_info.assert_not_called()
+    versions = (project / "demo" / "versions.py").read_text()
+    assert "branch = 'ci'" in versions
+    assert "commit_count = 1234" in versions
+
+
+def test_version_bump_trace(project, tester, monkeypatch):
+    """The phases of a bump are exported as a Chrome trace and summarized at -vvv."""
+    monkeypatch.setenv("POETRY_VERSIONS_TRACE", "trace.json")
+
+    assert tester.execute("version patch -vvv") == 0
+
+    names = {event["name"] for event in json.loads((project / "trace.json").read_text())["traceEvents"]}
+    assert {"settings load", "git probe", "stage file", "update pyproject", "commit"} <= names
+    assert "git probe" in tester.io.fetch_output()
+
+
+@pytest.mark.parametrize("command, settings, untracked", [
+    ("version patch", None, True),
+    ("version 0.2.0", None, True),
+    ("version prerelease", None, False),
+    ("version patch --dry-run", None, False),
+    ("version patch", ("commit = true", "commit = false"), False),
+    ("version patch", ("commit = true", 'commit = true\ncommit_mode = "paths"'), False),
+    ("version patch", ('commit_on_branches = ["main"]', 'commit_on_branches = ["release"]'), False),
+])
+def test_version_bump_scans_untracked_files_only_for_a_commit(project, tester, command, settings, untracked):
+    """Untracked files are only scanned when the bump can commit them, with a commit in `all` mode."""
+    if settings:
+        (project / "pyproject.toml").write_text(PYPROJECT.replace(*settings))
+        commit_all(project, "settings")
+
+    with patch('poetry_versions_plugin.status.status_command', wraps=status.status_command) as status_command:
+        assert tester.execute(command) == 0
+
+    assert status_command.call_args_list[0].args[1] is untracked
+
+
+def test_invalid_settings_abort_the_bump(project, tester):
+    """Invalid settings are reported before the version command rewrites pyproject.toml."""
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(PYPROJECT.replace('commit_on_branches = ["main"]', 'commit_on_branches = ["main("]'))
+
+    assert tester.execute("version patch") != 0
+
+    assert "commit_on_branches" in tester.io.fetch_error()
+    assert 'version = "0.1.0"' in pyproject.read_text()
+
+
+@pytest.mark.parametrize("provider, error", [
+    ('git_info_provider = "env"', "Environment variables not set"),
+    ('git_info_provider = "file"\ngit_info_file = "missing.json"', "missing.json"),
+])
+def test_failed_git_probe_aborts_the_bump(project, tester, monkeypatch, provider, error):
+    """A failing git probe is reported as is, and the after hook does not touch the command that did not run."""
+    for name in ("BRANCH", "COMMIT", "COMMIT_COUNT", "IS_DIRTY"):
+        monkeypatch.delenv(f"POETRY_VERSIONS_{name}", raising=False)
+    pyproject = project / "pyproject.toml"
+    pyproject.write_text(PYPROJECT.replace("commit = true", f"commit = true\n{provider}"))
+
+    assert tester.execute("version patch") != 0
+
+    output = tester.io.fetch_error()
+    assert error in output
+    assert "NoneType" not in output
+    assert 'version = "0.1.0"' in pyproject.read_text()
+    assert not (project / "demo" / "versions.py").exists()
+
+
+def test_git_probe_timeout_aborts_the_bump(project, tester):
+    """A probe exceeding probe_timeout is reported as is."""
+    with patch('poetry_versions_plugin.services.collect_git_info',
+               side_effect=TimeoutError('The git history walk did not finish in time')):
+        assert tester.execute("version patch") != 0
+
+    output = tester.io.fetch_error()
+    assert "did not finish in time" in output
+    assert "NoneType" not in output
+
+
+def test_plugin_import_is_lightweight():
+    """Importing the plugin entry points does not load GitPython, the services or the version command."""
+    code = (
+        "import sys; import poetry_versions_plugin.plugin; "
+        "print(' '.join(m for m in ('git', 'poetry_versions_plugin.services', 'poetry.console.commands.version') "
+        "if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code]).strip().decode('utf-8')
+
+    assert output == ""
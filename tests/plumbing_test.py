@@ -0,0 +1,71 @@
+import os
+
+import git
+import pytest
+
+from poetry_versions_plugin.plumbing import commit_paths
+from tests.conftest import commit_all, run_git
+
+
+@pytest.fixture
+def repo(git_repo):
+    """Create a repository with nested directories."""
+    for path in ("pyproject.toml", "pkg/__init__.py", "pkg/sub/module.py", "pkg-extra/data.txt", "z.txt"):
+        os.makedirs(git_repo / os.path.dirname(path), exist_ok=True)
+        (git_repo / path).write_text(f"{path}\n")
+    commit_all(git_repo)
+    return git.Repo(git_repo)
+
+
+def test_commit_paths(repo):
+    """Only the given paths are committed, other changes stay in the working tree."""
+    root = repo.working_tree_dir
+    with open(os.path.join(root, "pyproject.toml"), "a") as f:
+        f.write("bumped\n")
+    os.makedirs(os.path.join(root, "pkg", "generated"))
+    with open(os.path.join(root, "pkg", "generated", "versions.py"), "w") as f:
+        f.write("version = '1.0.1'\n")
+    with open(os.path.join(root, "z.txt"), "a") as f:
+        f.write("unrelated\n")
+    with open(os.path.join(root, "untracked.txt"), "w") as f:
+        f.write("untracked\n")
+
+    commit_paths(repo, ["pyproject.toml", "pkg/generated/versions.py"], "Bump version")
+
+    assert run_git(root, "log", "-1", "--format=%s") == "Bump version"
+    assert run_git(root, "show", "--name-only", "--format=", "HEAD").splitlines() == [
+        "pkg/generated/versions.py", "pyproject.toml"
+    ]
+    assert run_git(root, "status", "--porcelain").splitlines() == ["M z.txt", "?? untracked.txt"]
+    # The trees are valid and sorted the way git expects
+    run_git(root, "fsck", "--strict", "--no-dangling")
+
+
+def test_commit_paths_executable(repo):
+    root = repo.working_tree_dir
+    path = os.path.join(root, "pkg", "sub", "module.py")
+    with open(path, "a") as f:
+        f.write("changed\n")
+    os.chmod(path, 0o755)
+
+    commit_paths(repo, ["pkg/sub/module.py"], "Make executable")
+
+    assert run_git(root, "ls-tree", "HEAD", "pkg/sub/module.py").startswith("100755 blob")
+    assert run_git(root, "status", "--porcelain") == ""
+
+
+def test_commit_paths_applies_gitattributes(repo):
+    """The blobs go through the same filters as `git add`, so the committed files are not left modified."""
+    root = repo.working_tree_dir
+    with open(os.path.join(root, ".gitattributes"), "w") as f:
+        f.write("*.md text eol=crlf\n")
+    with open(os.path.join(root, "R.md"), "wb") as f:
+        f.write(b"readme\r\n")
+    commit_all(root)
+
+    with open(os.path.join(root, "R.md"), "wb") as f:
+        f.write(b"readme\r\nversion 1.0.1\r\n")
+    commit_paths(repo, ["R.md", "pkg/sub/module.py"], "Bump version")
+
+    assert run_git(root, "cat-file", "-p", "HEAD:R.md") == "readme\nversion 1.0.1"
+    assert run_git(root, "status", "--porcelain") == ""
@@ -0,0 +1,68 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from poetry_versions_plugin.providers import LazyGitInfo, env_git_info, file_git_info
+
+
+def test_lazy_git_info_materializes_once():
+    """The repository is inspected on first access only."""
+    with patch('poetry_versions_plugin.services.collect_git_info') as collect_git_info:
+        dirty_state = object()
+        collect_git_info.return_value = ({'branch': 'main'}, dirty_state)
+        provider = LazyGitInfo(version='1.0.0', commit_counter='rev-list', timeout=5)
+
+        assert not provider.loaded
+        collect_git_info.assert_not_called()
+
+        assert provider.get() == {'branch': 'main'}
+        assert provider.dirty_state is dirty_state
+        assert provider.get() == {'branch': 'main'}
+        assert provider.loaded
+
+    collect_git_info.assert_called_once_with(version='1.0.0', commit_counter='rev-list', paths=None, ignore=None,
+                                             base_dir=None, cache=True, timeout=5, tracer=provider.tracer,
+                                             untracked_files=True)
+
+
+def test_env_git_info_reads_the_mapped_variables():
+    environ = {'CI_BRANCH': 'main', 'CI_SHA': '0123456789abcdef', 'CI_BUILD': '42', 'POETRY_VERSIONS_IS_DIRTY': 'true'}
+
+    info = env_git_info({'branch': 'CI_BRANCH', 'commit': 'CI_SHA', 'commit_count': 'CI_BUILD'}, '1.0.0', environ)
+
+    assert {key: value for key, value in info.items() if key != 'datetime'} == {
+        'branch': 'main', 'commit': '0123456', 'commit_count': 42, 'is_dirty': True, 'version': '1.0.0',
+    }
+
+
+def test_env_git_info_reports_missing_variables():
+    with pytest.raises(ValueError, match='POETRY_VERSIONS_COMMIT, POETRY_VERSIONS_COMMIT_COUNT'):
+        env_git_info(environ={'POETRY_VERSIONS_BRANCH': 'main'})
+
+
+def test_file_git_info(tmp_path):
+    path = tmp_path / 'git-info.json'
+    path.write_text(json.dumps({'branch': 'main', 'commit': 'abcdef0', 'commit_count': 7}))
+
+    info = file_git_info(path)
+
+    assert (info['branch'], info['commit'], info['commit_count'], info['is_dirty']) == ('main', 'abcdef0', 7, False)
+
+    path.write_text(json.dumps({'branch': 'main', 'commit_count': 'many'}))
+    with pytest.raises(ValueError, match='missing commit'):
+        file_git_info(path)
+
+
+def test_lazy_git_info_env_provider_does_not_open_the_repository(monkeypatch):
+    monkeypatch.setenv('POETRY_VERSIONS_BRANCH', 'main')
+    monkeypatch.setenv('POETRY_VERSIONS_COMMIT', 'abcdef0')
+    monkeypatch.setenv('POETRY_VERSIONS_COMMIT_COUNT', '3')
+
+    with patch('poetry_versions_plugin.services.collect_git_info') as collect_git_info:
+        provider = LazyGitInfo(version='1.0.0', provider='env')
+
+        assert provider.get()['commit_count'] == 3
+        assert provider.dirty_state is None
+
+    collect_git_info.assert_not_called()
@@ -0,0 +1,84 @@
+import subprocess
+
+import pytest
+
+from poetry_versions_plugin.refs import PackedRefs, find_git_dirs, read_head, resolve_ref
+from tests.conftest import init_repo, run_git
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A repository with two commits on main."""
+    path = tmp_path / "repo"
+    path.mkdir()
+    init_repo(path)
+    run_git(path, "commit", "-q", "--allow-empty", "-m", "first")
+    run_git(path, "commit", "-q", "--allow-empty", "-m", "second")
+    return path
+
+
+def test_read_head_loose_and_packed(repo):
+    sha = run_git(repo, "rev-parse", "HEAD")
+    git_dir = str(repo / ".git")
+
+    assert read_head(git_dir) == ("main", sha)
+
+    run_git(repo, "pack-refs", "--all")
+    assert not (repo / ".git" / "refs" / "heads" / "main").exists()
+    assert read_head(git_dir) == ("main", sha)
+
+
+def test_read_head_detached_and_symbolic(repo):
+    first = run_git(repo, "rev-parse", "HEAD~1")
+    git_dir = str(repo / ".git")
+
+    run_git(repo, "symbolic-ref", "refs/heads/alias", "refs/heads/main")
+    assert resolve_ref(git_dir, git_dir, "refs/heads/alias") == run_git(repo, "rev-parse", "main")
+
+    run_git(repo, "checkout", "-q", "--detach", "HEAD~1")
+    assert read_head(git_dir) == (None, first)
+
+
+def test_read_head_unborn_branch(tmp_path):
+    init_repo(tmp_path)
+
+    assert read_head(str(tmp_path / ".git")) is None
+
+
+def test_worktree_git_dirs(repo, tmp_path):
+    worktree = tmp_path / "worktree"
+    run_git(repo, "worktree", "add", "-q", "-b", "feature", str(worktree), "HEAD~1")
+    (worktree / "sub").mkdir()
+
+    git_dir, common = find_git_dirs(worktree / "sub")
+
+    assert common == str(repo / ".git")
+    assert git_dir == str(repo / ".git" / "worktrees" / "worktree")
+    assert read_head(git_dir) == ("feature", run_git(repo, "rev-parse", "HEAD~1"))
+    assert find_git_dirs(tmp_path) is None
+
+
+def test_packed_refs_bisect_matches_every_ref(repo):
+    commands = "".join(f"create refs/tags/v{i} HEAD\ncreate refs/heads/b{i} HEAD~1\n" for i in range(500))
+    subprocess.run(["git", "update-ref", "--stdin"], cwd=repo, input=commands.encode(), check=True)
+    run_git(repo, "tag", "-a", "-m", "annotated", "annotated")
+    run_git(repo, "pack-refs", "--all")
+
+    packed = (repo / ".git" / "packed-refs").read_text().splitlines()
+    assert "sorted" in packed[0]
+    assert any(line.startswith("^") for line in packed)
+
+    refs = PackedRefs(str(repo / ".git" / "packed-refs"))
+    entries = [line.split(" ") for line in packed[1:] if not line.startswith("^")]
+    assert all(refs.lookup(name) == sha for sha, name in entries)
+    for name in ("refs/heads/a", "refs/heads/zz", "refs/tags/v5000", "refs/zzz"):
+        assert refs.lookup(name) is None
+
+
+def test_packed_refs_unsorted(tmp_path):
+    path = tmp_path / "packed-refs"
+    path.write_text(f"{'b' * 40} refs/heads/zeta\n{'a' * 40} refs/heads/alpha\n^{'c' * 40}\n")
+
+    assert PackedRefs(str(path)).lookup("refs/heads/alpha") == "a" * 40
+    assert PackedRefs(str(path)).lookup("refs/heads/beta") is None
+    assert PackedRefs(str(tmp_path / "missing")).lookup("refs/heads/alpha") is None
@@ -1,8 +1,14 @@
 import subprocess
+from pathlib import Path
+from unittest.mock import patch
 
 import pexpect
 import pytest
-from scripts.release import run_command
+from scripts.release import (
+    ReleaseState, artifacts_match, check_develop_branch, find_artifacts, hash_file, open_repository, preflight,
+    run_command, run_pipeline, steps,
+)
+from tests.conftest import init_repo, run_git
 
 
 def test_run_command_basic():
@@ -148,3 +154,139 @@ def test_run_command_concurrent_execution():
     output2 = run_command(command2)
     assert "First" in output1
     assert "Second" in output2
+
+
+@pytest.fixture
+def release_repo(tmp_path):
+    """Create a repository with a develop branch and a feature branch ahead of it."""
+    init_repo(tmp_path, "master")
+    run_git(tmp_path, "commit", "-q", "--allow-empty", "-m", "initial")
+    run_git(tmp_path, "checkout", "-q", "-b", "develop")
+    run_git(tmp_path, "commit", "-q", "--allow-empty", "-m", "develop")
+    run_git(tmp_path, "checkout", "-q", "-b", "feature")
+    run_git(tmp_path, "commit", "-q", "--allow-empty", "-m", "feature")
+    return open_repository(tmp_path)
+
+
+@pytest.mark.parametrize("branch", ["develop", "master"])
+def test_check_develop_branch(release_repo, branch, capsys):
+    """A commit reachable from the develop branch passes, whatever the checked out branch is."""
+    run_git(release_repo.working_dir, "checkout", "-q", branch)
+    check_develop_branch(release_repo)
+    assert "On the develop branch." in capsys.readouterr().out
+
+
+def test_check_develop_branch_not_on_develop(release_repo, capsys):
+    """A commit that is not on the develop branch stops the release."""
+    with pytest.raises(SystemExit):
+        check_develop_branch(release_repo)
+    assert "not on the develop branch" in capsys.readouterr().out
+
+
+def test_check_develop_branch_missing(release_repo, capsys):
+    """A repository without a develop branch stops the release."""
+    with pytest.raises(SystemExit):
+        check_develop_branch(release_repo, branch="missing")
+    assert "does not exist" in capsys.readouterr().out
+
+
+def test_preflight(release_repo):
+    """The preflight checks return the uncommitted changes and the next version."""
+    run_git(release_repo.working_dir, "checkout", "-q", "develop")
+    (Path(release_repo.working_dir) / "new.txt").write_text("new")
+
+    with patch("scripts.release.get_next_version", return_value="1.1.0") as get_next_version:
+        status, next_version = preflight(release_repo, "minor")
+
+    assert status == "?? new.txt"
+    assert next_version == "1.1.0"
+    get_next_version.assert_called_once_with("minor")
+
+
+def test_preflight_not_on_develop(release_repo):
+    """A failed develop branch check stops the release."""
+    with patch("scripts.release.get_next_version", return_value="1.1.0"):
+        with pytest.raises(SystemExit):
+            preflight(release_repo, "minor")
+
+
+def test_release_state_roundtrip(tmp_path):
+    """The completed steps and their outputs are saved after every step."""
+    path = tmp_path / "state" / "release-state.json"
+    state = ReleaseState(str(path), "minor")
+    state.complete("preflight", {"version": "1.1.0"})
+
+    loaded = ReleaseState.load(str(path), "minor")
+    assert loaded.completed == ["preflight"]
+    assert loaded.outputs == {"version": "1.1.0"}
+
+    loaded.clear()
+    assert not path.exists()
+    assert ReleaseState.load(str(path), "minor").completed == []
+
+
+def test_release_state_other_version_type(tmp_path):
+    """An unfinished release cannot be resumed with another version bump."""
+    path = str(tmp_path / "release-state.json")
+    ReleaseState(path, "minor").complete("preflight", {"version": "1.1.0"})
+
+    with pytest.raises(ValueError, match="unfinished minor release of version 1.1.0"):
+        ReleaseState.load(path, "major")
+
+
+def test_release_state_reset(tmp_path):
+    """Resetting a step also resets the steps completed after it."""
+    state = ReleaseState(str(tmp_path / "release-state.json"), "minor", ["preflight", "build", "publish"])
+    state.reset("build")
+    assert state.completed == ["preflight"]
+
+
+def test_run_pipeline_resumes(tmp_path, capsys):
+    """A failed pipeline resumes from its first incomplete step, with the outputs of the completed ones."""
+    path = str(tmp_path / "release-state.json")
+    calls = []
+
+    def action(name, result=None, fail=False):
+        def run(outputs):
+            calls.append((name, dict(outputs)))
+            if fail:
+                raise RuntimeError("upload interrupted")
+            return result
+        return run
+
+    failing = [
+        ("preflight", "Preflight...", action("preflight", {"version": "1.1.0"})),
+        ("build", "Building {version}...", action("build", {"artifacts": {"a.whl": "0"}})),
+        ("publish", "Publishing {version}...", action("publish", fail=True)),
+    ]
+    with pytest.raises(RuntimeError):
+        run_pipeline(ReleaseState(path, "minor"), failing, steps(3))
+
+    calls.clear()
+    state = ReleaseState.load(path, "minor")
+    assert state.completed == ["preflight", "build"]
+
+    resumed = failing[:2] + [("publish", "Publishing {version}...", action("publish"))]
+    run_pipeline(state, resumed, steps(3))
+
+    assert calls == [("publish", {"version": "1.1.0", "artifacts": {"a.whl": "0"}})]
+    assert state.completed == ["preflight", "build", "publish"]
+    assert "Publishing 1.1.0..." in capsys.readouterr().out
+
+
+def test_artifacts(tmp_path):
+    """The built artifacts of a version are found and reused only while they are unchanged."""
+    for name in ["demo-1.1.0-py3-none-any.whl", "demo-1.1.0.tar.gz", "demo-1.0.0.tar.gz", "demo-1.1.0.txt"]:
+        (tmp_path / name).write_text(name)
+
+    names = find_artifacts("1.1.0", tmp_path)
+    assert names == ["demo-1.1.0-py3-none-any.whl", "demo-1.1.0.tar.gz"]
+
+    artifacts = {name: hash_file(tmp_path / name) for name in names}
+    assert artifacts_match(artifacts, tmp_path)
+
+    (tmp_path / "demo-1.1.0.tar.gz").write_text("changed")
+    assert not artifacts_match(artifacts, tmp_path)
+    (tmp_path / "demo-1.1.0.tar.gz").unlink()
+    assert not artifacts_match(artifacts, tmp_path)
+    assert not artifacts_match({}, tmp_path)
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import pytest
+
+from poetry_versions_plugin.runtime import get_version, version_info
+from poetry_versions_plugin.services import py_file_content
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    version_info.cache_clear()
+    yield
+    version_info.cache_clear()
+
+
+@pytest.fixture
+def package(tmp_path, monkeypatch):
+    """An importable package with a generated versions module."""
+    (tmp_path / "demo_app").mkdir()
+    (tmp_path / "demo_app" / "__init__.py").write_text("")
+    (tmp_path / "demo_app" / "versions.py").write_text(py_file_content({
+        'branch': 'main', 'commit': 'abcdef0', 'commit_count': 42, 'is_dirty': False,
+        'datetime': '2024-01-01 00:00:00', 'version': '1.2.3',
+    }))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    for name in ("demo_app", "demo_app.versions"):
+        sys.modules.pop(name, None)
+
+
+def test_get_version_from_the_generated_module(package):
+    assert get_version("demo-app") == "1.2.3"
+
+    info = version_info("demo-app")
+    assert info["commit_count"] == 42
+    assert info["full_version"] == "1.2.3.main+42.abcdef0"
+    with pytest.raises(TypeError):
+        info["version"] = "2.0.0"
+
+
+def test_version_info_is_memoized(package):
+    assert get_version("demo-app") == get_version("demo-app")
+
+    assert version_info.cache_info().hits == 1
+
+
+def test_get_version_falls_back_to_the_metadata():
+    assert get_version("pytest") == version("pytest")
+    assert dict(version_info("pytest")) == {"version": version("pytest")}
+
+    with pytest.raises(PackageNotFoundError):
+        get_version("surely-not-an-installed-package")
+
+
+def test_runtime_import_is_lightweight(package):
+    """Looking up a version loads neither GitPython nor Poetry nor the plugin services."""
+    code = (
+        "import sys; from poetry_versions_plugin.runtime import get_version; "
+        "assert get_version('demo-app') == '1.2.3'; "
+        "print(' '.join(m for m in ('git', 'poetry', 'poetry_versions_plugin.services', 'importlib.metadata') "
+        "if m in sys.modules))"
+    )
+    root = Path(__file__).parents[1]
+    output = subprocess.check_output([sys.executable, "-c", code],
+                                     env={"PYTHONPATH": os.pathsep.join([str(package), str(root)])})
+
+    assert output.strip().decode("utf-8") == ""
@@ -1,17 +1,29 @@
+import os
 import subprocess
+import threading
+import time
 from datetime import datetime
 from unittest.mock import MagicMock, patch
 
 import pytest
+from cleo.io.buffered_io import BufferedIO
+from cleo.io.outputs.output import Verbosity
 
-from poetry_versions_plugin.services import update_readme, update_py_file, get_git_info
+from poetry_versions_plugin.services import collect_git_info, update_readme, update_py_file, get_git_info
+from poetry_versions_plugin.status import DirtyState
+from tests.conftest import commit_all
 
 
 @pytest.fixture
-def mock_repo():
+def mock_repo(tmp_path):
     """Mock the git.Repo object."""
     with patch('git.Repo') as MockRepo:
         mock_repo = MagicMock()
+        mock_repo.common_dir = str(tmp_path)
+        mock_repo.git_dir = str(tmp_path)
+        mock_repo.commit.return_value.hexsha = 'abcdefg1234567'
+        mock_repo.head.is_detached = False
+        mock_repo.git.execute.return_value = ''  # Clean working tree
         MockRepo.return_value = mock_repo
         yield mock_repo
 
@@ -21,8 +33,8 @@ def test_get_git_info(mock_repo):
     # Setup mock values
     mock_repo.active_branch.name = 'main'
     mock_repo.head.commit.hexsha = 'abcdefg1234567'
-    mock_repo.iter_commits.return_value = range(42)  # Simulate 42 commits
-    mock_repo.is_dirty.return_value = False
+    mock_repo.git.rev_list.return_value = '42'  # Simulate 42 commits
+    mock_repo.git.execute.return_value = ''
 
     # Call the function to test
     info = get_git_info()
@@ -35,18 +47,41 @@ def test_get_git_info(mock_repo):
     assert 'datetime' in info  # Check if the datetime key exists
 
 
+def test_get_git_info_iter_commit_counter(mock_repo):
+    """Test get_git_info function with the legacy GitPython commit counter."""
+    mock_repo.iter_commits.return_value = range(42)
+
+    info = get_git_info(commit_counter='iter')
+
+    assert info['commit_count'] == 42
+
+
 def test_get_git_info_dirty_repo(mock_repo):
     """Test get_git_info function with a dirty repo."""
-    mock_repo.is_dirty.return_value = True
+    mock_repo.git.execute.return_value = ' M pyproject.toml\0'
 
     info = get_git_info()
 
     assert info['is_dirty']
 
 
+def test_get_git_info_detached_head(mock_repo):
+    """A detached HEAD is reported as the `HEAD` branch and its history is counted from the HEAD commit."""
+    mock_repo.head.is_detached = True
+    mock_repo.head.commit.hexsha = 'abcdefg1234567'
+    mock_repo.git.rev_list.return_value = '42'
+
+    info = get_git_info(commit_counter='rev-list')
+
+    assert info['branch'] == 'HEAD'
+    assert info['commit'] == 'abcdefg'
+    assert info['commit_count'] == 42
+    mock_repo.git.rev_list.assert_called_once_with('--count', 'abcdefg1234567')
+
+
 def test_get_git_info_no_commits(mock_repo):
     """Test get_git_info function with no commits."""
-    mock_repo.iter_commits.return_value = iter([])  # No commits
+    mock_repo.git.rev_list.return_value = '0'  # No commits
 
     info = get_git_info()
 
@@ -87,6 +122,79 @@ def test_get_git_info_on_current_repo():
     assert info['datetime'][:16] == current_datetime[:16]  # Compare up to minutes
 
 
+def test_collect_git_info_matches_get_git_info():
+    """The concurrent collector returns the same information as get_git_info."""
+    info, dirty_state = collect_git_info(version='1.0.0', cache=False, timeout=60)
+    expected = get_git_info(version='1.0.0', dirty_state=dirty_state, cache=False)
+
+    assert info.keys() == expected.keys()
+    assert {key: value for key, value in info.items() if key != 'datetime'} == \
+        {key: value for key, value in expected.items() if key != 'datetime'}
+
+
+def test_collect_git_info_untracked_files(git_repo, monkeypatch):
+    """Untracked files are only scanned when asked to, possibly depending on the current branch."""
+    (git_repo / "README.md").write_text("readme\n")
+    commit_all(git_repo)
+    (git_repo / "new.txt").write_text("new\n")
+    monkeypatch.chdir(git_repo)
+    branches = []
+
+    def on_main(branch):
+        branches.append(branch)
+        return branch == 'main'
+
+    assert collect_git_info(cache=False, untracked_files=on_main)[1].untracked == ['new.txt']
+    assert branches == ['main']
+    assert collect_git_info(cache=False, untracked_files=lambda branch: False)[1].untracked == []
+    assert collect_git_info(cache=False, untracked_files=False)[1].untracked == []
+
+
+def test_collect_git_info_runs_the_probes_concurrently():
+    """Each probe waits for the other one to start: run one after the other, they would break the barrier."""
+    barrier = threading.Barrier(2, timeout=10)
+
+    def concurrent(result):
+        def probe(*args, **kwargs):
+            barrier.wait()
+            return result
+        return probe
+
+    history = {'branch': 'main', 'commit': 'abcdefg', 'commit_count': 1}
+    with patch('poetry_versions_plugin.services.get_history_info', concurrent(history)), \
+            patch('poetry_versions_plugin.services.get_dirty_state', concurrent(DirtyState([], [], False))):
+        info, _ = collect_git_info()
+
+    assert info['commit_count'] == 1
+
+
+def test_collect_git_info_timeout():
+    """A probe taking longer than the timeout raises a TimeoutError naming it."""
+    def slow_history(*args, **kwargs):
+        time.sleep(0.5)
+
+    with patch('poetry_versions_plugin.services.get_history_info', slow_history):
+        with pytest.raises(TimeoutError, match='history'):
+            collect_git_info(timeout=0.1)
+
+
+def test_collect_git_info_timeout_kills_git(git_repo, monkeypatch):
+    """The git command of a probe that timed out is killed instead of being left to run."""
+    (git_repo / "README.md").write_text("readme\n")
+    commit_all(git_repo)
+    monkeypatch.chdir(git_repo)
+
+    with patch('poetry_versions_plugin.status.status_command', return_value=['sleep', '30']):
+        start = time.monotonic()
+        with pytest.raises(TimeoutError, match='dirty scan'):
+            collect_git_info(cache=False, timeout=0.2)
+
+    # The call returns once the probes have stopped, long before the command would have
+    assert time.monotonic() - start < 20
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('git-probe')]
+    assert not (git_repo / ".git" / "index.lock").exists()
+
+
 # def test_git_repo_is_not_dirty():
 #     """Test to ensure the repository is clean (no uncommitted changes)."""
 #
@@ -154,6 +262,31 @@ Date: 2023-10-05 10:00:00
     assert readme_path.read_text() == expected_content
 
 
+def test_update_readme_dry_run(tmp_path, git_info, capsys):
+    """A dry run prints the rendered file and leaves it untouched."""
+    readme_path = tmp_path / "README.md"
+    readme_path.write_text("Branch: <!-- BRANCH -->\n")
+
+    update_readme(readme_path, git_info, dry_run=True)
+
+    assert capsys.readouterr().out == f"Would update {readme_path} with the following changes:\nBranch: main\n\n"
+    assert readme_path.read_text() == "Branch: <!-- BRANCH -->\n"
+
+
+def test_update_py_file_dry_run_with_io_write_line(tmp_path, git_info):
+    """The messages of a dry run can be written with cleo's IO.write_line directly."""
+    io = BufferedIO()
+    io.set_verbosity(Verbosity.VERBOSE)
+    py_path = tmp_path / "version_info.py"
+
+    assert update_py_file(py_path, git_info, io.write_line, dry_run=True)
+
+    output = io.fetch_output()
+    assert f"Would write to file: {py_path}" in output
+    assert "branch = 'main'" in output
+    assert not py_path.exists()
+
+
 def test_update_py_file(tmp_path, git_info):
     """Test if the update_py_file function correctly generates a Python file."""
     py_path = tmp_path / "version_info.py"
@@ -164,3 +297,14 @@ def test_update_py_file(tmp_path, git_info):
     assert 'commit' in py_path.read_text().strip()
     assert 'is_dirty' in py_path.read_text().strip()
     assert 'datetime' in py_path.read_text().strip()
+
+
+def test_update_py_file_unchanged(tmp_path, git_info):
+    """Regenerating a Python file with the same information does not rewrite it."""
+    py_path = tmp_path / "version_info.py"
+
+    assert update_py_file(py_path, git_info, lambda line: None)
+    os.utime(py_path, (0, 0))
+
+    assert not update_py_file(py_path, git_info, lambda line: None)
+    assert os.stat(py_path).st_mtime == 0
@@ -0,0 +1,98 @@
+import pytest
+
+from poetry_versions_plugin import commits
+from poetry_versions_plugin.providers import make_git_info
+from poetry_versions_plugin.settings import COMMIT_COUNTERS, DEFAULT_COMMIT_MESSAGE, GIT_INFO_KEYS, Settings
+
+
+def test_defaults_when_the_table_is_missing():
+    settings = Settings(None)
+
+    assert not settings.configured
+    assert settings.commit is False
+    assert settings.commit_message == DEFAULT_COMMIT_MESSAGE
+    assert settings.commit_mode == 'all'
+    assert settings.filename == []
+    assert settings.workers is None
+    assert settings.cache is True
+    assert not settings.match_branch('main')
+
+
+def test_settings_are_attributes():
+    settings = Settings({'commit': True, 'filename': ['README.md'], 'workers': 2, 'cache': '.cache/git.json'})
+
+    assert settings.configured
+    assert settings.commit is True
+    assert settings.filename == ['README.md']
+    assert settings.workers == 2
+    assert settings.cache == '.cache/git.json'
+    with pytest.raises(AttributeError):
+        settings.unknown = 1
+
+
+def test_match_branch_combines_the_patterns():
+    settings = Settings({'commit_on_branches': ['main$', r'release/\d+', '(?P<name>x)', '(?P<name>y)']})
+
+    assert settings.match_branch('main')
+    assert settings.match_branch('release/2')
+    assert settings.match_branch('y')
+    assert not settings.match_branch('feature/main')
+    assert not settings.match_branch(None)
+
+
+def test_match_branch_keeps_the_groups_of_each_pattern():
+    settings = Settings({'commit_on_branches': ['release/(.*)', r'(x)-\1', 'hotfix$']})
+
+    assert settings.match_branch('x-x')
+    assert not settings.match_branch('x-y')
+    assert settings.match_branch('hotfix')
+
+
+def test_match_branch_with_global_flags():
+    assert Settings({'commit_on_branches': ['hotfix$', '(?i)MAIN']}).match_branch('main')
+
+
+def test_invalid_settings_are_reported_together():
+    with pytest.raises(ValueError) as info:
+        Settings({'commit': 'yes', 'workers': 0, 'commit_mode': 'some', 'commit_on_branches': ['(']}, 'demo.toml')
+
+    message = str(info.value)
+    assert message.startswith('Invalid [tool.versions.settings] in demo.toml: ')
+    for key in ('commit must', 'workers', 'commit_mode', 'commit_on_branches'):
+        assert key in message
+
+
+@pytest.mark.parametrize("table, error", [
+    ({'fields': {'release': '{version}-{build}'}}, 'fields.release has an unknown placeholder {build}'),
+    ({'fields': {'release': '{}'}}, 'fields.release has an unknown placeholder {}'),
+    ({'fields': {'release': '{version'}}, 'fields.release is not a valid format string'),
+    ({'fields': {'release': '{commit_count:>{width}}'}}, 'fields.release has an unknown placeholder {width}'),
+    ({'commit_message': 'Release {version}'}, 'commit_message has an unknown placeholder {version}'),
+])
+def test_unknown_placeholders_are_rejected(table, error):
+    with pytest.raises(ValueError, match=error):
+        Settings(table)
+
+
+def test_known_placeholders_are_accepted():
+    settings = Settings({
+        'fields': {'full': '{version}+{commit}.{commit_count:05d} {{literal}}', 'branch': '{branch!r}'},
+        'commit_message': 'Release {new_version} (was {current_version})',
+    })
+
+    assert settings.fields['full'] == '{version}+{commit}.{commit_count:05d} {{literal}}'
+
+
+def test_git_info_keys_match_the_git_information():
+    assert set(GIT_INFO_KEYS) == set(make_git_info('main', 'abcdefg', 1))
+
+
+def test_file_provider_needs_a_file():
+    with pytest.raises(ValueError, match='git_info_file must be set'):
+        Settings({'git_info_provider': 'file'})
+
+    assert Settings({'git_info_provider': 'file', 'git_info_file': 'info.json'}).git_info_file == 'info.json'
+
+
+def test_commit_counters_match_the_backends():
+    assert set(COMMIT_COUNTERS) == set(commits.COMMIT_COUNTERS)
@@ -0,0 +1,118 @@
+import subprocess
+from pathlib import Path
+
+import git
+import pytest
+
+from poetry_versions_plugin.services import commit_local_changes
+from poetry_versions_plugin.status import build_pathspecs, parse_status, scan_dirty_state
+from tests.conftest import run_git
+
+
+@pytest.fixture
+def repo(git_repo):
+    """Create a local repository with one committed file."""
+    (git_repo / "tracked.txt").write_text("tracked\n")
+    run_git(git_repo, "add", "tracked.txt")
+    run_git(git_repo, "commit", "-q", "-m", "initial")
+    return git.Repo(git_repo)
+
+
+def test_parse_status():
+    output = ' M modified.txt\0A  added.txt\0R  new.txt\0old.txt\0?? untracked.txt\0'
+
+    state = parse_status(output)
+
+    assert state.modified == ['modified.txt', 'added.txt', 'new.txt']
+    assert state.untracked == ['untracked.txt']
+    assert state.is_dirty
+    assert state.has_changes
+
+
+def test_parse_status_clean():
+    state = parse_status('')
+
+    assert not state.is_dirty
+    assert not state.has_changes
+
+
+def test_scan_dirty_state_matches_gitpython(repo):
+    """The snapshot agrees with GitPython's is_dirty for clean, untracked and modified trees."""
+    state = scan_dirty_state(repo)
+    assert state.is_dirty == repo.is_dirty()
+    assert state.has_changes == repo.is_dirty(untracked_files=True)
+
+    open(f"{repo.working_tree_dir}/untracked.txt", "w").close()
+    state = scan_dirty_state(repo)
+    assert not state.is_dirty
+    assert state.has_changes == repo.is_dirty(untracked_files=True)
+    assert state.untracked == ['untracked.txt']
+
+    with open(f"{repo.working_tree_dir}/tracked.txt", "a") as f:
+        f.write("changed\n")
+    state = scan_dirty_state(repo, untracked_files=False)
+    assert state.is_dirty == repo.is_dirty()
+    assert state.modified == ['tracked.txt']
+    assert state.untracked == []
+
+
+def test_build_pathspecs(repo):
+    root = repo.working_tree_dir
+
+    assert build_pathspecs(repo) == []
+    assert build_pathspecs(repo, ['src'], ['**/*.log'], base_dir=root) == ['src', ':(exclude,glob)**/*.log']
+    assert build_pathspecs(repo, ['src'], base_dir=f"{root}/pkg") == ['pkg/src']
+    assert build_pathspecs(repo, ignore=['build/**'], base_dir=f"{root}/pkg") == [
+        'pkg/', ':(exclude,glob)pkg/build/**'
+    ]
+
+
+def test_scan_dirty_state_pathspecs(repo):
+    """Changes outside the pathspecs or matching an exclusion are not reported."""
+    root = repo.working_tree_dir
+    with open(f"{root}/tracked.txt", "a") as f:
+        f.write("changed\n")
+    subprocess.check_call(["mkdir", "-p", f"{root}/build", f"{root}/pkg"])
+    open(f"{root}/build/output.bin", "w").close()
+    open(f"{root}/pkg/debug.log", "w").close()
+
+    state = scan_dirty_state(repo, pathspecs=build_pathspecs(repo, ['pkg'], ['**/*.log']))
+    assert not state.has_changes
+    assert state.pathspecs == ['pkg', ':(exclude,glob)**/*.log']
+
+    open(f"{root}/pkg/new.py", "w").close()
+
+    state = scan_dirty_state(repo, pathspecs=build_pathspecs(repo, ['pkg'], ['**/*.log']))
+    assert not state.is_dirty
+    assert state.untracked == ['pkg/']
+
+
+def test_scan_dirty_state_without_optional_locks(repo):
+    """Without optional locks, the scan does not write the refreshed index back."""
+    index = Path(repo.git_dir) / "index"
+    (Path(repo.working_tree_dir) / "tracked.txt").write_text("changed\n")
+    before = index.read_bytes()
+
+    state = scan_dirty_state(repo, untracked_files=False, optional_locks=False)
+
+    assert state.modified == ["tracked.txt"]
+    assert index.read_bytes() == before
+
+
+def test_commit_local_changes_stages_ignored_targets(repo):
+    """A target matching a `dirty_ignore` glob is still committed, other ignored files are not."""
+    root = Path(repo.working_tree_dir)
+    (root / "demo").mkdir()
+    (root / "demo" / "versions.py").write_text("version = '1.0.0'\n")
+    (root / "debug.py").write_text("")
+    (root / "tracked.txt").write_text("changed\n")
+
+    pathspecs = build_pathspecs(repo, ignore=["**/versions.py", "debug.py"])
+    state = scan_dirty_state(repo, pathspecs=pathspecs)
+    commit_local_changes(repo.working_tree_dir, "Bump version", dirty_state=state,
+                         paths=[str(root / "demo" / "versions.py")])
+
+    assert run_git(root, "show", "--name-only", "--format=", "HEAD").splitlines() == [
+        "demo/versions.py", "tracked.txt",
+    ]
+    assert run_git(root, "status", "--porcelain") == "?? debug.py"
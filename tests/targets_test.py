@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from poetry_versions_plugin.targets import update_targets
+
+
+@pytest.fixture
+def git_info():
+    """Provide a sample Git information dictionary for testing."""
+    return {
+        "branch": "main",
+        "commit": "abcdefg",
+        "commit_count": 42,
+        "is_dirty": False,
+        "datetime": "2023-10-05 10:00:00",
+        "version": "1.2.3",
+    }
+
+
+def test_update_targets_many_files(tmp_path, git_info):
+    """Targets are updated concurrently and the results keep the configuration order."""
+    files = []
+    for i in range(50):
+        readme = tmp_path / f"pkg{i}" / "README.md"
+        readme.parent.mkdir()
+        readme.write_text("version <!-- VERSION -->\n")
+        files += [str(tmp_path / f"pkg{i}" / "versions.py"), str(readme)]
+
+    results = update_targets(files, git_info, lambda *args, **kwargs: None, workers=8)
+
+    assert [result.path for result in results] == files
+    assert all(result.changed and result.error is None for result in results)
+    assert (tmp_path / "pkg7" / "README.md").read_text() == "version 1.2.3\n"
+    assert "version = '1.2.3'" in (tmp_path / "pkg7" / "versions.py").read_text()
+
+    results = update_targets(files, git_info, lambda *args, **kwargs: None, workers=8)
+    assert not any(result.changed for result in results)
+
+
+def test_update_targets_failure_applies_nothing(tmp_path, git_info):
+    """A failing target leaves every other target untouched."""
+    readme = tmp_path / "README.md"
+    readme.write_text("version <!-- VERSION -->\n")
+    files = [str(tmp_path / "versions.py"), str(tmp_path / "missing.md"), str(readme)]
+
+    results = update_targets(files, git_info, lambda *args, **kwargs: None, workers=4)
+
+    assert [result.error is not None for result in results] == [False, True, False]
+    assert isinstance(results[1].error, FileNotFoundError)
+    assert readme.read_text() == "version <!-- VERSION -->\n"
+    assert sorted(os.listdir(tmp_path)) == ["README.md"]
+
+
+def test_update_targets_dry_run(tmp_path, git_info):
+    readme = tmp_path / "README.md"
+    readme.write_text("version <!-- VERSION -->\n")
+    files = [str(tmp_path / "versions.py"), str(readme)]
+
+    results = update_targets(files, git_info, lambda *args, **kwargs: None, dry_run=True)
+
+    assert [result.changed for result in results] == [True, True]
+    assert sorted(os.listdir(tmp_path)) == ["README.md"]
+    assert readme.read_text() == "version <!-- VERSION -->\n"
+
+
+def test_update_targets_version_structures(tmp_path, git_info):
+    """With the version structures, Python targets get precomputed fields and a companion stub."""
+    path = str(tmp_path / "pkg" / "versions.py")
+
+    results = update_targets([path], git_info, lambda *args, **kwargs: None, structures=True)
+
+    assert [result.path for result in results] == [path, path + "i"]
+    namespace = {}
+    exec((tmp_path / "pkg" / "versions.py").read_text(), namespace)
+    assert namespace["version_info"] == (1, 2, 3, None, None)
+    assert namespace["build_info"].commit == "abcdefg"
+    assert "build_info: BuildInfo" in (tmp_path / "pkg" / "versions.pyi").read_text()
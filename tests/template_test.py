@@ -0,0 +1,46 @@
+import os
+
+from poetry_versions_plugin.template import render, render_file, template_context
+
+
+def test_template_context():
+    info = {"version": "1.2.3", "commit": "abcdefg", "commit_count": 42, "is_dirty": False}
+
+    context = template_context(info, {"full_version": "{version}+{commit}"})
+
+    assert context["VERSION"] == "1.2.3"
+    assert context["COMMIT_COUNT"] == "42"
+    assert context["IS_DIRTY"] == "False"
+    assert context["FULL_VERSION"] == "1.2.3+abcdefg"
+
+
+def test_render():
+    text = "v<!-- VERSION --> (<!--COMMIT-->) <!-- UNKNOWN --> <!-- VERSION -->"
+
+    rendered, replaced = render(text, {"VERSION": "1.2.3", "COMMIT": "abcdefg"})
+
+    assert rendered == "v1.2.3 (abcdefg) <!-- UNKNOWN --> 1.2.3"
+    assert replaced == 3
+
+
+def test_render_file_keeps_line_endings(tmp_path):
+    path = tmp_path / "VERSION.txt"
+    path.write_bytes(b"version: <!-- VERSION -->\r\nbranch: <!-- BRANCH -->\r\n")
+
+    replaced = render_file(path, {"VERSION": "1.2.3", "BRANCH": "main"})
+
+    assert replaced == 2
+    assert path.read_bytes() == b"version: 1.2.3\r\nbranch: main\r\n"
+    assert os.listdir(tmp_path) == ["VERSION.txt"]
+
+
+def test_render_file_dry_run_and_no_placeholders(tmp_path):
+    path = tmp_path / "NOTES.md"
+    path.write_text("version: <!-- VERSION -->\n")
+
+    assert render_file(path, {"VERSION": "1.2.3"}, dry_run=True) == 1
+    assert path.read_text() == "version: <!-- VERSION -->\n"
+
+    assert render_file(path, {"BRANCH": "main"}) == 0
+    assert path.read_text() == "version: <!-- VERSION -->\n"
+    assert os.listdir(tmp_path) == ["NOTES.md"]
@@ -0,0 +1,85 @@
+import pytest
+
+from poetry_versions_plugin.tomlpatch import patch_table, split_tables
+
+DOCUMENT = """\
+[tool.poetry]
+name = "demo"   # the name
+version = "1.0.0"
+
+[tool.versions]
+version = '1.0.0'  # bumped by the plugin
+commit_count = 3
+
+[tool.versions.settings]
+filename = ["README.md"]
+"""
+
+
+def test_patch_table_rewrites_only_the_table_lines():
+    patched = patch_table(DOCUMENT, "tool.versions", {"version": "1.1.0", "commit_count": 4})
+
+    assert patched == DOCUMENT.replace(
+        "version = '1.0.0'  # bumped by the plugin", 'version = "1.1.0"'
+    ).replace("commit_count = 3", "commit_count = 4")
+
+
+def test_patch_table_appends_missing_keys_before_blank_lines():
+    patched = patch_table(DOCUMENT, "tool.versions", {"is_dirty": False, "branch": "main"})
+
+    assert 'commit_count = 3\nis_dirty = false\nbranch = "main"\n\n[tool.versions.settings]' in patched
+
+
+def test_patch_table_keeps_crlf_line_endings():
+    document = DOCUMENT.replace("\n", "\r\n")
+
+    patched = patch_table(document, "tool.versions", {"version": "1.1.0", "branch": "main"})
+
+    assert patched.count("\r\n") == document.count("\r\n") + 1
+    assert "\n" not in patched.replace("\r\n", "")
+
+
+def test_patch_table_at_end_of_file_without_newline():
+    assert patch_table("[tool.versions]", "tool.versions", {"version": "1.1.0"}) == \
+        '[tool.versions]\nversion = "1.1.0"\n'
+
+
+@pytest.mark.parametrize("document", [
+    "[tool.poetry]\nname = 'demo'\n",
+    "[tool.versions]\nversion = '1'\n[tool.versions]\nversion = '2'\n",
+    "[tool]\nversions.branch = 'main'\n[tool.versions]\nversion = '1'\n",
+    "[tool]\nversions = { version = '1' }\n",
+    "tool.versions.version = '1'\n[tool.versions]\nbranch = 'main'\n",
+    "[tool.versions]\nversion = '1'\nversion = '2'\n",
+    "[tool.versions]\nversion = '''\n1\n'''\n",
+])
+def test_patch_table_gives_up_on_ambiguous_documents(document):
+    assert patch_table(document, "tool.versions", {"version": "1.1.0"}) is None
+
+
+def test_patch_table_ignores_versions_keys_of_unrelated_tables():
+    document = (
+        'versions = "root"\n'
+        '[tool.poetry.plugins."poetry.plugin"]\n'
+        'versions = "poetry_versions_plugin.plugin:VersionsPlugin"\n'
+        + DOCUMENT
+        + '[other]\nversions.branch = "main"\n'
+    )
+
+    patched = patch_table(document, "tool.versions", {"commit_count": 4})
+
+    assert patched == document.replace("commit_count = 3", "commit_count = 4")
+
+
+def test_patch_table_ignores_keys_in_multiline_strings():
+    document = '[tool.versions]\nnote = """\nbranch = 1\n"""\nbranch = "main"\n'
+
+    assert patch_table(document, "tool.versions", {"branch": "x"}) == document.replace('"main"', '"x"')
+    assert patch_table(document.replace('branch = "main"\n', ''), "tool.versions", {"branch": "x"}) == \
+        '[tool.versions]\nnote = """\nbranch = 1\n"""\nbranch = "x"\n'
+
+
+def test_split_tables_ignores_headers_in_multiline_strings():
+    lines = 'description = """\n[tool.versions]\n"""\n[ tool . versions ]  # comment\n[[tool.items]]\n'.splitlines(True)
+
+    assert split_tables(lines) == [(3, "tool.versions", False), (4, "tool.items", True)]
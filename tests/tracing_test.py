@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+
+from poetry_versions_plugin.tracing import NULL_TRACER, Tracer
+
+
+def test_span_records_the_duration():
+    tracer = Tracer()
+
+    with tracer.span('write', path='README.md'):
+        time.sleep(0.01)
+
+    [span] = tracer.spans
+    assert span.name == 'write'
+    assert span.duration >= 0.01
+    assert span.args == {'path': 'README.md'}
+
+
+def test_span_is_recorded_when_the_block_raises():
+    tracer = Tracer()
+
+    try:
+        with tracer.span('commit'):
+            raise ValueError('no changes')
+    except ValueError:
+        pass
+
+    assert [span.name for span in tracer.spans] == ['commit']
+
+
+def test_disabled_tracer_records_nothing():
+    assert NULL_TRACER.span('a') is NULL_TRACER.span('b')
+
+    with NULL_TRACER.span('a'):
+        pass
+    NULL_TRACER.record('b', time.perf_counter(), 1.0)
+
+    assert NULL_TRACER.spans == []
+
+
+def test_summary_totals_spans_by_name():
+    tracer = Tracer(origin=0.0)
+    tracer.record('stage file', 1.0, 0.5)
+    tracer.record('git probe', 0.5, 0.25)
+    tracer.record('stage file', 2.0, 0.25)
+
+    assert tracer.summary() == [('git probe', 0.25, 1), ('stage file', 0.75, 2)]
+
+
+def test_chrome_trace_export(tmp_path):
+    tracer = Tracer(origin=10.0)
+    tracer.record('git probe', 10.5, 0.25, path='.')
+    thread = threading.Thread(target=lambda: tracer.record('stage file', 11.0, 0.125))
+    thread.start()
+    thread.join()
+
+    tracer.export(tmp_path / 'trace.json')
+
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [(event['name'], event['ph'], event['ts'], event['dur'], event['tid']) for event in events] == [
+        ('git probe', 'X', 500000.0, 250000.0, 1),
+        ('stage file', 'X', 1000000.0, 125000.0, 2),
+    ]
+    assert events[0]['args'] == {'path': '.'}
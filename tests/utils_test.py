@@ -0,0 +1,63 @@
+import threading
+
+from cleo.io.buffered_io import BufferedIO
+from cleo.io.outputs.output import Verbosity
+
+from poetry_versions_plugin.utils import Logger, with_logger
+
+
+class Unformattable:
+    def __format__(self, format_spec):
+        raise AssertionError("filtered messages must not be formatted")
+
+
+def test_logger_prefixes():
+    io = BufferedIO()
+    io.set_verbosity(Verbosity.VERBOSE)
+    write_line = Logger(io, 'after_version_command', 'console.terminate')
+
+    write_line('init')
+    write_line('updated {}', 'pyproject.toml', verbosity=Verbosity.NORMAL)
+
+    assert io.fetch_output().splitlines() == [
+        'poetry-versions-plugin: after_version_command console.terminate init',
+        'poetry-versions-plugin: updated pyproject.toml',
+    ]
+
+
+def test_logger_skips_filtered_messages():
+    """Messages above the IO verbosity are neither formatted nor written."""
+    io = BufferedIO()
+    write_line = Logger(io, 'caller')
+
+    assert not write_line.is_enabled(Verbosity.VERBOSE)
+    write_line('info {}', Unformattable())
+
+    assert io.fetch_output() == ''
+
+
+def test_with_logger_attribution_is_reentrant():
+    """Concurrent listeners each get their own logger bound to the listener name."""
+
+    class Listener:
+        @with_logger
+        def on_event(self, event, event_name, dispatcher, write_line):
+            write_line('{}', event_name)
+
+    class Event:
+        def __init__(self, io):
+            self.io = io
+
+    ios = [BufferedIO() for _ in range(8)]
+    for io in ios:
+        io.set_verbosity(Verbosity.VERBOSE)
+
+    threads = [threading.Thread(target=Listener().on_event, args=(Event(io), f'event-{i}', None))
+               for i, io in enumerate(ios)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i, io in enumerate(ios):
+        assert io.fetch_output() == f'poetry-versions-plugin: on_event event-{i} event-{i}\n'
@@ -0,0 +1,84 @@
+import pytest
+
+from poetry_versions_plugin.services import py_file_content
+from poetry_versions_plugin.versioning import BUMP_RULES, next_project_version, next_version, sort_key, version_info
+
+# In PEP 440 order
+ORDERED = [
+    "1.0.dev0", "1.0a1.dev1", "1.0a1", "1.0a1.post1", "1.0a2", "1.0b1", "1.0rc1", "1.0", "1.0+abc", "1.0+abc.5",
+    "1.0+5", "1.0.post1.dev1", "1.0.post1", "1.0.1", "1.1.dev1", "1.10", "1!0.1",
+]
+
+
+def test_version_info():
+    assert version_info("1.2.3") == (1, 2, 3, None, None)
+    assert version_info("2") == (2, 0, 0, None, None)
+    assert version_info("1.2.0rc1+ubuntu.1") == (1, 2, 0, "rc1", "ubuntu.1")
+
+
+def test_sort_key_follows_pep_440():
+    assert sorted(ORDERED, key=sort_key) == ORDERED
+    assert sort_key("1.0") == sort_key("1.0.0")
+
+
+def test_sort_key_rejects_invalid_versions():
+    with pytest.raises(ValueError):
+        sort_key("not a version")
+
+
+@pytest.mark.parametrize("version", ["1.2.3", "0.1", "2", "1.0.0a1", "1.0.0rc2", "1!2.0.dev3", "1.2.3.post1"])
+@pytest.mark.parametrize("rule", [*BUMP_RULES, "3.0.0"])
+@pytest.mark.parametrize("next_phase", [False, True])
+def test_next_version_matches_poetry(version, rule, next_phase):
+    from poetry.console.commands.version import VersionCommand
+
+    if rule == "prerelease" and version == "1!2.0.dev3":
+        pytest.skip("Poetry fails on development releases without pre-release")
+    expected = VersionCommand().increment_version(version, rule, next_phase).text
+    assert next_version(version, rule, next_phase) == expected
+
+
+def test_next_version_prerelease_of_development_release():
+    assert next_version("1!2.0.dev3", "prerelease") == "1!2.0a0"
+
+
+def test_next_version_rejects_invalid_versions():
+    with pytest.raises(ValueError):
+        next_version("not a version", "patch")
+    with pytest.raises(ValueError):
+        next_version("1.0.0", "not a rule")
+
+
+@pytest.mark.parametrize("table", ["project", "tool.poetry"])
+def test_next_project_version(tmp_path, table):
+    path = tmp_path / "pyproject.toml"
+    path.write_text(f'[{table}]\nname = "demo"\nversion = "1.2.3"\n')
+
+    assert next_project_version("minor", path) == ("1.2.3", "1.3.0")
+    assert next_project_version("prerelease", path) == ("1.2.3", "1.2.4a0")
+
+
+def test_next_project_version_without_version(tmp_path):
+    path = tmp_path / "pyproject.toml"
+    path.write_text('[project]\nname = "demo"\n')
+
+    with pytest.raises(ValueError, match="No version"):
+        next_project_version("minor", path)
+
+
+def build_info(version):
+    namespace = {}
+    exec(py_file_content({"branch": "main", "commit": "abcdef0", "commit_count": 1, "is_dirty": False,
+                          "datetime": "2024-01-01 00:00:00", "version": version}, structures=True), namespace)
+    return namespace["build_info"]
+
+
+def test_generated_record_is_frozen_and_ordered():
+    record = build_info("1.0rc1")
+
+    assert build_info("1.0rc1") == record
+    assert record < build_info("1.0") < build_info("1.0.post1")
+    assert record.full_version == "1.0rc1.main+1.abcdef0"
+    assert not hasattr(record, "__dict__")
+    with pytest.raises(AttributeError):
+        record.version = "2.0"
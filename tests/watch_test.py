@@ -0,0 +1,162 @@
+import os
+import threading
+
+import pytest
+from cleo.testers.application_tester import ApplicationTester
+from poetry.console.application import Application
+
+from poetry_versions_plugin.plugin import VersionsApplicationPlugin
+from poetry_versions_plugin.settings import Settings
+from poetry_versions_plugin.watch import (
+    VersionFilesUpdater, load_libc, open_watcher, wait_for_changes, watch,
+)
+from tests.conftest import commit_all, run_git
+
+PYPROJECT = """[tool.poetry]
+name = "demo"
+version = "1.0.0"
+description = "A test package"
+authors = ["Author <author@example.com>"]
+
+[tool.versions.settings]
+filename = ["demo/versions.py", "README.md"]
+"""
+
+
+@pytest.fixture
+def project(git_repo):
+    """Create a repository holding a plugin-enabled project."""
+    (git_repo / "pyproject.toml").write_text(PYPROJECT)
+    (git_repo / "README.md").write_text("version <!-- VERSION -->\n")
+    commit_all(git_repo)
+    return git_repo
+
+
+def settings():
+    return Settings({"filename": ["demo/versions.py", "README.md"]})
+
+
+def git_dir(project):
+    return str(project / ".git")
+
+
+@pytest.mark.parametrize("polling", [True, False])
+def test_watcher_reports_changes(project, polling):
+    if not polling and load_libc() is None:
+        pytest.skip("inotify is not available")
+
+    with open_watcher(git_dir(project), git_dir(project), polling=polling, interval=0.01) as watcher:
+        assert watcher.read(0.05) == set()
+
+        run_git(project, "checkout", "-q", "-b", "feature/nested")
+        assert "refs" in wait_for_changes(watcher, debounce=0.05, timeout=2)
+
+        (project / "README.md").write_text("changed\n")
+        run_git(project, "add", "README.md")
+        assert wait_for_changes(watcher, debounce=0.05, timeout=2) == {"index"}
+
+        run_git(project, "commit", "-q", "-m", "nested")
+        assert wait_for_changes(watcher, debounce=0.05, timeout=2) == {"refs", "index"}
+
+
+@pytest.mark.parametrize("polling", [True, False])
+def test_updater_does_not_notify_itself(project, polling):
+    """The dirty scan of an update does not write the index, which would start another update."""
+    if not polling and load_libc() is None:
+        pytest.skip("inotify is not available")
+
+    (project / "README.md").write_text("changed\n")
+    updater = VersionFilesUpdater(str(project), settings(), lambda *args, **kwargs: None)
+    with open_watcher(git_dir(project), git_dir(project), polling=polling, interval=0.01) as watcher:
+        updater.update()
+        assert watcher.read(0.1) == set()
+
+
+def test_wait_for_changes_debounces():
+    class Watcher:
+        reads = [{"refs"}, {"index"}, {"refs"}, set(), {"index"}]
+
+        def read(self, timeout=None):
+            return self.reads.pop(0)
+
+    watcher = Watcher()
+    assert wait_for_changes(watcher) == {"refs", "index"}
+    assert watcher.reads == [{"index"}]
+
+
+def test_updater(project):
+    updater = VersionFilesUpdater(str(project), settings(), lambda *args, **kwargs: None)
+    versions = project / "demo" / "versions.py"
+
+    results = updater.update()
+    assert [result.path for result in results] == [os.path.join(str(project), "demo/versions.py")]
+    assert "branch = 'main'" in versions.read_text()
+    # Text targets are only rendered by a version bump
+    assert "<!-- VERSION -->" in (project / "README.md").read_text()
+
+    # Nothing the generated module depends on changed
+    run_git(project, "branch", "other")
+    assert updater.update({"refs"}) == []
+
+    run_git(project, "checkout", "-q", "-b", "feature")
+    assert updater.update({"refs", "index"})[0].changed
+    assert "branch = 'feature'" in versions.read_text()
+
+    (project / "README.md").write_text("changed\n")
+    assert updater.update({"index"})[0].changed
+    assert "is_dirty = True" in versions.read_text()
+
+    (project / "pyproject.toml").write_text(PYPROJECT.replace('version = "1.0.0"', 'version = "1.1.0"'))
+    assert updater.update({"index"})[0].changed
+    assert "version = '1.1.0'" in versions.read_text()
+
+
+def test_updater_ignores_its_own_targets(project):
+    """Regenerating a tracked target does not make the next update report a dirty tree."""
+    updater = VersionFilesUpdater(str(project), settings(), lambda *args, **kwargs: None)
+    versions = project / "demo" / "versions.py"
+    updater.update()
+    commit_all(project, "versions")
+
+    run_git(project, "checkout", "-q", "-b", "feature")
+    assert updater.update({"refs", "index"})[0].changed
+    assert "is_dirty = False" in versions.read_text()
+    assert updater.update({"index"}) == []
+    assert "is_dirty = False" in versions.read_text()
+
+
+def test_watch(project):
+    stop = threading.Event()
+    updates = []
+
+    def on_update(results):
+        updates.append(results)
+        if len(updates) == 1:
+            run_git(project, "checkout", "-q", "-b", "feature")
+        else:
+            stop.set()
+
+    thread = threading.Thread(target=watch, args=(str(project), settings(), lambda *args, **kwargs: None),
+                              kwargs={"polling": True, "interval": 0.01, "stop": stop, "on_update": on_update})
+    thread.start()
+    thread.join(10)
+
+    assert not thread.is_alive()
+    assert "branch = 'feature'" in (project / "demo" / "versions.py").read_text()
+
+
+def test_watch_outside_repository(tmp_path):
+    with pytest.raises(ValueError, match="not in a git repository"):
+        watch(str(tmp_path), settings(), lambda *args, **kwargs: None)
+
+
+def test_watch_command_without_python_target(project, monkeypatch):
+    (project / "pyproject.toml").write_text(PYPROJECT.replace('"demo/versions.py", ', ''))
+    monkeypatch.chdir(project)
+    application = Application()
+    application.auto_exits(False)
+    VersionsApplicationPlugin().activate(application)
+    tester = ApplicationTester(application)
+
+    assert tester.execute("versions watch") == 1
+    assert "No Python file" in tester.io.fetch_error()
@@ -0,0 +1,59 @@
+import pytest
+from cleo.testers.application_tester import ApplicationTester
+from poetry.console.application import Application
+
+from poetry_versions_plugin.plugin import VersionsApplicationPlugin
+from poetry_versions_plugin.workspace import discover_members
+from tests.conftest import commit_all, run_git
+
+PYPROJECT = """[tool.poetry]
+name = "{name}"
+version = "{version}"
+description = "A test package"
+authors = ["Author <author@example.com>"]
+
+[tool.versions.settings]
+filename = ["{name}/versions.py", "README.md"]
+"""
+
+
+@pytest.fixture
+def workspace(git_repo, monkeypatch):
+    """Create a repository with two plugin-enabled packages and one package without settings."""
+    for name, version in (("alpha", "1.0.0"), ("beta", "2.3.4")):
+        package = git_repo / "packages" / name
+        package.mkdir(parents=True)
+        (package / "pyproject.toml").write_text(PYPROJECT.format(name=name, version=version))
+        (package / "README.md").write_text("version <!-- VERSION -->\n")
+    (git_repo / "other").mkdir()
+    (git_repo / "other" / "pyproject.toml").write_text('[tool.poetry]\nname = "other"\nversion = "0.1.0"\n')
+    commit_all(git_repo)
+    monkeypatch.chdir(git_repo)
+    return git_repo
+
+
+def test_discover_members(workspace):
+    members = discover_members('.')
+
+    assert [member.name for member in members] == ["alpha", "beta"]
+    assert [member.version for member in members] == ["1.0.0", "2.3.4"]
+
+
+def test_workspace_command(workspace):
+    application = Application()
+    application.auto_exits(False)
+    VersionsApplicationPlugin().activate(application)
+    tester = ApplicationTester(application)
+
+    assert tester.execute("versions workspace minor") == 0
+
+    alpha = workspace / "packages" / "alpha"
+    assert 'version = "1.1.0"' in (alpha / "pyproject.toml").read_text()
+    assert "version = '1.1.0'" in (alpha / "alpha" / "versions.py").read_text()
+    assert (alpha / "README.md").read_text() == "version 1.1.0\n"
+    assert 'version = "2.4.0"' in (workspace / "packages" / "beta" / "pyproject.toml").read_text()
+    assert 'version = "0.1.0"' in (workspace / "other" / "pyproject.toml").read_text()
+
+    assert run_git(workspace, "log", "-1", "--format=%s") == "Bump versions: alpha 1.0.0 → 1.1.0, beta 2.3.4 → 2.4.0"
+    assert run_git(workspace, "status", "--porcelain") == ""
+    assert run_git(workspace, "rev-list", "--count", "HEAD") == "2"